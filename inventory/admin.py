@@ -1,11 +1,35 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+
+from project.softdelete import ArchivableAdmin
+
+from .models import (
+    ArchivedInventoryStock,
+    ArchivedInventoryTransaction,
+    InventoryItem,
+    InventoryStock,
+    InventoryTransaction,
+    ItemBarcode,
+    LedgerSummary,
+    Location,
+    StockLevel,
+    StockRecord,
+    StockReservation,
+    StockWriteOff,
+    ValuationSummary,
+)
+from .writeoffs import write_off_expired
+
+class ItemBarcodeInline(admin.TabularInline):
+    model = ItemBarcode
+    extra = 0
 
-from .models import InventoryItem, InventoryStock, InventoryTransaction, StockRecord
 
 # Register your models here.
 @admin.register(InventoryItem)
-class InventoryItemAdmin(admin.ModelAdmin):
+class InventoryItemAdmin(ArchivableAdmin):
     list_display = ["stocks"] + [field.name for field in InventoryItem._meta.fields] 
+    list_filter = ("is_archived",)
+    inlines = [ItemBarcodeInline]
 admin.site.register(
     InventoryTransaction,
 )
@@ -16,6 +40,90 @@ admin.site.register(
 
 @admin.register(InventoryStock)
 class InventoryStockAdmin(admin.ModelAdmin):
-    list_display = ("item", "expiration_date", "quantity", "date_of_delivery")
-    list_filter = ("expiration_date",)
+    list_display = (
+        "item", "location", "expiration_date", "quantity", "reserved_quantity", "unit_cost", "date_of_delivery"
+    )
+    list_filter = ("location", "expiration_date")
     search_fields = ("item__name",)
+    actions = ["write_off"]
+
+    @admin.action(description="Write off expired stock of the selected lots")
+    def write_off(self, request, queryset):
+        write_offs = write_off_expired(queryset, created_by=request.user)
+        self.message_user(
+            request,
+            f"Wrote off {sum(w.quantity for w in write_offs)} units from {len(write_offs)} expired lots.",
+            messages.SUCCESS,
+        )
+
+
+class ReadOnlyAdmin(admin.ModelAdmin):
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedInventoryTransaction)
+class ArchivedInventoryTransactionAdmin(ReadOnlyAdmin):
+    list_display = ("id", "item", "location", "quantity", "created_by", "created_at")
+    list_filter = ("location", "created_at")
+    search_fields = ("item__item_name",)
+
+
+@admin.register(ArchivedInventoryStock)
+class ArchivedInventoryStockAdmin(ReadOnlyAdmin):
+    list_display = ("id", "item", "location", "expiration_date", "quantity", "unit_cost", "date_of_delivery")
+    list_filter = ("location", "expiration_date")
+    search_fields = ("item__item_name",)
+
+
+@admin.register(LedgerSummary)
+class LedgerSummaryAdmin(ReadOnlyAdmin):
+    list_display = ("item", "location", "period", "transaction_count", "quantity")
+    list_filter = ("location", "period")
+    search_fields = ("item__item_name",)
+
+
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    list_display = ("code", "name")
+
+
+@admin.register(StockLevel)
+class StockLevelAdmin(ReadOnlyAdmin):
+    list_display = ("item", "location", "quantity")
+    list_filter = ("location",)
+    search_fields = ("item__item_name",)
+
+
+@admin.register(ValuationSummary)
+class ValuationSummaryAdmin(ReadOnlyAdmin):
+    list_display = ("category", "subcategory", "expiration_date", "quantity", "value")
+    list_filter = ("category", "expiration_date")
+
+
+@admin.register(ItemBarcode)
+class ItemBarcodeAdmin(admin.ModelAdmin):
+    list_display = ("code", "item", "level", "units_per_pack")
+    list_filter = ("level",)
+    search_fields = ("code", "item__item_name")
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(ReadOnlyAdmin):
+    # Read only, reservations are released through inventory.reservations
+    list_display = ("item", "location", "quantity", "created_by", "expires_at")
+    list_filter = ("location", "expires_at")
+    search_fields = ("item__item_name",)
+
+
+@admin.register(StockWriteOff)
+class StockWriteOffAdmin(ReadOnlyAdmin):
+    list_display = ("item", "location", "stock_id", "expiration_date", "quantity", "created_by", "created_at")
+    list_filter = ("location", "created_at")
+    search_fields = ("item__item_name",)
@@ -0,0 +1,125 @@
+"""
+Planning which lots stock is taken from.
+
+``plan`` reads the sellable lots of any number of items in one query and
+splits each requested quantity over them in the order of a strategy.
+Previews call it without taking locks. Dispenses, reservations and
+transfers call it with ``lock=True`` inside their transaction, so a
+preview shows exactly what committing at that moment would do.
+"""
+import datetime
+from collections import defaultdict
+
+from django.db.models import Case, F, IntegerField, Value, When
+from django.forms import ValidationError
+
+from .models import InventoryItem, InventoryStock, default_location
+
+
+class Strategy:
+    """Orders the candidate lots of each item, the first lot is used first."""
+    name = None
+    ordering = ("pk",)
+
+    def lots(self, lots):
+        return lots.order_by("item", *self.ordering)
+
+    def __str__(self):
+        return self.name
+
+
+class FirstExpiryFirstOut(Strategy):
+    name = "fefo"
+    ordering = ("expiration_date", "pk")
+
+
+class FirstInFirstOut(Strategy):
+    name = "fifo"
+    ordering = ("date_of_delivery", "pk")
+
+
+class PinnedLots(Strategy):
+    """Only the lots picked by staff, in the order they were picked."""
+    name = "pinned"
+
+    def __init__(self, lot_ids=()):
+        self.lot_ids = [int(pk) for pk in lot_ids]
+
+    def lots(self, lots):
+        if not self.lot_ids:
+            return lots.none()
+        position = Case(
+            *(When(pk=pk, then=Value(i)) for i, pk in enumerate(self.lot_ids)),
+            output_field=IntegerField(),
+        )
+        return lots.filter(pk__in=self.lot_ids).order_by("item", position)
+
+    def __str__(self):
+        return f"{self.name}:{','.join(map(str, self.lot_ids))}"
+
+
+STRATEGIES = {}
+
+
+def register_strategy(strategy):
+    """Make a Strategy subclass available by its ``name``."""
+    STRATEGIES[strategy.name] = strategy
+    return strategy
+
+
+for strategy in (FirstExpiryFirstOut, FirstInFirstOut, PinnedLots):
+    register_strategy(strategy)
+
+
+def get_strategy(strategy=None, **options):
+    """Resolve a strategy instance or name, first-expiry-first-out by default."""
+    if isinstance(strategy, Strategy):
+        return strategy
+    try:
+        return STRATEGIES[strategy or FirstExpiryFirstOut.name](**options)
+    except KeyError:
+        raise ValidationError(f"Unknown allocation strategy: {strategy}")
+
+
+def sellable_lots(location, item_ids=None):
+    """Unexpired lots at ``location`` with unreserved units, of ``item_ids`` if given."""
+    lots = InventoryStock.objects.filter(
+        location=location,
+        quantity__gt=F("reserved_quantity"),
+        expiration_date__gte=datetime.date.today(),
+    )
+    if item_ids is not None:
+        lots = lots.filter(item__in=item_ids)
+    return lots
+
+
+def plan(lines, location=None, strategy=None, lock=False):
+    """
+    Split ``lines`` of ``(item, quantity)`` over the sellable lots at
+    ``location``. Returns ``{item_id: [(lot, quantity), ...]}`` and
+    ``{item_id: quantity that could not be allocated}``.
+
+    With ``lock`` the lots are selected for update, the caller must be
+    in a transaction.
+    """
+    wanted = defaultdict(int)
+    for item, quantity in lines:
+        if quantity <= 0:
+            raise ValidationError("Every line needs a positive quantity.")
+        wanted[InventoryItem._meta.pk.to_python(getattr(item, "pk", item))] += quantity
+    if location is None:
+        location = default_location()
+
+    lots = get_strategy(strategy).lots(sellable_lots(getattr(location, "pk", location), list(wanted)))
+    if lock:
+        lots = lots.select_for_update()
+
+    allocations = {item_id: [] for item_id in wanted}
+    remaining = dict(wanted)
+    for lot in lots:
+        take = min(lot.sellable_quantity, remaining[lot.item_id])
+        if take:
+            allocations[lot.item_id].append((lot, take))
+            remaining[lot.item_id] -= take
+    shortfalls = {item_id: missing for item_id, missing in remaining.items() if missing}
+    return allocations, shortfalls
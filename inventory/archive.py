@@ -0,0 +1,185 @@
+"""
+Moves closed ledger rows out of the hot inventory tables.
+
+A lot is closed once it is fully depleted or expired. A transaction is
+closed once it is older than the cutoff and every lot it drew from is
+closed, so it can no longer be edited into a live lot. Archived rows are
+read through the query functions at the bottom of this module.
+"""
+import datetime
+from collections import defaultdict
+
+from django.db import transaction as transaction_db
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from .models import (
+    ArchivedInventoryStock,
+    ArchivedInventoryTransaction,
+    ArchivedStockRecord,
+    InventoryStock,
+    InventoryTransaction,
+    LedgerSummary,
+    StockRecord,
+)
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def closed_lot_q(before: datetime.date, prefix: str = "") -> Q:
+    return Q(**{f"{prefix}quantity": 0}) | Q(**{f"{prefix}expiration_date__lt": before})
+
+
+def closed_transactions(before: datetime.date):
+    cutoff = timezone.make_aware(datetime.datetime.combine(before, datetime.time.min))
+    open_records = StockRecord.objects.filter(transaction=OuterRef("pk")).exclude(
+        closed_lot_q(before, "stock__")
+    )
+    return InventoryTransaction.objects.filter(created_at__lt=cutoff).exclude(
+        Exists(open_records)
+    )
+
+
+def closed_lots(before: datetime.date):
+    return InventoryStock.objects.filter(
+        closed_lot_q(before),
+        date_of_delivery__lt=before,
+    ).exclude(
+        Exists(StockRecord.objects.filter(stock=OuterRef("pk")))
+    )
+
+
+def _roll_up(transactions):
+    totals = defaultdict(lambda: [0, 0])
+    for t in transactions:
+        period = timezone.localtime(t.created_at).date().replace(day=1)
+        totals[(t.item_id, t.location_id, period)][0] += 1
+        totals[(t.item_id, t.location_id, period)][1] += t.quantity
+
+    for (item_id, location_id, period), (count, quantity) in totals.items():
+        updated = LedgerSummary.objects.filter(item_id=item_id, location_id=location_id, period=period).update(
+            transaction_count=F("transaction_count") + count,
+            quantity=F("quantity") + quantity,
+        )
+        if not updated:
+            LedgerSummary.objects.create(
+                item_id=item_id,
+                location_id=location_id,
+                period=period,
+                transaction_count=count,
+                quantity=quantity,
+            )
+
+
+def archive_transaction_batch(before: datetime.date, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Archive up to ``batch_size`` closed transactions in one database transaction."""
+    with transaction_db.atomic():
+        transactions = list(closed_transactions(before).order_by("pk")[:batch_size])
+        if not transactions:
+            return 0
+        ids = [t.pk for t in transactions]
+        records = StockRecord.objects.filter(transaction_id__in=ids)
+
+        ArchivedInventoryTransaction.objects.bulk_create(
+            ArchivedInventoryTransaction(
+                id=t.pk,
+                item_id=t.item_id,
+                location_id=t.location_id,
+                created_by_id=t.created_by_id,
+                quantity=t.quantity,
+                created_at=t.created_at,
+            )
+            for t in transactions
+        )
+        ArchivedStockRecord.objects.bulk_create(
+            ArchivedStockRecord(
+                id=r.pk,
+                transaction_id=r.transaction_id,
+                stock_id=r.stock_id,
+                quantity=r.quantity,
+            )
+            for r in records
+        )
+        _roll_up(transactions)
+
+        # Queryset deletes skip StockRecord.delete, so no stock is given back.
+        records.delete()
+        InventoryTransaction.objects.filter(pk__in=ids).delete()
+    return len(transactions)
+
+
+def archive_lot_batch(before: datetime.date, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Archive up to ``batch_size`` closed lots no hot transaction refers to."""
+    with transaction_db.atomic():
+        lots = list(closed_lots(before).order_by("pk")[:batch_size])
+        if not lots:
+            return 0
+        ArchivedInventoryStock.objects.bulk_create(
+            ArchivedInventoryStock(
+                id=lot.pk,
+                item_id=lot.item_id,
+                location_id=lot.location_id,
+                date_of_delivery=lot.date_of_delivery,
+                expiration_date=lot.expiration_date,
+                quantity=lot.quantity,
+                received_quantity=lot.received_quantity,
+                unit_cost=lot.unit_cost,
+                created_by_id=lot.created_by_id,
+            )
+            for lot in lots
+        )
+        InventoryStock.objects.filter(pk__in=[lot.pk for lot in lots]).delete()
+    return len(lots)
+
+
+def archive_ledger(before: datetime.date, batch_size: int = DEFAULT_BATCH_SIZE, on_batch=None):
+    """
+    Archive everything closed before ``before``.
+
+    Every batch commits on its own, so an interrupted run can simply be
+    started again. Returns the number of transactions and lots moved.
+    """
+    totals = {"transactions": 0, "lots": 0}
+    for key, archive_batch in (
+        ("transactions", archive_transaction_batch),
+        ("lots", archive_lot_batch),
+    ):
+        while moved := archive_batch(before, batch_size):
+            totals[key] += moved
+            if on_batch:
+                on_batch(key, moved)
+    return totals
+
+
+# Read-only access to archived data
+
+
+def archived_transactions(item=None, start=None, end=None, location=None):
+    queryset = ArchivedInventoryTransaction.objects.prefetch_related("archivedstockrecord_set")
+    if item is not None:
+        queryset = queryset.filter(item=item)
+    if location is not None:
+        queryset = queryset.filter(location=location)
+    if start is not None:
+        queryset = queryset.filter(created_at__gte=start)
+    if end is not None:
+        queryset = queryset.filter(created_at__lt=end)
+    return queryset.order_by("created_at")
+
+
+def archived_lots(item=None, location=None):
+    queryset = ArchivedInventoryStock.objects.all()
+    if item is not None:
+        queryset = queryset.filter(item=item)
+    if location is not None:
+        queryset = queryset.filter(location=location)
+    return queryset.order_by("expiration_date")
+
+
+def ledger_summary(item=None, location=None):
+    queryset = LedgerSummary.objects.all()
+    if item is not None:
+        queryset = queryset.filter(item=item)
+    if location is not None:
+        queryset = queryset.filter(location=location)
+    return queryset.order_by("period")
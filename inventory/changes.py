@@ -0,0 +1,109 @@
+"""
+Change feed for terminals keeping a local copy of the catalog and stock.
+
+Every change to an item, its barcodes or its stock gives the item the
+next ``change_seq``, shared by all items changed in one write. The
+numbers are taken from a counter row that stays locked until the change
+commits, so they become visible in order. Stock writes take their number
+once they have committed, in a short transaction that only touches the
+items, so the counter row is not held through dispenses at every branch.
+An item whose stock committed but whose touch failed (or the process died
+in between) is missed until its next change, a full sync from ``0``
+picks it up. A terminal keeps the ``cursor`` of the last page it applied
+and asks for what changed after it. Archived items come back as
+tombstones in ``deleted``. Items are never deleted outright, see
+project.softdelete.
+"""
+from django.db.models import F, Q, Sum
+
+from .allocation import sellable_lots
+from .models import InventoryItem, default_location
+
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 5000
+
+# Items are sent as rows of these fields to keep pages small
+FIELDS = [
+    "id",
+    "item_name",
+    "brand_name",
+    "generic_name",
+    "dosage_form",
+    "strength_per_size",
+    "unit_size",
+    "packaging",
+    "category",
+    "subcategory",
+    "sellable",
+    "barcodes",
+]
+
+
+def sellable_at(item_ids, location_id):
+    """``{item_id: sellable quantity}`` at ``location_id``, in one query for a whole page."""
+    return dict(
+        sellable_lots(location_id, item_ids).order_by().values("item").annotate(
+            total=Sum(F("quantity") - F("reserved_quantity"))
+        ).values_list("item", "total")
+    )
+
+
+def parse_cursor(cursor):
+    """
+    Split a cursor into ``(change_seq, item id or None)``. A page that
+    ends within a change_seq continues after the item it ended on.
+    """
+    seq, _, item_id = str(cursor or 0).partition(".")
+    return int(seq), InventoryItem._meta.pk.to_python(item_id) if item_id else None
+
+
+def changes(since=0, location=None, limit=DEFAULT_LIMIT):
+    """
+    Items changed after the cursor ``since``, with their sellable stock at
+    ``location``. Returns a page with the ``cursor`` to ask from next and
+    whether there are ``more`` changes after it.
+    """
+    seq, after_id = parse_cursor(since)
+    if location is None:
+        location = default_location()
+    limit = max(1, min(limit, MAX_LIMIT))
+    after = Q(change_seq__gt=seq)
+    if after_id is not None:
+        after |= Q(change_seq=seq, pk__gt=after_id)
+    rows = list(
+        InventoryItem.all_objects.filter(after)
+        .order_by("change_seq", "pk")
+        .prefetch_related("barcodes")[:limit + 1]
+    )
+    more = len(rows) > limit
+    rows = rows[:limit]
+    sellable = sellable_at([item.pk for item in rows if not item.is_archived], getattr(location, "pk", location))
+
+    items, deleted = [], []
+    for item in rows:
+        if item.is_archived:
+            # A terminal syncing from scratch never had it
+            if seq:
+                deleted.append(str(item.pk))
+            continue
+        items.append([
+            str(item.pk),
+            item.item_name,
+            item.brand_name,
+            item.generic_name,
+            item.dosage_form,
+            item.strength_per_size,
+            item.unit_size,
+            item.packaging,
+            item.category,
+            item.subcategory,
+            sellable.get(item.pk, 0),
+            [[barcode.code, barcode.level, barcode.units_per_pack] for barcode in item.barcodes.all()],
+        ])
+
+    cursor = str(since or 0)
+    if rows:
+        last = rows[-1]
+        # Items changed in one write commit together, so after the last one nothing can join its change_seq
+        cursor = f"{last.change_seq}.{last.pk}" if more else str(last.change_seq)
+    return {"cursor": cursor, "more": more, "fields": FIELDS, "items": items, "deleted": deleted}
@@ -0,0 +1,84 @@
+"""
+Headline numbers for the staff dashboard on the homepage.
+
+``kpis`` computes every figure in one query grouped by item. The
+``watermark`` changes whenever stock, reservations or the item list
+change (and at midnight), so the rendered dashboard can be cached and
+revalidated against it. Besides the ledger it follows the change feed
+counter, which every lot write moves, including deletions and expiry
+date edits that record no movement.
+"""
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    ITEM_CHANGES,
+    ChangeSequence,
+    InventoryItem,
+    InventoryTransaction,
+    StockMovement,
+    StockReservation,
+)
+
+
+def _today_start():
+    return timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _today_total(aggregate):
+    dispensed = InventoryTransaction.objects.filter(
+        item=OuterRef("pk"), created_at__gte=_today_start()
+    ).order_by().values("item").annotate(total=aggregate).values("total")
+    return Coalesce(Subquery(dispensed), Value(0), output_field=IntegerField())
+
+
+def kpis():
+    today = timezone.localdate()
+    near_expiry = today + datetime.timedelta(days=getattr(settings, "DASHBOARD_NEAR_EXPIRY_DAYS", 30))
+    live = Q(inventorystock__expiration_date__gte=today)
+    rows = InventoryItem.objects.order_by().values("pk").annotate(
+        sellable=Coalesce(
+            Sum(F("inventorystock__quantity") - F("inventorystock__reserved_quantity"), filter=live),
+            Value(0),
+        ),
+        near_expiry_lots=Count(
+            "inventorystock",
+            filter=live & Q(inventorystock__quantity__gt=0, inventorystock__expiration_date__lte=near_expiry),
+        ),
+        dispenses_today=_today_total(Count("pk")),
+        dispensed_today=_today_total(Sum("quantity")),
+    ).values_list("sellable", "near_expiry_lots", "dispenses_today", "dispensed_today")
+
+    low_stock = getattr(settings, "DASHBOARD_LOW_STOCK_THRESHOLD", 10)
+    totals = {
+        "sellable": 0,
+        "low_stock_items": 0,
+        "near_expiry_lots": 0,
+        "dispenses_today": 0,
+        "dispensed_today": 0,
+    }
+    for sellable, near_expiry_lots, dispenses_today, dispensed_today in rows:
+        totals["sellable"] += sellable
+        totals["low_stock_items"] += sellable < low_stock
+        totals["near_expiry_lots"] += near_expiry_lots
+        totals["dispenses_today"] += dispenses_today
+        totals["dispensed_today"] += dispensed_today
+    return totals
+
+
+def watermark():
+    """Return ``(etag, last_modified)`` for the current state of the inventory."""
+    movements = StockMovement.objects.aggregate(last=Max("pk"), modified=Max("created_at"))
+    reservations = StockReservation.objects.aggregate(last=Max("pk"), count=Count("pk"))
+    items = InventoryItem.objects.count()
+    changes = ChangeSequence.objects.filter(pk=ITEM_CHANGES).values_list("value", "updated_at").first() or (0, None)
+    today = _today_start()
+
+    state = (movements["last"], reservations["last"], reservations["count"], items, changes[0], today.date())
+    etag = hashlib.md5(repr(state).encode()).hexdigest()
+    return etag, max(filter(None, (movements["modified"], changes[1], today)))
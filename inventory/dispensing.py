@@ -0,0 +1,127 @@
+"""
+Dispense and void operations with optional client idempotency keys.
+
+A terminal that times out can resend the same request with the same
+key: the first request claims the key in the same database transaction
+that allocates the stock, so a retry (even a concurrent one) gets the
+original transaction back instead of allocating a second time.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction as transaction_db
+from django.forms import ValidationError
+from django.utils import timezone
+
+from .models import IdempotencyKey, IdempotentOperation, InventoryItem, InventoryTransaction
+
+
+def is_lock_error(error):
+    """Whether the database ``error`` is a lock conflict that a retry with the same key can get past."""
+    message = str(error).lower()
+    return "locked" in message or "deadlock" in message or "could not serialize" in message
+
+
+def fingerprint(operation, **params):
+    payload = json.dumps({"operation": operation, **params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def expired_keys():
+    return IdempotencyKey.objects.filter(
+        created_at__lt=timezone.now() - settings.IDEMPOTENCY_KEY_RETENTION
+    )
+
+
+def purge_expired_keys() -> int:
+    return expired_keys().delete()[0]
+
+
+def _claim(key, operation, request_fingerprint):
+    """
+    Claim ``key`` for this request. Returns the new key, or the existing
+    one when the request was already made.
+    """
+    expired_keys().filter(key=key).delete()
+    try:
+        with transaction_db.atomic():
+            return IdempotencyKey.objects.create(
+                key=key,
+                operation=operation,
+                fingerprint=request_fingerprint,
+            ), True
+    except IntegrityError:
+        existing = IdempotencyKey.objects.get(key=key)
+        if existing.operation != operation or existing.fingerprint != request_fingerprint:
+            raise ValidationError("This idempotency key was already used for a different request.")
+        return existing, False
+
+
+@transaction_db.atomic
+def dispense(item, quantity, created_by, location=None, idempotency_key=None, strategy=None):
+    """
+    Dispense ``quantity`` of ``item`` from the lots ``strategy`` picks.
+    Returns ``(transaction, created)``, where ``created`` is False when
+    ``idempotency_key`` was already used and the original transaction is
+    returned.
+    """
+    if quantity <= 0:
+        raise ValidationError("The quantity to dispense must be positive.")
+    if idempotency_key:
+        params = {
+            "item": InventoryItem._meta.pk.to_python(getattr(item, "pk", item)),
+            "quantity": quantity,
+            "location": getattr(location, "pk", location),
+        }
+        if strategy is not None:
+            params["strategy"] = str(strategy)
+        claimed, created = _claim(
+            idempotency_key,
+            IdempotentOperation.DISPENSE,
+            fingerprint(IdempotentOperation.DISPENSE, **params),
+        )
+        if not created:
+            if claimed.transaction_id is None:
+                raise ValidationError("The transaction for this idempotency key has been voided.")
+            return claimed.transaction, False
+
+    transaction = InventoryTransaction(
+        item=item,
+        quantity=quantity,
+        created_by=created_by,
+    )
+    if location is not None:
+        transaction.location = location
+    transaction.save(strategy=strategy)
+
+    if idempotency_key:
+        claimed.transaction = transaction
+        claimed.transaction_pk = transaction.pk
+        claimed.save(update_fields=["transaction", "transaction_pk"])
+    return transaction, True
+
+
+@transaction_db.atomic
+def void(transaction, idempotency_key=None):
+    """
+    Void ``transaction`` (an instance or its id), giving its stock back.
+    Returns whether it was voided now, as opposed to by an earlier
+    request with the same ``idempotency_key``.
+    """
+    transaction_pk = getattr(transaction, "pk", transaction)
+    if idempotency_key:
+        claimed, created = _claim(
+            idempotency_key,
+            IdempotentOperation.VOID,
+            fingerprint(IdempotentOperation.VOID, transaction=transaction_pk),
+        )
+        if not created:
+            return False
+        claimed.transaction_pk = transaction_pk
+        claimed.save(update_fields=["transaction_pk"])
+
+    if not isinstance(transaction, InventoryTransaction):
+        transaction = InventoryTransaction.objects.get(pk=transaction_pk)
+    transaction.delete()
+    return True
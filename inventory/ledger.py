@@ -0,0 +1,51 @@
+"""
+Set-based maintenance of lot balances from the StockMovement ledger.
+"""
+from django.db import transaction as transaction_db
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import InventoryItem, InventoryStock, StockLevel, StockMovement
+from .valuation import rebuild_valuation
+
+
+def ledger_balance():
+    """Subquery summing the movements of the outer lot."""
+    return Coalesce(
+        Subquery(
+            StockMovement.objects.filter(stock=OuterRef("pk"))
+            .values("stock")
+            .annotate(total=Sum("quantity"))
+            .values("total")
+        ),
+        Value(0),
+    )
+
+
+def balance_mismatches():
+    """Lots whose quantity disagrees with their movements, annotated with ``ledger_quantity``."""
+    return InventoryStock.objects.annotate(ledger_quantity=ledger_balance()).exclude(
+        quantity=F("ledger_quantity")
+    )
+
+
+@transaction_db.atomic
+def rebuild_stock_balances() -> int:
+    """Recompute every lot quantity from the ledger in a single UPDATE."""
+    # Terminals syncing the change feed have to pick up the corrected stock
+    InventoryItem.all_objects.filter(pk__in=balance_mismatches().values("item_id")).touch()
+    updated = InventoryStock.objects.update(quantity=ledger_balance())
+    rebuild_stock_levels()
+    rebuild_valuation()
+    return updated
+
+
+@transaction_db.atomic
+def rebuild_stock_levels():
+    """Recompute the per-location stock counters from the lots."""
+    StockLevel.objects.all().delete()
+    totals = InventoryStock.objects.values("location_id", "item_id").annotate(total=Sum("quantity"))
+    StockLevel.objects.bulk_create(
+        StockLevel(location_id=row["location_id"], item_id=row["item_id"], quantity=row["total"])
+        for row in totals
+    )
@@ -0,0 +1,380 @@
+"""
+Load generator simulating pharmacy counters, see ``manage.py loadtest``.
+
+Each worker process plays one terminal running a weighted mix of
+dispenses, voids, barcode lookups and deliveries over seeded items,
+either through the models or against a running server. Dispenses carry
+an idempotency key, and an operation that hits a database lock (a 503
+from the server in HTTP mode) is retried with the same key, like a
+terminal resending a request. With several locations the terminals are
+spread over branches that share no lots, so any slowdown compared to one
+branch comes from rows every write touches, such as the change feed
+counter. At the end the lots are checked against their ledger, their
+stock counters, ``inventory.reconcile`` and the valuation summary.
+"""
+import datetime
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, close_old_connections, transaction as transaction_db
+from django.db.models import F, Sum
+from django.forms import ValidationError
+from django.test import Client
+from django.utils.crypto import get_random_string
+
+from project.processes import process_pool
+
+from . import dispensing
+from .ledger import balance_mismatches
+from .models import (
+    MAIN_LOCATION_CODE,
+    CategoryType,
+    InventoryItem,
+    InventoryStock,
+    ItemBarcode,
+    Location,
+    PackagingType,
+    StockLevel,
+    SubcategoryType,
+    UnitType,
+)
+from .reconcile import discrepancies
+from .scanning import scan
+from .valuation import valuation_mismatches
+
+LOADTEST_BRAND = "Load test"
+LOADTEST_EMAIL = "loadtest@example.com"
+OPERATIONS = ("dispense", "void", "lookup", "delivery")
+DEFAULT_MIX = {"dispense": 45, "void": 5, "lookup": 40, "delivery": 10}
+
+GENERICS = [
+    ("Paracetamol", "500mg", "Tablet", CategoryType.PAIN_RELIEVERS, SubcategoryType.ANALGESICS),
+    ("Ibuprofen", "200mg", "Tablet", CategoryType.PAIN_RELIEVERS, SubcategoryType.PAIN_RELIEF),
+    ("Amoxicillin", "500mg", "Capsule", CategoryType.PRESCRIPTION_MEDICINES, SubcategoryType.ANTIBIOTICS),
+    ("Losartan", "50mg", "Tablet", CategoryType.PRESCRIPTION_MEDICINES, SubcategoryType.ANTIHYPERTENSIVES),
+    ("Cetirizine", "10mg", "Tablet", CategoryType.COUGH_AND_COLD, SubcategoryType.ANTIHISTAMINES),
+    ("Ascorbic Acid", "500mg", "Tablet", CategoryType.VITAMINS_SUPPLEMENTS, SubcategoryType.VITAMIN_C),
+    ("Magnesium Hydroxide", "400mg/5ml", "Liquid", CategoryType.ANTACIDS, SubcategoryType.ANTACID),
+]
+
+
+def parse_mix(value):
+    """Parse ``dispense=45,lookup=40,...`` into operation weights."""
+    mix = dict.fromkeys(OPERATIONS, 0)
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in mix:
+            raise ValueError(f"Unknown operation: {name.strip()}")
+        mix[name.strip()] = int(weight)
+    if not any(mix.values()):
+        raise ValueError("At least one operation needs a weight.")
+    return mix
+
+
+def unit_cost(rng):
+    return Decimal(rng.randint(100, 5000)) / 100
+
+
+def branches(count):
+    """Codes of ``count`` branches to spread terminals over, starting with the main one."""
+    codes = [MAIN_LOCATION_CODE]
+    Location.objects.get_or_create(code=MAIN_LOCATION_CODE, defaults={"name": "Main branch"})
+    for n in range(1, count):
+        Location.objects.get_or_create(code=f"LT{n}", defaults={"name": f"Load test branch {n}"})
+        codes.append(f"LT{n}")
+    return codes
+
+
+def loadtest_user():
+    User = get_user_model()
+    user = User.objects.filter(email=LOADTEST_EMAIL).first()
+    if user is None:
+        user = User.objects.create_user(email=LOADTEST_EMAIL, username=LOADTEST_EMAIL)
+    return user
+
+
+@transaction_db.atomic
+def seed(items, lots_per_item=3, rng=None, locations=1):
+    """
+    Make sure there are ``items`` load test items, each with a barcode and
+    ``lots_per_item`` lots of realistic quantities and expiry dates at
+    each of ``locations`` branches. Returns the number of items created.
+    """
+    rng = rng or random.Random(0)
+    user = loadtest_user()
+    existing = InventoryItem.objects.filter(brand_name=LOADTEST_BRAND).count()
+    today = datetime.date.today()
+    for n in range(existing, items):
+        generic, strength, form, category, subcategory = GENERICS[n % len(GENERICS)]
+        item = InventoryItem.objects.create(
+            category=category,
+            subcategory=subcategory,
+            item_name=f"{generic} {strength} #{n}",
+            brand_name=LOADTEST_BRAND,
+            generic_name=generic,
+            dosage_form=form,
+            strength_per_size=strength,
+            packaging=PackagingType.BOX,
+            quantity=100,
+            unit_size=UnitType.EACH,
+            created_by=user,
+        )
+        ItemBarcode.objects.create(code=f"LT{n:010d}", item=item)
+    for code in branches(locations):
+        location = Location.objects.get(code=code)
+        stocked = InventoryStock.objects.filter(location=location).values("item_id")
+        for item in InventoryItem.objects.filter(brand_name=LOADTEST_BRAND).exclude(pk__in=stocked):
+            for _ in range(lots_per_item):
+                InventoryStock.objects.create(
+                    item=item,
+                    location=location,
+                    quantity=rng.randint(50, 500),
+                    date_of_delivery=today - datetime.timedelta(days=rng.randint(0, 90)),
+                    expiration_date=today + datetime.timedelta(days=rng.randint(30, 720)),
+                    unit_cost=unit_cost(rng),
+                    created_by=user,
+                )
+    return max(items - existing, 0)
+
+
+class ModelTerminal:
+    """Runs operations in-process through the same functions the views call."""
+
+    def __init__(self, user_id, rng, location_code=MAIN_LOCATION_CODE):
+        self.user = get_user_model().objects.get(pk=user_id)
+        self.rng = rng
+        self.location = Location.objects.get(code=location_code)
+
+    def dispense(self, item_id, quantity, key):
+        item = InventoryItem.objects.get(pk=item_id)
+        return dispensing.dispense(item, quantity, self.user, location=self.location, idempotency_key=key)[0].pk
+
+    def void(self, transaction_id, key):
+        dispensing.void(transaction_id, idempotency_key=key)
+
+    def lookup(self, code):
+        return scan(code, self.location.pk)
+
+    def delivery(self, item_id):
+        today = datetime.date.today()
+        InventoryStock.objects.create(
+            item_id=item_id,
+            location=self.location,
+            quantity=self.rng.randint(50, 200),
+            date_of_delivery=today,
+            expiration_date=today + datetime.timedelta(days=self.rng.randint(180, 720)),
+            unit_cost=unit_cost(self.rng),
+            created_by=self.user,
+        )
+
+
+class HttpError(Exception):
+    pass
+
+
+class ServerBusy(Exception):
+    """The server hit a database lock and answered 503, the request can be resent."""
+
+
+class HttpTerminal(ModelTerminal):
+    """
+    Runs dispenses, voids and lookups against the server at ``url``.
+    There is no delivery endpoint, deliveries go through the models.
+    """
+
+    def __init__(self, user_id, rng, url, location_code=MAIN_LOCATION_CODE):
+        super().__init__(user_id, rng, location_code)
+        self.url = url.rstrip("/")
+        # Sign in through the shared session store instead of hashing a password per terminal
+        client = Client()
+        client.force_login(self.user)
+        self.csrf_token = get_random_string(32)
+        self.cookie = "; ".join([
+            f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}",
+            f"{settings.CSRF_COOKIE_NAME}={self.csrf_token}",
+        ])
+
+    def request(self, method, path, body=None, headers=None):
+        request = urllib.request.Request(
+            f"{self.url}{path}",
+            data=None if body is None else json.dumps(body).encode(),
+            method=method,
+            headers={
+                "Cookie": self.cookie,
+                "X-CSRFToken": self.csrf_token,
+                "Content-Type": "application/json",
+                **(headers or {}),
+            },
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            if e.code == 409:
+                raise ValidationError(json.loads(e.read())["error"])
+            if e.code == 503:
+                raise ServerBusy(f"{method} {path} answered 503")
+            raise HttpError(f"{method} {path} answered {e.code}")
+        except urllib.error.URLError as e:
+            raise HttpError(f"{method} {path} failed: {e.reason}")
+
+    def dispense(self, item_id, quantity, key):
+        return self.request(
+            "POST",
+            "/inventory/dispense/",
+            {"item": str(item_id), "quantity": quantity, "location": self.location.code},
+            {"Idempotency-Key": key},
+        )["id"]
+
+    def void(self, transaction_id, key):
+        self.request("POST", f"/inventory/transactions/{transaction_id}/void/", headers={"Idempotency-Key": key})
+
+    def lookup(self, code):
+        return self.request("GET", f"/inventory/scan/{code}/?location={self.location.code}")
+
+
+def run_terminal(options):
+    """
+    Run ``options["operations"]`` operations (or for ``options["duration"]``
+    seconds) as one terminal. Returns latencies and outcome counts.
+    """
+    worker = options["worker"]
+    rng = random.Random(options["seed"] + worker)
+    if options.get("url"):
+        terminal = HttpTerminal(options["user_id"], rng, options["url"], options["location"])
+    else:
+        terminal = ModelTerminal(options["user_id"], rng, options["location"])
+    items = options["items"]
+    names = [name for name in OPERATIONS if options["mix"][name]]
+    weights = [options["mix"][name] for name in names]
+
+    latencies = defaultdict(list)
+    outcomes = Counter()
+    dispensed = []
+    started = time.time()
+    deadline = time.monotonic() + options["duration"] if options.get("duration") else None
+    count = 0
+    while (count < options["operations"]) if deadline is None else (time.monotonic() < deadline):
+        count += 1
+        name = rng.choices(names, weights)[0]
+        if name == "void" and not dispensed:
+            name = "dispense"
+        item_id, code = rng.choice(items)
+        if name == "dispense":
+            quantity = rng.randint(1, 5)
+            operation = lambda key: dispensed.append(terminal.dispense(item_id, quantity, key))
+        elif name == "void":
+            voided = dispensed.pop(rng.randrange(len(dispensed)))
+            operation = lambda key: terminal.void(voided, key)
+        elif name == "lookup":
+            operation = lambda key: terminal.lookup(code)
+        else:
+            operation = lambda key: terminal.delivery(item_id)
+        # Retries resend the same key, so a dispense that did commit is not made twice
+        key = uuid.uuid4().hex
+
+        start = time.perf_counter()
+        for attempt in range(options["retries"] + 1):
+            try:
+                operation(key)
+                outcomes[(name, "ok")] += 1
+                break
+            except ValidationError:
+                outcomes[(name, "rejected")] += 1  # Out of stock
+                break
+            except (OperationalError, ServerBusy) as e:
+                close_old_connections()
+                if isinstance(e, OperationalError) and not dispensing.is_lock_error(e):
+                    outcomes[(name, "error")] += 1
+                    break
+                outcomes[(name, "lock")] += 1
+                if attempt == options["retries"]:
+                    outcomes[(name, "failed")] += 1
+                    break
+                time.sleep(rng.uniform(0, 0.01 * 2 ** attempt))
+            except HttpError:
+                outcomes[(name, "error")] += 1
+                break
+        latencies[name].append(time.perf_counter() - start)
+    return {"latencies": dict(latencies), "outcomes": dict(outcomes), "started": started, "finished": time.time()}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def consistency():
+    """Counts of lots or counters that disagree after the run, all should be 0."""
+    lots = InventoryStock.objects.values("location_id", "item_id").annotate(total=Sum("quantity"))
+    totals = {(row["location_id"], row["item_id"]): row["total"] for row in lots}
+    levels = {
+        (location_id, item_id): quantity
+        for location_id, item_id, quantity in StockLevel.objects.values_list("location_id", "item_id", "quantity")
+    }
+    return {
+        "lots out of line with their ledger": balance_mismatches().count(),
+        "lots that do not reconcile": discrepancies().count(),
+        "stock counters out of line with their lots": sum(
+            totals.get(key, 0) != levels.get(key, 0) for key in totals.keys() | levels.keys()
+        ),
+        "lots reserved beyond their quantity": InventoryStock.objects.filter(
+            quantity__lt=F("reserved_quantity")
+        ).count(),
+        "valuation rows out of line with their lots": len(valuation_mismatches()),
+    }
+
+
+def run(workers, operations=200, duration=None, mix=None, retries=3, seed=0, url=None, locations=1):
+    """
+    Run ``workers`` terminals at once, in processes unless ``workers`` is 1,
+    taking turns over ``locations`` branches.
+    Returns ``(elapsed seconds, merged results)``, where the elapsed time
+    spans the terminals' runs without starting the processes.
+    """
+    items = list(
+        InventoryItem.objects.filter(brand_name=LOADTEST_BRAND)
+        .order_by("item_name")
+        .values_list("pk", "barcodes__code")
+    )
+    if not items:
+        raise ValueError("There are no load test items, seed them first.")
+    user = loadtest_user()
+    codes = branches(locations)
+    jobs = [
+        {
+            "worker": worker,
+            "seed": seed,
+            "user_id": user.pk,
+            "items": items,
+            "mix": mix or DEFAULT_MIX,
+            "operations": operations,
+            "duration": duration,
+            "retries": retries,
+            "url": url,
+            "location": codes[worker % len(codes)],
+        }
+        for worker in range(workers)
+    ]
+
+    if workers == 1:
+        results = [run_terminal(job) for job in jobs]
+    else:
+        with process_pool(workers) as pool:
+            results = list(pool.map(run_terminal, jobs))
+    elapsed = max(result["finished"] for result in results) - min(result["started"] for result in results)
+
+    merged = {"latencies": defaultdict(list), "outcomes": Counter()}
+    for result in results:
+        for name, values in result["latencies"].items():
+            merged["latencies"][name] += values
+        merged["outcomes"].update(result["outcomes"])
+    return elapsed, merged
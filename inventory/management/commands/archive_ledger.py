@@ -0,0 +1,30 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.archive import DEFAULT_BATCH_SIZE, archive_ledger
+
+
+class Command(BaseCommand):
+    help = "Move closed transactions, stock records and lots older than --before into the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--before", required=True, help="Cutoff date (YYYY-MM-DD).")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            before = datetime.date.fromisoformat(options["before"])
+        except ValueError:
+            raise CommandError(f"Invalid date: {options['before']}")
+        if before > datetime.date.today():
+            raise CommandError("--before cannot be in the future.")
+
+        def report(kind, moved):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"Archived {moved} {kind}")
+
+        totals = archive_ledger(before, options["batch_size"], on_batch=report)
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {totals['transactions']} transactions and {totals['lots']} lots before {before}."
+        ))
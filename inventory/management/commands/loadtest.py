@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import loadtest
+from inventory.loadtest import OPERATIONS, consistency, parse_mix, percentile, run, seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate pharmacy counters dispensing, voiding, scanning and receiving "
+        "stock at once, then report throughput, latency, lock errors and "
+        "whether stock is still consistent. It writes to the configured "
+        "database, run it against a copy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=20, help="Terminals, each in its own process.")
+        parser.add_argument("--operations", type=int, default=200, help="Operations per terminal.")
+        parser.add_argument("--duration", type=float, help="Run for this many seconds instead.")
+        parser.add_argument(
+            "--mix",
+            type=parse_mix,
+            default=loadtest.DEFAULT_MIX,
+            help="Operation weights, e.g. dispense=45,void=5,lookup=40,delivery=10.",
+        )
+        parser.add_argument("--retries", type=int, default=3, help="Retries of an operation hitting a lock.")
+        parser.add_argument("--items", type=int, default=500, help="Load test items to seed.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for repeatable runs.")
+        parser.add_argument("--url", help="Run against the server at this URL instead of the models.")
+        parser.add_argument(
+            "--locations",
+            type=int,
+            default=1,
+            help=(
+                "Spread the terminals over this many branches with their own lots. "
+                "Compare with a run at one branch to see contention on rows every write shares."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1 or options["locations"] < 1:
+            raise CommandError("At least one worker and one location are needed.")
+        created = seed(options["items"], locations=options["locations"])
+        if created:
+            self.stdout.write(f"Seeded {created} items.")
+
+        elapsed, results = run(
+            options["workers"],
+            operations=options["operations"],
+            duration=options["duration"],
+            mix=options["mix"],
+            retries=options["retries"],
+            seed=options["seed"],
+            url=options["url"],
+            locations=options["locations"],
+        )
+        outcomes = results["outcomes"]
+        total = sum(len(values) for values in results["latencies"].values())
+        self.stdout.write(
+            f"{total} operations by {options['workers']} terminals at {options['locations']} branches "
+            f"in {elapsed:.1f} s: "
+            f"{total / elapsed:.1f} per second"
+        )
+        for name in OPERATIONS:
+            latencies = results["latencies"].get(name)
+            if not latencies:
+                continue
+            self.stdout.write(
+                f"{name}: {len(latencies) / elapsed:.1f}/s, "
+                f"p50 {percentile(latencies, 0.5) * 1000:.1f} ms, "
+                f"p95 {percentile(latencies, 0.95) * 1000:.1f} ms, "
+                f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms, "
+                f"max {max(latencies) * 1000:.1f} ms; "
+                f"{outcomes.get((name, 'ok'), 0)} ok, "
+                f"{outcomes.get((name, 'rejected'), 0)} out of stock, "
+                f"{outcomes.get((name, 'lock'), 0)} lock errors, "
+                f"{outcomes.get((name, 'failed'), 0)} failed after retries, "
+                f"{outcomes.get((name, 'error'), 0)} other errors"
+            )
+
+        problems = consistency()
+        for check, count in problems.items():
+            style = self.style.SUCCESS if not count else self.style.ERROR
+            self.stdout.write(style(f"{check}: {count}"))
+        if any(problems.values()):
+            raise CommandError("Stock is inconsistent after the load test.")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from inventory.ledger import balance_mismatches, rebuild_stock_balances
+
+
+class Command(BaseCommand):
+    help = "Recompute every InventoryStock quantity from the stock movement ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only list lots whose quantity disagrees with the ledger.",
+        )
+
+    def handle(self, *args, **options):
+        mismatches = balance_mismatches().values_list("pk", "quantity", "ledger_quantity")
+        for pk, quantity, ledger_quantity in mismatches:
+            self.stdout.write(f"Lot {pk}: quantity {quantity}, ledger {ledger_quantity}")
+        if options["check"]:
+            return
+
+        updated = rebuild_stock_balances()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {updated} lot balances from the ledger."))
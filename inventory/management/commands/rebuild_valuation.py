@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from inventory.valuation import rebuild_valuation, valuation_mismatches
+
+
+class Command(BaseCommand):
+    help = "Recompute the inventory valuation summary from the lots."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only list summary rows that disagree with the lots.",
+        )
+
+    def handle(self, *args, **options):
+        for (category, subcategory, expiration_date), summary, lots in valuation_mismatches():
+            self.stdout.write(
+                f"{category} / {subcategory} expiring {expiration_date}: summary {summary[0]} "
+                f"worth {summary[1]}, lots {lots[0]} worth {lots[1]}"
+            )
+        if options["check"]:
+            return
+
+        rows = rebuild_valuation()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} valuation summary rows from the lots."))
@@ -0,0 +1,48 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from inventory.reconcile import DEFAULT_CHUNK_SIZE, reconcile, repair
+
+
+class Command(BaseCommand):
+    help = (
+        "Check every lot's quantity against its received quantity minus the "
+        "quantities allocated, written off and transferred out of it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=os.cpu_count())
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Items checked per query.",
+        )
+        parser.add_argument(
+            "--repair",
+            action="store_true",
+            help="Set mismatched lots to their expected quantity.",
+        )
+
+    def handle(self, *args, **options):
+        mismatched = []
+        for pk, item_id, quantity, expected in reconcile(options["processes"], options["chunk_size"]):
+            self.stdout.write(f"Lot {pk} of item {item_id}: quantity {quantity}, expected {expected}")
+            mismatched.append(pk)
+
+        if not mismatched:
+            self.stdout.write(self.style.SUCCESS("All lots reconcile."))
+            return
+        if not options["repair"]:
+            self.stdout.write(self.style.WARNING(f"{len(mismatched)} lots do not reconcile."))
+            return
+
+        unrepairable = []
+        for start in range(0, len(mismatched), options["chunk_size"]):
+            unrepairable += repair(mismatched[start:start + options["chunk_size"]])
+        for pk in unrepairable:
+            self.stderr.write(f"Lot {pk} cannot be repaired: its reservations exceed the expected quantity.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Repaired {len(mismatched) - len(unrepairable)} of {len(mismatched)} lots."
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from inventory.writeoffs import expired_lots, write_off_expired, write_off_quantity
+
+
+class Command(BaseCommand):
+    help = "Zero out every lot past its expiration date and log the written-off quantities."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be written off.",
+        )
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            totals = expired_lots().aggregate(lots=Count("pk"), quantity=Sum(write_off_quantity()))
+            self.stdout.write(f"{totals['lots']} expired lots with {totals['quantity'] or 0} units.")
+            return
+
+        write_offs = write_off_expired()
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote off {sum(w.quantity for w in write_offs)} units from {len(write_offs)} expired lots."
+        ))
@@ -0,0 +1,40 @@
+"""
+Prometheus metrics for inventory operations, exposed at /metrics.
+"""
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Histogram
+
+OPERATIONS = Counter(
+    "inventory_operations_total",
+    "Inventory operations by outcome.",
+    ["operation", "outcome"],
+)
+OPERATION_LATENCY = Histogram(
+    "inventory_operation_seconds",
+    "Time taken by inventory operations, including the commit.",
+    ["operation"],
+)
+ALLOCATION_LOTS = Histogram(
+    "inventory_allocation_lots",
+    "Number of lots a single dispense was allocated from.",
+    buckets=(1, 2, 3, 4, 5, 8, 13, 21),
+)
+STOCK_OUTS = Counter(
+    "inventory_stock_out_rejections_total",
+    "Dispenses rejected because there was not enough sellable stock.",
+)
+
+
+@contextmanager
+def track(operation):
+    """Count and time one ``operation`` (dispense, void, edit or delivery)."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        OPERATION_LATENCY.labels(operation).observe(time.perf_counter() - start)
+        OPERATIONS.labels(operation, outcome).inc()
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:59
+
+import inventory.models
+from django.db import migrations
+from django.db.models import Case, Value, When
+
+BATCH_SIZE = 200
+
+
+def rewrite_item_ids(apps, schema_editor):
+    """
+    Rewrite every item id, and the foreign keys pointing at it, into the
+    form the UUID column expects before the column type changes.
+
+    Backends without a native UUID type store the 32 character hex form,
+    the others get the canonical string so the type cast succeeds. Ids
+    that were never UUIDs are mapped through ``legacy_item_id`` so they
+    can still be looked up by their old value afterwards.
+    """
+    InventoryItem = apps.get_model("inventory", "InventoryItem")
+    InventoryStock = apps.get_model("inventory", "InventoryStock")
+    InventoryTransaction = apps.get_model("inventory", "InventoryTransaction")
+    native = schema_editor.connection.features.has_native_uuid_field
+
+    old_ids = list(InventoryItem.objects.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(old_ids), BATCH_SIZE):
+        mapping = {}
+        for old_id in old_ids[start:start + BATCH_SIZE]:
+            new_id = inventory.models.legacy_item_id(old_id)
+            new_id = str(new_id) if native else new_id.hex
+            if new_id != old_id:
+                mapping[old_id] = new_id
+        if not mapping:
+            continue
+
+        for model, field in (
+            (InventoryStock, "item_id"),
+            (InventoryTransaction, "item_id"),
+            (InventoryItem, "id"),
+        ):
+            model.objects.filter(**{f"{field}__in": list(mapping)}).update(**{
+                field: Case(
+                    *(When(**{field: old}, then=Value(new)) for old, new in mapping.items())
+                )
+            })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_rename_count_inventorystock_quantity'),
+    ]
+
+    operations = [
+        migrations.RunPython(rewrite_item_ids, migrations.RunPython.noop),
+    ]
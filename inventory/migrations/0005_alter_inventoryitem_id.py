@@ -0,0 +1,20 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:59
+
+import inventory.models
+import uuid
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_rewrite_item_ids'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='inventoryitem',
+            name='id',
+            field=inventory.models.ItemIdField(default=uuid.uuid4, primary_key=True, serialize=False),
+        ),
+    ]
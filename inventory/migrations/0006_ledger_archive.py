@@ -0,0 +1,66 @@
+# Generated by Django 5.1.7 on 2026-10-19 05:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_alter_inventoryitem_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='inventorytransaction',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='ArchivedInventoryStock',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('date_of_delivery', models.DateField()),
+                ('expiration_date', models.DateField()),
+                ('quantity', models.PositiveIntegerField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.inventoryitem')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedInventoryTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.inventoryitem')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedStockRecord',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('stock_id', models.IntegerField(db_index=True)),
+                ('quantity', models.PositiveIntegerField()),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.archivedinventorytransaction')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LedgerSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField()),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.inventoryitem')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('item', 'period'), name='unique_ledger_summary_period')],
+            },
+        ),
+    ]
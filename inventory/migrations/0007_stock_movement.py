@@ -0,0 +1,86 @@
+# Generated by Django 5.1.7 on 2026-10-19 05:04
+
+import datetime
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def seed_opening_balances(apps, schema_editor):
+    """
+    Give every existing lot a received movement for the quantity it was
+    delivered with, followed by a dispensed movement per stock record, so
+    the ledger adds up to the current quantities.
+    """
+    InventoryStock = apps.get_model("inventory", "InventoryStock")
+    StockRecord = apps.get_model("inventory", "StockRecord")
+    StockMovement = apps.get_model("inventory", "StockMovement")
+
+    lots = InventoryStock.objects.order_by("pk")
+    last_pk = 0
+    while batch := list(lots.filter(pk__gt=last_pk)[:BATCH_SIZE]):
+        last_pk = batch[-1].pk
+        records = list(
+            StockRecord.objects.filter(stock__in=batch).select_related("transaction")
+        )
+        dispensed = {}
+        for record in records:
+            dispensed[record.stock_id] = dispensed.get(record.stock_id, 0) + record.quantity
+
+        movements = [
+            StockMovement(
+                stock_id=lot.pk,
+                item_id=lot.item_id,
+                kind="received",
+                quantity=lot.quantity + dispensed.get(lot.pk, 0),
+                created_by_id=lot.created_by_id,
+                created_at=datetime.datetime.combine(
+                    lot.date_of_delivery, datetime.time.min, tzinfo=datetime.timezone.utc
+                ),
+            )
+            for lot in batch
+        ]
+        movements += [
+            StockMovement(
+                stock_id=record.stock_id,
+                item_id=record.transaction.item_id,
+                kind="dispensed",
+                quantity=-record.quantity,
+                transaction_id=record.transaction_id,
+                created_by_id=record.transaction.created_by_id,
+                created_at=record.transaction.created_at,
+            )
+            for record in records
+        ]
+        StockMovement.objects.bulk_create(
+            [movement for movement in movements if movement.quantity]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_ledger_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('received', 'Received'), ('dispensed', 'Dispensed'), ('reversed', 'Reversed'), ('written_off', 'Written off'), ('adjusted', 'Adjusted')], max_length=16)),
+                ('quantity', models.IntegerField()),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.inventoryitem')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.inventorystock')),
+                ('transaction', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='inventory.inventorytransaction')),
+            ],
+        ),
+        migrations.RunPython(seed_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.1.7 on 2026-10-19 05:40
+
+import django.db.models.deletion
+import inventory.models
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def assign_main_location(apps, schema_editor):
+    """Put all existing stock in the main branch and seed its counters."""
+    Location = apps.get_model("inventory", "Location")
+    InventoryStock = apps.get_model("inventory", "InventoryStock")
+    InventoryTransaction = apps.get_model("inventory", "InventoryTransaction")
+    StockMovement = apps.get_model("inventory", "StockMovement")
+    StockLevel = apps.get_model("inventory", "StockLevel")
+
+    main, _ = Location.objects.get_or_create(
+        code=inventory.models.MAIN_LOCATION_CODE,
+        defaults={"name": "Main branch"},
+    )
+    for model in (InventoryStock, InventoryTransaction, StockMovement):
+        model.objects.update(location=main)
+
+    totals = InventoryStock.objects.values("item_id").annotate(total=Sum("quantity"))
+    StockLevel.objects.bulk_create(
+        StockLevel(location=main, item_id=row["item_id"], quantity=row["total"])
+        for row in totals
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_stock_movement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=16, unique=True)),
+                ('name', models.CharField(max_length=128)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='kind',
+            field=models.CharField(choices=[('received', 'Received'), ('dispensed', 'Dispensed'), ('reversed', 'Reversed'), ('written_off', 'Written off'), ('adjusted', 'Adjusted'), ('transferred_out', 'Transferred out'), ('transferred_in', 'Transferred in')], max_length=16),
+        ),
+        migrations.AddField(
+            model_name='inventorystock',
+            name='location',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='inventory.location'),
+        ),
+        migrations.AddField(
+            model_name='inventorytransaction',
+            name='location',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='inventory.location'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='location',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='inventory.location'),
+        ),
+        migrations.CreateModel(
+            name='StockLevel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.inventoryitem')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.location')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('location', 'item'), name='unique_stock_level')],
+            },
+        ),
+        migrations.RunPython(assign_main_location, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-19 05:40
+
+import django.db.models.deletion
+import inventory.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_locations'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='inventorystock',
+            name='location',
+            field=models.ForeignKey(default=inventory.models.default_location, on_delete=django.db.models.deletion.PROTECT, to='inventory.location'),
+        ),
+        migrations.AlterField(
+            model_name='inventorytransaction',
+            name='location',
+            field=models.ForeignKey(default=inventory.models.default_location, on_delete=django.db.models.deletion.PROTECT, to='inventory.location'),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='location',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.location'),
+        ),
+    ]
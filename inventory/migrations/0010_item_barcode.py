@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-19 05:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_location_not_null'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemBarcode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=64, unique=True)),
+                ('level', models.CharField(choices=[('unit', 'Unit'), ('pack', 'Pack')], default='unit', max_length=8)),
+                ('units_per_pack', models.PositiveIntegerField(default=1)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='barcodes', to='inventory.inventoryitem')),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-19 05:16
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_item_barcode'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=128, unique=True)),
+                ('operation', models.CharField(choices=[('dispense', 'Dispense'), ('void', 'Void')], max_length=16)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('transaction_pk', models.BigIntegerField(null=True)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('transaction', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='inventory.inventorytransaction')),
+            ],
+        ),
+    ]
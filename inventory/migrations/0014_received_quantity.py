@@ -0,0 +1,35 @@
+# Generated by Django 5.1.7 on 2026-10-19 05:29
+
+from django.db import migrations, models
+from django.db.models import IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_received_quantity(apps, schema_editor):
+    """Take each lot's received quantity from its delivery and correction movements."""
+    InventoryStock = apps.get_model("inventory", "InventoryStock")
+    StockMovement = apps.get_model("inventory", "StockMovement")
+
+    received = StockMovement.objects.filter(
+        stock=OuterRef("pk"),
+        kind__in=["received", "transferred_in", "adjusted"],
+    ).order_by().values("stock").annotate(total=Sum("quantity")).values("total")
+    InventoryStock.objects.update(
+        received_quantity=Coalesce(Subquery(received), Value(0), output_field=IntegerField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_stock_write_off'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventorystock',
+            name='received_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_received_quantity, migrations.RunPython.noop),
+    ]
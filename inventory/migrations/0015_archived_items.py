@@ -0,0 +1,45 @@
+# Generated by Django 5.1.7 on 2026-10-19 05:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_received_quantity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='is_archived',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='inventorystock',
+            name='item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.inventoryitem'),
+        ),
+        migrations.AlterField(
+            model_name='inventorytransaction',
+            name='created_by',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='inventorytransaction',
+            name='item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.inventoryitem'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['item_name'], name='active_item_name_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.7 on 2026-10-19 05:52
+
+from django.db import migrations, models
+
+
+def number_existing_items(apps, schema_editor):
+    """Mark every existing item as changed, so a first sync from 0 sees them all."""
+    InventoryItem = apps.get_model("inventory", "InventoryItem")
+    ChangeSequence = apps.get_model("inventory", "ChangeSequence")
+
+    InventoryItem.objects.update(change_seq=1)
+    ChangeSequence.objects.create(name="items", value=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0015_archived_items'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('name', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(number_existing_items, migrations.RunPython.noop),
+    ]
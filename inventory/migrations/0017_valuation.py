@@ -0,0 +1,54 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:03
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def summarize_existing_lots(apps, schema_editor):
+    """Existing lots have no unit cost yet, so only their quantities count."""
+    InventoryStock = apps.get_model("inventory", "InventoryStock")
+    ValuationSummary = apps.get_model("inventory", "ValuationSummary")
+
+    totals = InventoryStock.objects.order_by().values(
+        "item__category", "item__subcategory", "expiration_date"
+    ).annotate(total=models.Sum("quantity")).exclude(total=0)
+    ValuationSummary.objects.bulk_create(
+        ValuationSummary(
+            category=row["item__category"],
+            subcategory=row["item__subcategory"],
+            expiration_date=row["expiration_date"],
+            quantity=row["total"],
+        )
+        for row in totals
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0016_item_change_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventorystock',
+            name='unit_cost',
+            field=models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=12),
+        ),
+        migrations.CreateModel(
+            name='ValuationSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('Antacids', 'Antacids'), ('Cough and Cold', 'Cough and Cold'), ('Digestive Health', 'Digestive Health'), ('Eye Care', 'Eye Care'), ('Medical Supplies & Personal Care', 'Medical Supplies & Personal Care'), ('Medical Supplies and Personal Care Products', 'Medical Supplies and Personal Care Products'), ('Over-the-Counter (OTC) Medicines', 'Over-the-Counter (OTC) Medicines'), ('Pain Relievers', 'Pain Relievers'), ('Pharmacy Machineries and Equipment', 'Pharmacy Machineries and Equipment'), ('Prescription Medicines', 'Prescription Medicines'), ('Skin Care', 'Skin Care'), ('Topical Treatments', 'Topical Treatments'), ('Vitamins and Supplements', 'Vitamins and Supplements')], max_length=64)),
+                ('subcategory', models.CharField(choices=[('Antacid', 'Antacid'), ('Decongestants', 'Decongestants'), ('Expectorants', 'Expectorants'), ('Antihistamines', 'Antihistamines'), ('Antitussives', 'Antitussives'), ('Laxatives', 'Laxatives'), ('Lubricating Drops', 'Lubricating Drops'), ('First Aid Supplies', 'First Aid Supplies'), ('Personal Hygiene', 'Personal Hygiene'), ('Skin Care', 'Skin Care'), ('Incontinence Care', 'Incontinence Care'), ('Baby Care', 'Baby Care'), ('Eye Care', 'Eye Care'), ('Medical Supplies', 'Medical Supplies'), ('Bandages and Dressings', 'Bandages and Dressings'), ('First Aid Kits', 'First Aid Kits'), ('Pain Relievers', 'Pain Relievers'), ('Cough and Cold Remedies', 'Cough and Cold Remedies'), ('Analgesics', 'Analgesics'), ('Blood Pressure Monitors', 'Blood Pressure Monitors'), ('Thermometers', 'Thermometers'), ('Nebulizers', 'Nebulizers'), ('Oxygen Equipment', 'Oxygen Equipment'), ('Pulse Oximeters', 'Pulse Oximeters'), ('Surgical Instruments', 'Surgical Instruments'), ('Antibiotics', 'Antibiotics'), ('Antihypertensives', 'Antihypertensives'), ('Anti-Diabetic Medications', 'Anti-Diabetic Medications'), ('Sunscreen', 'Sunscreen'), ('Moisturizer', 'Moisturizer'), ('Acne Treatment', 'Acne Treatment'), ('Anti-fungal', 'Anti-fungal'), ('Anti-inflammatory', 'Anti-inflammatory'), ('Pain Relief', 'Pain Relief'), ('Multivitamins', 'Multivitamins'), ('Vitamin C', 'Vitamin C'), ('Omega-3 Fatty Acids', 'Omega-3 Fatty Acids'), ('Iron Supplements', 'Iron Supplements'), ('Vitamin D', 'Vitamin D'), ('Vitamin B Complex', 'Vitamin B Complex'), ('Vitamin E', 'Vitamin E'), ('Calcium', 'Calcium'), ('Iron', 'Iron'), ('Omega-3', 'Omega-3'), ('Probiotics', 'Probiotics'), ('Herbal Supplements', 'Herbal Supplements'), ('Joint Health', 'Joint Health'), ('Energy & Endurance', 'Energy & Endurance')], max_length=64)),
+                ('expiration_date', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('value', models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=18)),
+            ],
+            options={
+                'verbose_name_plural': 'valuation summaries',
+                'constraints': [models.UniqueConstraint(fields=('category', 'subcategory', 'expiration_date'), name='unique_valuation_summary')],
+            },
+        ),
+        migrations.RunPython(summarize_existing_lots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0017_valuation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='item',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to='inventory.inventoryitem'),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='stock',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to='inventory.inventorystock'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0018_keep_ledger_of_deleted_lots'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='ledgersummary',
+            name='unique_ledger_summary_period',
+        ),
+        migrations.AddField(
+            model_name='archivedinventorystock',
+            name='location',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='inventory.location'),
+        ),
+        migrations.AddField(
+            model_name='archivedinventorytransaction',
+            name='location',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='inventory.location'),
+        ),
+        migrations.AddField(
+            model_name='ledgersummary',
+            name='location',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='inventory.location'),
+        ),
+        migrations.AddConstraint(
+            model_name='ledgersummary',
+            constraint=models.UniqueConstraint(fields=('item', 'location', 'period'), name='unique_ledger_summary_period'),
+        ),
+    ]
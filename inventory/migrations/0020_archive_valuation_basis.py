@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:25
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0019_archive_locations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedinventorystock',
+            name='received_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='archivedinventorystock',
+            name='unit_cost',
+            field=models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=12),
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+from django.utils import timezone
+
+from jobs import cron
+
+# Nightly maintenance, in the TIME_ZONE setting's local time
+DEFAULT_SCHEDULES = [
+    ("Write off expired stock", "inventory.tasks.write_off_expired_stock", "0 1 * * *"),
+    ("Archive closed ledger rows", "inventory.tasks.archive_ledger", "0 2 * * *"),
+    ("Purge expired idempotency keys", "inventory.tasks.purge_idempotency_keys", "30 2 * * *"),
+    ("Release expired reservations", "inventory.tasks.release_expired_reservations", "*/5 * * * *"),
+]
+
+
+def add_default_schedules(apps, schema_editor):
+    PeriodicJob = apps.get_model("jobs", "PeriodicJob")
+    now = timezone.now()
+    for name, task, schedule in DEFAULT_SCHEDULES:
+        PeriodicJob.objects.get_or_create(
+            name=name,
+            defaults={"task": task, "schedule": schedule, "next_run_at": cron.next_run(schedule, now)},
+        )
+
+
+def remove_default_schedules(apps, schema_editor):
+    PeriodicJob = apps.get_model("jobs", "PeriodicJob")
+    PeriodicJob.objects.filter(name__in=[name for name, _, _ in DEFAULT_SCHEDULES]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0020_archive_valuation_basis'),
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_default_schedules, remove_default_schedules),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:42
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0021_default_periodic_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changesequence',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
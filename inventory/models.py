@@ -1,12 +1,21 @@
 import datetime
 import uuid
+from collections import defaultdict
+from contextlib import nullcontext
+from decimal import Decimal
 import django
 from django.db import models
 from django.contrib.auth import get_user_model
-from django.db import transaction as transaction_db
+from django.db import IntegrityError, transaction as transaction_db
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.forms import ValidationError
 from django.utils.functional import cached_property
 
+from project.softdelete import ActiveManager, Archivable, ArchivableQuerySet
+
+from . import metrics, signals
+
 User = get_user_model()
 
 class UnitType(models.TextChoices):
@@ -117,9 +126,83 @@ class PackagingType(models.TextChoices):
     THIRTY_PER_BOTTLE = "30_per_bottle", "30's per bottle"
     SIXTY_PER_BOTTLE = "60_per_bottle", "60's per bottle"
 
+# Namespace used to derive stable UUIDs for item ids that predate ItemIdField.
+LEGACY_ITEM_ID_NAMESPACE = uuid.UUID("5b0f9e52-3c57-4c1e-9a43-2f1d8e7c6a10")
+
+
+def legacy_item_id(value) -> uuid.UUID:
+    """Map any old CharField item id onto the UUID it was migrated to."""
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return uuid.uuid5(LEGACY_ITEM_ID_NAMESPACE, str(value))
+
+
+class ItemIdField(models.UUIDField):
+    """
+    Native UUID primary key that still accepts the free-form string ids
+    items had before it, so lookups by an old id keep resolving.
+    """
+
+    def to_python(self, value):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        if isinstance(value, int):
+            return super().to_python(value)
+        return legacy_item_id(value)
+
+
+ITEM_CHANGES = "items"
+
+
+class ChangeSequenceManager(models.Manager):
+    def next_value(self, name):
+        """
+        Take the next number of the sequence ``name``. The counter row stays
+        locked until the caller's transaction commits, so numbers become
+        visible in the order they were taken.
+        """
+        now = django.utils.timezone.now()
+        with transaction_db.atomic():
+            if not self.filter(pk=name).update(value=models.F("value") + 1, updated_at=now):
+                try:
+                    with transaction_db.atomic():
+                        self.create(name=name, value=1, updated_at=now)
+                except IntegrityError:
+                    # Another transaction created the counter first
+                    self.filter(pk=name).update(value=models.F("value") + 1, updated_at=now)
+            return self.filter(pk=name).values_list("value", flat=True).get()
+
+
+class ChangeSequence(models.Model):
+    """Monotonic counter behind the ``change_seq`` of changed rows, see ``inventory.changes``."""
+    name = models.CharField(max_length=32, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=django.utils.timezone.now)
+
+    objects = ChangeSequenceManager()
+
+
+class InventoryItemQuerySet(ArchivableQuerySet):
+    # Items changed together share a change_seq, so each of these is one UPDATE
+
+    @transaction_db.atomic
+    def touch(self) -> int:
+        """Mark every item in the queryset as changed."""
+        return self.update(change_seq=ChangeSequence.objects.next_value(ITEM_CHANGES))
+
+    @transaction_db.atomic
+    def archive(self) -> int:
+        return super().archive(change_seq=ChangeSequence.objects.next_value(ITEM_CHANGES))
+
+    @transaction_db.atomic
+    def restore(self) -> int:
+        return super().restore(change_seq=ChangeSequence.objects.next_value(ITEM_CHANGES))
+
+
 # Create your models here.
-class InventoryItem(models.Model):
-    id = models.CharField(primary_key=True, default=uuid.uuid4, max_length=128)
+class InventoryItem(Archivable):
+    id = ItemIdField(primary_key=True, default=uuid.uuid4)
     category = models.CharField(
         max_length=64,
         choices=CategoryType.choices,
@@ -145,10 +228,28 @@ class InventoryItem(models.Model):
         default=UnitType.EACH,
     )
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL,null=True)
+    # Raised on every change to the item, its barcodes or its stock, see inventory.changes
+    change_seq = models.BigIntegerField(default=0, db_index=True)
+
+    objects = ActiveManager.from_queryset(InventoryItemQuerySet)()
+    all_objects = InventoryItemQuerySet.as_manager()  # Including archived items
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["item_name"],
+                condition=models.Q(is_archived=False),
+                name="active_item_name_idx",
+            ),
+        ]
 
     @cached_property
     def stocks(self) -> int:
-        return InventoryStock.objects.filter(item=self).aggregate(models.Sum("quantity"))["quantity__sum"]
+        return StockLevel.objects.filter(item=self).aggregate(models.Sum("quantity"))["quantity__sum"]
+
+    def stock_at(self, location) -> int:
+        level = StockLevel.objects.filter(item=self, location=location).first()
+        return level.quantity if level else 0
 
     
     def clean(self):
@@ -160,67 +261,152 @@ class InventoryItem(models.Model):
             raise ValidationError(f"Invalid Subcategory type: {self.subcategory}")
         if self.packaging not in PackagingType.values:
             raise ValidationError(f"Invalid Packaging type: {self.packaging}")
+    @transaction_db.atomic
     def save(self, *args, **kwargs):
         self.clean()  # Call validation before saving
+        self.change_seq = ChangeSequence.objects.next_value(ITEM_CHANGES)
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "change_seq"}
+        previous = None
+        if not self._state.adding:
+            previous = InventoryItem.all_objects.filter(pk=self.pk).values_list("category", "subcategory").first()
         super().save(*args, **kwargs)
+        if previous and previous != (self.category, self.subcategory):
+            ValuationSummary.objects.recategorize(self, *previous)
     
 
+MAIN_LOCATION_CODE = "MAIN"
+
+
+class Location(models.Model):
+    """A pharmacy branch. Lots, dispenses and stock counters are scoped to one."""
+    code = models.CharField(max_length=16, unique=True)
+    name = models.CharField(max_length=128)
+
+    def __str__(self):
+        return self.name
+
+
+def default_location():
+    """The main branch, used by single-branch deployments and when no branch is given."""
+    return Location.objects.get_or_create(
+        code=MAIN_LOCATION_CODE,
+        defaults={"name": "Main branch"},
+    )[0].pk
+
+
 class InventoryStock(models.Model):
     id = models.AutoField(primary_key=True)
-    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE)
+    item = models.ForeignKey(InventoryItem, on_delete=models.PROTECT)
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, default=default_location)
     date_of_delivery = models.DateField(default=django.utils.timezone.now)
     expiration_date = models.DateField(default=django.utils.timezone.now)
     quantity = models.PositiveIntegerField(default=0)
+    # Delivered into the lot, including stock count corrections, see inventory.reconcile
+    received_quantity = models.PositiveIntegerField(default=0)
+    reserved_quantity = models.PositiveIntegerField(default=0)  # Held by open reservations
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=4, default=Decimal(0))
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
 
+    @property
+    def sellable_quantity(self) -> int:
+        return self.quantity - self.reserved_quantity
 
     def clean(self):
         """Validation before saving."""
         if not self.pk and self.expiration_date < datetime.date.today():
             raise ValidationError("Cannot add stock with an expiration date in the past.")
+        if self.quantity < self.reserved_quantity:
+            raise ValidationError("Cannot reduce stock below the quantity reserved from it.")
 
-    @transaction_db.atomic
     def save(self, *args, **kwargs):
+        with metrics.track("delivery") if self._state.adding else nullcontext():
+            self._save(*args, **kwargs)
+
+    @transaction_db.atomic
+    def _save(self, *args, **kwargs):
+        if self._state.adding:
+            previous = 0
+            self.received_quantity = self.quantity
+        else:
+            # Reservations change reserved_quantity concurrently, keep the locked value
+            previous, received, self.reserved_quantity, unit_cost, expiration_date, location_id = (
+                InventoryStock.objects.select_for_update().filter(pk=self.pk).values_list(
+                    "quantity", "received_quantity", "reserved_quantity", "unit_cost", "expiration_date", "location_id"
+                ).first() or (0, 0, 0, self.unit_cost, self.expiration_date, self.location_id)
+            )
+            self.received_quantity = received + self.quantity - previous
         self.clean()  # Ensure validations run before saving
+        adding = self._state.adding
         super().save(*args, **kwargs)
 
+        if not adding and (unit_cost, expiration_date) != (self.unit_cost, self.expiration_date):
+            # Revalue what the lot held before, the movement below values the difference
+            ValuationSummary.objects.apply([
+                (self.item_id, expiration_date, unit_cost, -previous),
+                (self.item_id, self.expiration_date, self.unit_cost, previous),
+            ])
+
+        movements = []
+        if not adding and location_id != self.location_id:
+            # Moving the lot takes what it held off the counters of its old branch
+            movements += [
+                StockMovement(
+                    stock=self,
+                    item_id=self.item_id,
+                    location_id=branch,
+                    kind=MovementType.ADJUSTED,
+                    quantity=quantity,
+                    created_by_id=self.created_by_id,
+                )
+                for branch, quantity in ((location_id, -previous), (self.location_id, previous))
+            ]
+        # Direct edits of the quantity are recorded as deliveries or adjustments
+        movements.append(StockMovement(
+            stock=self,
+            item_id=self.item_id,
+            location_id=self.location_id,
+            kind=MovementType.RECEIVED if adding else MovementType.ADJUSTED,
+            quantity=self.quantity - previous,
+            created_by_id=self.created_by_id,
+        ))
+        if not StockMovement.objects.record(movements) and not adding and expiration_date != self.expiration_date:
+            # No units moved, but the lot may have started or stopped being sellable
+            signals.stock_changed.send(sender=InventoryStock, item_ids={self.item_id}, movements=[])
+
 
 
 class InventoryTransaction(models.Model):
-    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE)
-    created_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    item = models.ForeignKey(InventoryItem, on_delete=models.PROTECT)
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, default=default_location)
+    created_by = models.ForeignKey(User, on_delete=models.PROTECT)
     quantity = models.PositiveIntegerField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def save(self, *args, allocation=None, strategy=None, **kwargs):
+        """
+        The lots are picked by ``strategy``, see ``inventory.allocation``.
+        ``allocation`` is a list of ``(lot, quantity)`` to take instead,
+        used when confirming a reservation. Its lots must be locked by the
+        caller.
+        """
+        with metrics.track("dispense" if self._state.adding else "edit"):
+            self._save(*args, allocation=allocation, strategy=strategy, **kwargs)
 
     @transaction_db.atomic 
-    def save(self, *args, **kwargs):
+    def _save(self, *args, allocation=None, strategy=None, **kwargs):
         """Ensure the transaction is saved first before using it in StockTransaction."""
         if not self._state.adding:
-            for i in StockRecord.objects.filter(transaction=self):
-                i.delete()
+            StockRecord.objects.filter(transaction=self).release()
         # Save transaction first
         super().save(*args, **kwargs)
 
-        # Fetch available stock for the item
-        all_stocks = InventoryStock.objects.filter(
-            item=self.item,
-            expiration_date__gte=datetime.date.today()
-        ).order_by("expiration_date")
-
-        if not all_stocks.exists():
-            raise ValidationError("No stocks available to create a transaction.")
+        if allocation is None:
+            allocation = self._allocate(strategy)
 
-        total_created = 0
         stock_transactions = []
-
-        # Allocate stocks using FIFO (first-expiry-first-out)
-        for stock in all_stocks:
-            if total_created == self.quantity:
-                break  # Stop once we've allocated the required quantity
-            
-            # Determine how much to take from this stock
-            take_quantity = min(stock.quantity, self.quantity - total_created)
-
+        allocated_stocks = []
+        for stock, take_quantity in allocation:
             stock_transactions.append(
                 StockRecord(
                     transaction=self,  # Now self is already saved
@@ -228,39 +414,438 @@ class InventoryTransaction(models.Model):
                     stock=stock,
                 )
             )
-
             # Reduce stock count
             stock.quantity -= take_quantity
-            stock.save()
+            allocated_stocks.append(stock)
+        metrics.ALLOCATION_LOTS.observe(len(stock_transactions))
 
-            total_created += take_quantity
+        # Bulk write the new lot quantities, StockTransaction entries and movements
+        InventoryStock.objects.bulk_update(allocated_stocks, ["quantity"])
+        StockRecord.objects.bulk_create(stock_transactions)
+        StockMovement.objects.record(
+            StockMovement(
+                stock=record.stock,
+                item_id=self.item_id,
+                location_id=self.location_id,
+                transaction=self,
+                kind=MovementType.DISPENSED,
+                quantity=-record.quantity,
+                created_by_id=self.created_by_id,
+            )
+            for record in stock_transactions
+        )
+    
 
+    def _allocate(self, strategy=None):
+        """Lock and pick the lots to take this transaction's quantity from."""
+        from .allocation import plan
 
-        if total_created != self.quantity:
+        # Same planner as the previews, locking the lots at the dispensing branch
+        allocations, shortfalls = plan(
+            [(self.item_id, self.quantity)], self.location_id, strategy, lock=True
+        )
+        allocation = next(iter(allocations.values()))
+        if not allocation:
+            metrics.STOCK_OUTS.inc()
+            raise ValidationError("No stocks available to create a transaction.")
+        if shortfalls:
+            metrics.STOCK_OUTS.inc()
             raise ValidationError("Not enough stocks to make this transaction!")
+        return allocation
 
-        # Bulk create all StockTransaction entries
-        StockRecord.objects.bulk_create(stock_transactions)
-    
+    def delete(self, *args, **kwargs):
+        with metrics.track("void"):
+            return self._delete(*args, **kwargs)
 
     @transaction_db.atomic
-    def delete(self, *args, **kwargs):
-        for i in StockRecord.objects.filter(transaction=self):
-            i.delete()
-        super().delete(*args, **kwargs)
-    
+    def _delete(self, *args, **kwargs):
+        StockRecord.objects.filter(transaction=self).release()
+        return super().delete(*args, **kwargs)
+
+
+class StockRecordQuerySet(models.QuerySet):
+    @transaction_db.atomic
+    def release(self):
+        """Give the quantities of these records back to their lots and delete them."""
+        records = list(self.select_related("stock"))
+        returned = defaultdict(int)
+        for record in records:
+            returned[record.stock_id] += record.quantity
+        for stock_id, quantity in returned.items():
+            InventoryStock.objects.filter(pk=stock_id).update(quantity=models.F("quantity") + quantity)
+
+        StockMovement.objects.record(
+            StockMovement(
+                stock_id=record.stock_id,
+                item_id=record.stock.item_id,
+                location_id=record.stock.location_id,
+                transaction_id=record.transaction_id,
+                kind=MovementType.REVERSED,
+                quantity=record.quantity,
+            )
+            for record in records
+        )
+        return StockRecord.objects.filter(pk__in=[record.pk for record in records]).delete()
+
+
 class StockRecord(models.Model):
     transaction = models.ForeignKey(InventoryTransaction, on_delete=models.CASCADE)
     stock = models.ForeignKey(InventoryStock, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
 
-    @transaction_db.atomic
+    objects = StockRecordQuerySet.as_manager()
+
     def delete(self, *args, **kwargs):
-        stock = InventoryStock.objects.get(id=self.stock.id)
-        stock.quantity += self.quantity
-        stock.save()
-        super().delete(*args, **kwargs)
+        return StockRecord.objects.filter(pk=self.pk).release()
 
 
-    
+class MovementType(models.TextChoices):
+    RECEIVED = "received", "Received"
+    DISPENSED = "dispensed", "Dispensed"
+    REVERSED = "reversed", "Reversed"
+    WRITTEN_OFF = "written_off", "Written off"
+    ADJUSTED = "adjusted", "Adjusted"
+    TRANSFERRED_OUT = "transferred_out", "Transferred out"
+    TRANSFERRED_IN = "transferred_in", "Transferred in"
+
+
+class StockMovementManager(models.Manager):
+    def record(self, movements):
+        """
+        Append ``movements`` to the ledger in a single batched insert and
+        apply them to the per-location stock counters and the valuation
+        summary.
+        """
+        movements = [movement for movement in movements if movement.quantity]
+        if not movements:
+            return []
+        deltas = defaultdict(int)
+        for movement in movements:
+            deltas[(movement.location_id, movement.item_id)] += movement.quantity
+        StockLevel.objects.apply(deltas)
+        lots = {
+            pk: (expiration_date, unit_cost)
+            for pk, expiration_date, unit_cost in InventoryStock.objects.filter(
+                pk__in={movement.stock_id for movement in movements}
+            ).values_list("pk", "expiration_date", "unit_cost")
+        }
+        ValuationSummary.objects.apply(
+            (movement.item_id, *lots[movement.stock_id], movement.quantity) for movement in movements
+        )
+        movements = self.bulk_create(movements)
+        signals.stock_changed.send(
+            sender=StockMovement,
+            item_ids={item_id for _, item_id in deltas},
+            movements=movements,
+        )
+        return movements
+
+
+class StockMovement(models.Model):
+    """
+    Append-only ledger of every change to an InventoryStock quantity.
+
+    The quantities of a lot's movements always add up to its current
+    quantity, see ``inventory.ledger.rebuild_stock_balances``. Movements
+    outlive their lot and item: deleting or archiving a lot keeps its
+    history, which then adds up to the archived quantity.
+    """
+    stock = models.ForeignKey(InventoryStock, on_delete=models.DO_NOTHING, db_constraint=False)
+    item = models.ForeignKey(InventoryItem, on_delete=models.DO_NOTHING, db_constraint=False)
+    location = models.ForeignKey(Location, on_delete=models.PROTECT)
+    kind = models.CharField(max_length=16, choices=MovementType.choices)
+    quantity = models.IntegerField()  # Signed change to the lot's quantity
+    transaction = models.ForeignKey(InventoryTransaction, on_delete=models.SET_NULL, null=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    created_at = models.DateTimeField(default=django.utils.timezone.now, db_index=True)
+
+    objects = StockMovementManager()
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError("Stock movements are append-only.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValidationError("Stock movements are append-only.")
+
+
+class StockLevelManager(models.Manager):
+    def apply(self, deltas):
+        """Add ``{(location_id, item_id): quantity}`` to the counters."""
+        for (location_id, item_id), delta in deltas.items():
+            if not delta:
+                continue
+            counter = self.filter(location_id=location_id, item_id=item_id)
+            if counter.update(quantity=models.F("quantity") + delta):
+                continue
+            try:
+                with transaction_db.atomic():
+                    self.create(location_id=location_id, item_id=item_id, quantity=delta)
+            except IntegrityError:
+                # Another transaction created the counter first
+                counter.update(quantity=models.F("quantity") + delta)
+
+
+class StockLevel(models.Model):
+    """Running total of the lot quantities of an item at one location."""
+    location = models.ForeignKey(Location, on_delete=models.CASCADE)
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE)
+    quantity = models.IntegerField(default=0)
+
+    objects = StockLevelManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["location", "item"], name="unique_stock_level"),
+        ]
+
+
+class ValuationSummaryManager(models.Manager):
+    def apply(self, lots):
+        """
+        Add changes of ``(item_id, expiration_date, unit_cost, quantity)``
+        to lots to the summary, in one UPDATE per summary row.
+        """
+        lots = [lot for lot in lots if lot[3]]
+        if not lots:
+            return
+        categories = {
+            pk: (category, subcategory)
+            for pk, category, subcategory in InventoryItem.all_objects.filter(
+                pk__in={item_id for item_id, *_ in lots}
+            ).values_list("pk", "category", "subcategory")
+        }
+        deltas = defaultdict(lambda: [0, Decimal(0)])
+        for item_id, expiration_date, unit_cost, quantity in lots:
+            key = (*categories[InventoryItem._meta.pk.to_python(item_id)], expiration_date)
+            deltas[key][0] += quantity
+            deltas[key][1] += quantity * Decimal(unit_cost)
+        self.apply_deltas(deltas)
+
+    def apply_deltas(self, deltas):
+        """Add ``{(category, subcategory, expiration_date): (quantity, value)}`` to the summary."""
+        for (category, subcategory, expiration_date), (quantity, value) in deltas.items():
+            if not quantity and not value:
+                continue
+            row = self.filter(category=category, subcategory=subcategory, expiration_date=expiration_date)
+            changes = {"quantity": models.F("quantity") + quantity, "value": models.F("value") + value}
+            if row.update(**changes):
+                continue
+            try:
+                with transaction_db.atomic():
+                    self.create(
+                        category=category,
+                        subcategory=subcategory,
+                        expiration_date=expiration_date,
+                        quantity=quantity,
+                        value=value,
+                    )
+            except IntegrityError:
+                # Another transaction created the row first
+                row.update(**changes)
+
+    def recategorize(self, item, category, subcategory):
+        """Move the value of ``item``'s lots from ``category`` and ``subcategory`` to its current ones."""
+        deltas = defaultdict(lambda: [0, Decimal(0)])
+        for expiration_date, quantity, value in lot_values(InventoryStock.objects.filter(item=item)):
+            deltas[(category, subcategory, expiration_date)][0] -= quantity
+            deltas[(category, subcategory, expiration_date)][1] -= value
+            deltas[(item.category, item.subcategory, expiration_date)][0] += quantity
+            deltas[(item.category, item.subcategory, expiration_date)][1] += value
+        self.apply_deltas(deltas)
+
+
+def lot_values(lots, *group_by):
+    """``(*group_by, expiration_date, quantity, value)`` of ``lots`` per expiration date."""
+    return lots.order_by().values_list(*group_by, "expiration_date").annotate(
+        total_quantity=models.Sum("quantity"),
+        total_value=models.Sum(
+            models.F("quantity") * models.F("unit_cost"),
+            output_field=models.DecimalField(max_digits=18, decimal_places=4),
+        ),
+    ).exclude(total_quantity=0)
+
+
+class ValuationSummary(models.Model):
+    """
+    Running quantity and value of the lots of a category and subcategory
+    that expire on one date, kept by StockMovement.objects.record(). See
+    inventory.valuation for the report and the rebuild.
+    """
+    category = models.CharField(max_length=64, choices=CategoryType.choices)
+    subcategory = models.CharField(max_length=64, choices=SubcategoryType.choices)
+    expiration_date = models.DateField()
+    quantity = models.IntegerField(default=0)
+    value = models.DecimalField(max_digits=18, decimal_places=4, default=Decimal(0))
+
+    objects = ValuationSummaryManager()
+
+    class Meta:
+        verbose_name_plural = "valuation summaries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["category", "subcategory", "expiration_date"],
+                name="unique_valuation_summary",
+            ),
+        ]
+
+
+@receiver(post_delete, sender=InventoryStock)
+def remove_deleted_stock_from_counters(sender, instance, **kwargs):
+    # The counter is already gone when the whole item is being deleted
+    StockLevel.objects.filter(location_id=instance.location_id, item_id=instance.item_id).update(
+        quantity=models.F("quantity") - instance.quantity
+    )
+    ValuationSummary.objects.apply(
+        [(instance.item_id, instance.expiration_date, instance.unit_cost, -instance.quantity)]
+    )
+    signals.stock_changed.send(sender=InventoryStock, item_ids={instance.item_id}, movements=[])
+
+
+@receiver(signals.stock_changed)
+def touch_items_with_changed_stock(sender, item_ids, **kwargs):
+    # Numbered in a short transaction of its own once the stock write has
+    # committed, so dispenses at different branches do not queue on the
+    # sequence row and on the item rows for their whole transaction
+    transaction_db.on_commit(InventoryItem.all_objects.filter(pk__in=item_ids).touch, robust=True)
+
+
+class ArchivedInventoryStock(models.Model):
+    """A closed InventoryStock lot moved out of the hot table by ``archive_ledger``."""
+    id = models.IntegerField(primary_key=True)
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE)
+    # Null for lots archived before their branch was kept
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, null=True)
+    date_of_delivery = models.DateField()
+    expiration_date = models.DateField()
+    quantity = models.PositiveIntegerField()
+    received_quantity = models.PositiveIntegerField(default=0)
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=4, default=Decimal(0))
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+
+class ArchivedInventoryTransaction(models.Model):
+    """A closed InventoryTransaction moved out of the hot table by ``archive_ledger``."""
+    id = models.BigIntegerField(primary_key=True)
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE)
+    # Null for transactions archived before their branch was kept
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, null=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    quantity = models.PositiveIntegerField()
+    created_at = models.DateTimeField(db_index=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+
+class ArchivedStockRecord(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    transaction = models.ForeignKey(ArchivedInventoryTransaction, on_delete=models.CASCADE)
+    # The lot may still be in InventoryStock or already in ArchivedInventoryStock.
+    stock_id = models.IntegerField(db_index=True)
+    quantity = models.PositiveIntegerField()
+
+
+class LedgerSummary(models.Model):
+    """Monthly dispense totals per item and branch for archived transactions."""
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE)
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, null=True)
+    period = models.DateField()  # First day of the month
+    transaction_count = models.PositiveIntegerField(default=0)
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["item", "location", "period"], name="unique_ledger_summary_period"),
+        ]
+
+
+class BarcodeLevel(models.TextChoices):
+    UNIT = "unit", "Unit"
+    PACK = "pack", "Pack"
+
+
+class ItemBarcode(models.Model):
+    """A scannable code (GTIN, EAN, in-house SKU) for a single unit or a whole pack of an item."""
+    code = models.CharField(max_length=64, unique=True)
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name="barcodes")
+    level = models.CharField(max_length=8, choices=BarcodeLevel.choices, default=BarcodeLevel.UNIT)
+    units_per_pack = models.PositiveIntegerField(default=1)
+
+    def clean(self):
+        self.code = self.code.strip()
+        if not self.code:
+            raise ValidationError("Barcode cannot be empty.")
+        if self.level == BarcodeLevel.UNIT and self.units_per_pack != 1:
+            raise ValidationError("Unit level barcodes must have 1 unit per pack.")
+        if self.units_per_pack < 1:
+            raise ValidationError("A pack must contain at least 1 unit.")
+
+    def save(self, *args, **kwargs):
+        self.clean()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.code
+
+
+@receiver(post_save, sender=ItemBarcode)
+@receiver(post_delete, sender=ItemBarcode)
+def touch_item_with_changed_barcode(sender, instance, **kwargs):
+    InventoryItem.all_objects.filter(pk=instance.item_id).touch()
+
+
+class IdempotentOperation(models.TextChoices):
+    DISPENSE = "dispense", "Dispense"
+    VOID = "void", "Void"
+
+
+class IdempotencyKey(models.Model):
+    """
+    A client supplied key for a dispense or void, so that retrying the
+    request returns the original result instead of running it again.
+    Keys expire after IDEMPOTENCY_KEY_RETENTION.
+    """
+    key = models.CharField(max_length=128, unique=True)
+    operation = models.CharField(max_length=16, choices=IdempotentOperation.choices)
+    fingerprint = models.CharField(max_length=64)  # Hash of the request parameters
+    transaction = models.ForeignKey(InventoryTransaction, on_delete=models.SET_NULL, null=True)
+    transaction_pk = models.BigIntegerField(null=True)  # Kept after a void deletes the transaction
+    created_at = models.DateTimeField(default=django.utils.timezone.now, db_index=True)
+
+
+class StockReservation(models.Model):
+    """
+    Quantity of an item held against specific lots while an order is
+    prepared. Confirming it dispenses exactly those lots, see
+    ``inventory.reservations``. Holds lapse at ``expires_at``.
+    """
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE)
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, default=default_location)
+    quantity = models.PositiveIntegerField()
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(default=django.utils.timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.item_id} until {self.expires_at}"
+
+
+class ReservationLine(models.Model):
+    reservation = models.ForeignKey(StockReservation, on_delete=models.CASCADE, related_name="lines")
+    stock = models.ForeignKey(InventoryStock, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+
+
+class StockWriteOff(models.Model):
+    """
+    Expired quantity taken out of a lot, see ``inventory.writeoffs``.
+    Keeps the lot id rather than a foreign key so it survives archiving.
+    """
+    stock_id = models.IntegerField(db_index=True)
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE)
+    location = models.ForeignKey(Location, on_delete=models.PROTECT)
+    expiration_date = models.DateField()
+    quantity = models.PositiveIntegerField()
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    created_at = models.DateTimeField(default=django.utils.timezone.now, db_index=True)
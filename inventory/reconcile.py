@@ -0,0 +1,117 @@
+"""
+Checks that every lot's quantity matches what happened to it.
+
+A lot should hold its received quantity minus everything allocated from
+it (live and archived stock records), written off or transferred out.
+The expected balance is computed in SQL for a chunk of items at a time,
+and the chunks are spread over a process pool, see
+``manage.py reconcile_stock``.
+"""
+from django.db import transaction as transaction_db
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from project.processes import process_pool
+
+from .ledger import ledger_balance
+from .models import (
+    ArchivedStockRecord,
+    InventoryItem,
+    InventoryStock,
+    MovementType,
+    StockMovement,
+    StockRecord,
+    StockWriteOff,
+)
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def _per_lot(queryset, lot_field):
+    totals = queryset.filter(**{lot_field: OuterRef("pk")}).order_by().values(lot_field).annotate(
+        total=Sum("quantity")
+    ).values("total")
+    return Coalesce(Subquery(totals), Value(0), output_field=IntegerField())
+
+
+def expected_quantity():
+    transferred_out = StockMovement.objects.filter(kind=MovementType.TRANSFERRED_OUT)
+    return (
+        F("received_quantity")
+        - _per_lot(StockRecord.objects.all(), "stock")
+        - _per_lot(ArchivedStockRecord.objects.all(), "stock_id")
+        - _per_lot(StockWriteOff.objects.all(), "stock_id")
+        + _per_lot(transferred_out, "stock")  # Negative quantities
+    )
+
+
+def discrepancies(item_ids=None):
+    """Lots whose quantity differs from the expected one, annotated with ``expected_quantity``."""
+    lots = InventoryStock.objects.all()
+    if item_ids is not None:
+        lots = lots.filter(item_id__in=item_ids)
+    return lots.annotate(expected_quantity=expected_quantity()).exclude(
+        quantity=F("expected_quantity")
+    )
+
+
+def check_items(item_ids):
+    """``(lot, item, quantity, expected)`` for the discrepancies of ``item_ids``."""
+    return list(
+        discrepancies(item_ids).order_by("pk").values_list("pk", "item_id", "quantity", "expected_quantity")
+    )
+
+
+def item_chunks(chunk_size=DEFAULT_CHUNK_SIZE):
+    chunk = []
+    for item_id in InventoryItem.all_objects.order_by("pk").values_list("pk", flat=True).iterator():
+        chunk.append(item_id)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def reconcile(processes=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the discrepancies of every lot, checking item chunks in ``processes`` processes."""
+    chunks = item_chunks(chunk_size)
+    if processes == 1:
+        results = map(check_items, chunks)
+        yield from (row for rows in results for row in rows)
+        return
+    with process_pool(processes) as pool:
+        for rows in pool.map(check_items, chunks):
+            yield from rows
+
+
+@transaction_db.atomic
+def repair(lot_ids):
+    """
+    Set the given lots to their expected quantity. Where the movement
+    ledger disagrees too, an adjustment brings it and the stock counters
+    in line. Returns the ids of lots that could not be repaired because
+    they are expected to hold less than their reservations.
+    """
+    lots = list(
+        InventoryStock.objects.select_for_update().filter(pk__in=lot_ids)
+        .annotate(expected_quantity=expected_quantity(), ledger_quantity=ledger_balance())
+        .exclude(quantity=F("expected_quantity"))
+    )
+    unrepairable = [lot.pk for lot in lots if lot.expected_quantity < lot.reserved_quantity]
+    lots = [lot for lot in lots if lot.expected_quantity >= lot.reserved_quantity]
+    movements = [
+        StockMovement(
+            stock=lot,
+            item_id=lot.item_id,
+            location_id=lot.location_id,
+            kind=MovementType.ADJUSTED,
+            quantity=lot.expected_quantity - lot.ledger_quantity,
+        )
+        for lot in lots
+    ]
+    for lot in lots:
+        lot.quantity = lot.expected_quantity
+    InventoryStock.objects.bulk_update(lots, ["quantity"])
+    StockMovement.objects.record(movements)
+    return unrepairable
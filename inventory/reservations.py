@@ -0,0 +1,126 @@
+"""
+Two-phase dispensing for orders that take a while to prepare.
+
+``reserve`` holds quantity against specific lots in a short transaction,
+so the lots are not locked while the order is put together. Held units
+are excluded from sellable stock until the reservation is confirmed,
+cancelled or swept by ``release_expired_reservations`` after
+RESERVATION_TTL. ``confirm`` dispenses exactly the held lots without
+allocating again.
+"""
+from django.conf import settings
+from django.db import transaction as transaction_db
+from django.db.models import F, Sum
+from django.forms import ValidationError
+from django.utils import timezone
+
+from . import signals
+from .allocation import plan
+from .models import (
+    InventoryStock,
+    InventoryTransaction,
+    ReservationLine,
+    StockReservation,
+)
+
+
+def _stock_changed(item_ids):
+    signals.stock_changed.send(sender=StockReservation, item_ids=set(item_ids), movements=[])
+
+
+def _unreserve(lines):
+    """Give the quantities held by ``lines`` back to the sellable stock of their lots."""
+    totals = lines.values("stock").annotate(total=Sum("quantity")).order_by("stock")
+    for row in totals:
+        InventoryStock.objects.filter(pk=row["stock"]).update(
+            reserved_quantity=F("reserved_quantity") - row["total"]
+        )
+
+
+@transaction_db.atomic
+def reserve(item, quantity, created_by, location=None, ttl=None, strategy=None):
+    """Hold ``quantity`` of ``item`` from the lots ``strategy`` picks and return the reservation."""
+    reservation = StockReservation(
+        item=item,
+        quantity=quantity,
+        created_by=created_by,
+        expires_at=timezone.now() + (ttl or settings.RESERVATION_TTL),
+    )
+    if location is not None:
+        reservation.location = location
+
+    allocations, shortfalls = plan([(item, quantity)], reservation.location_id, strategy, lock=True)
+    if shortfalls:
+        raise ValidationError("Not enough stocks to make this reservation!")
+    held = next(iter(allocations.values()))
+    for lot, take in held:
+        lot.reserved_quantity += take
+
+    InventoryStock.objects.bulk_update([lot for lot, _ in held], ["reserved_quantity"])
+    reservation.save()
+    ReservationLine.objects.bulk_create(
+        ReservationLine(reservation=reservation, stock=lot, quantity=take)
+        for lot, take in held
+    )
+    _stock_changed([reservation.item_id])
+    return reservation
+
+
+def _locked(reservation):
+    locked = StockReservation.objects.select_for_update().filter(
+        pk=getattr(reservation, "pk", reservation)
+    ).first()
+    if locked is None:
+        raise ValidationError("This reservation has been released.")
+    return locked
+
+
+@transaction_db.atomic
+def confirm(reservation):
+    """Dispense the held lots of ``reservation`` and return the new transaction."""
+    reservation = _locked(reservation)
+    if reservation.expires_at <= timezone.now():
+        raise ValidationError("This reservation has expired.")
+
+    lines = list(reservation.lines.all())
+    lots = InventoryStock.objects.select_for_update().in_bulk([line.stock_id for line in lines])
+    if sum(line.quantity for line in lines) != reservation.quantity:
+        # A lot was removed while it was held
+        raise ValidationError("The reserved stock is no longer available.")
+
+    _unreserve(reservation.lines.all())
+    transaction = InventoryTransaction(
+        item_id=reservation.item_id,
+        location_id=reservation.location_id,
+        quantity=reservation.quantity,
+        created_by_id=reservation.created_by_id,
+    )
+    transaction.save(allocation=[(lots[line.stock_id], line.quantity) for line in lines])
+    reservation.delete()
+    return transaction
+
+
+@transaction_db.atomic
+def cancel(reservation):
+    """Release ``reservation`` before it expires."""
+    reservation = _locked(reservation)
+    _unreserve(reservation.lines.all())
+    reservation.delete()
+    _stock_changed([reservation.item_id])
+
+
+def expired_reservations():
+    return StockReservation.objects.filter(expires_at__lte=timezone.now())
+
+
+@transaction_db.atomic
+def release_expired_reservations() -> int:
+    """Release every expired hold with one update per lot. Returns the number released."""
+    expired = list(expired_reservations().select_for_update().values_list("pk", "item_id"))
+    if not expired:
+        return 0
+    ids = [pk for pk, _ in expired]
+    _unreserve(ReservationLine.objects.filter(reservation__in=ids))
+    StockReservation.objects.filter(pk__in=ids).delete()
+    _stock_changed(item_id for _, item_id in expired)
+    return len(ids)
@@ -0,0 +1,179 @@
+"""
+Barcode to item resolution for scanner-driven dispensing.
+
+``scan`` answers with the item, its sellable stock and the lot that
+expires next in a single query. Answers are kept in a per-process LRU
+cache that is dropped as soon as this process changes the item's stock
+or barcodes. Changes made by other processes show up once an entry is
+SCAN_CACHE_SECONDS old. Location codes are resolved through a map in the
+shared cache that any worker saving or deleting a location drops.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction as transaction_db
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .allocation import sellable_lots
+from .models import MAIN_LOCATION_CODE, InventoryItem, ItemBarcode, Location, default_location
+from .signals import stock_changed
+
+
+class ScanCache:
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._keys_by_item = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, _, value = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, item_id, value, ttl):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, item_id, value)
+            self._keys_by_item[item_id].add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, item_ids):
+        with self._lock:
+            for item_id in item_ids:
+                for key in list(self._keys_by_item.get(item_id, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_item.clear()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._keys_by_item[entry[1]]
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_item[entry[1]]
+
+
+scan_cache = ScanCache()
+
+
+def lookup(code, location_id):
+    """Resolve ``code`` with stock at ``location_id`` in one query."""
+    lots = sellable_lots(location_id).filter(item=OuterRef("item")).annotate(
+        sellable_quantity=F("quantity") - F("reserved_quantity")
+    )
+    next_lot = lots.order_by("expiration_date", "pk")
+    return (
+        ItemBarcode.objects.select_related("item")
+        .annotate(
+            sellable=Coalesce(
+                Subquery(lots.values("item").annotate(total=Sum("sellable_quantity")).values("total")),
+                Value(0),
+                output_field=IntegerField(),
+            ),
+            next_lot_id=Subquery(next_lot.values("pk")[:1]),
+            next_lot_expiration=Subquery(next_lot.values("expiration_date")[:1]),
+            next_lot_quantity=Subquery(next_lot.values("sellable_quantity")[:1]),
+        )
+        .filter(code=code.strip(), item__is_archived=False)
+        .first()
+    )
+
+
+LOCATION_IDS_KEY = "inventory:location-ids"
+
+
+def location_id_for(code):
+    """Id of the Location with ``code``, or None if there is none."""
+    # Shared by every worker, so a renamed or deleted location is dropped everywhere
+    location_ids = cache.get(LOCATION_IDS_KEY)
+    if location_ids is None:
+        location_ids = dict(Location.objects.values_list("code", "pk"))
+        cache.set(LOCATION_IDS_KEY, location_ids, getattr(settings, "LOCATION_CACHE_SECONDS", 300))
+    return location_ids.get(code)
+
+
+def scan(code, location_id=None):
+    """Return the scan payload for ``code``, or None for an unknown code."""
+    location_id = location_id or location_id_for(MAIN_LOCATION_CODE) or default_location()
+    key = (code.strip(), location_id)
+    payload = scan_cache.get(key)
+    if payload is not None:
+        return payload
+
+    barcode = lookup(code, location_id)
+    if barcode is None:
+        return None
+    item = barcode.item
+    payload = {
+        "barcode": barcode.code,
+        "level": barcode.level,
+        "units_per_pack": barcode.units_per_pack,
+        "item": {
+            "id": str(item.pk),
+            "item_name": item.item_name,
+            "brand_name": item.brand_name,
+            "generic_name": item.generic_name,
+            "dosage_form": item.dosage_form,
+            "strength_per_size": item.strength_per_size,
+            "unit_size": item.unit_size,
+        },
+        "sellable": barcode.sellable,
+        "sellable_packs": barcode.sellable // barcode.units_per_pack,
+        "next_lot": {
+            "id": barcode.next_lot_id,
+            "expiration_date": barcode.next_lot_expiration.isoformat(),
+            "quantity": barcode.next_lot_quantity,
+        } if barcode.next_lot_id else None,
+    }
+    scan_cache.set(key, item.pk, payload, getattr(settings, "SCAN_CACHE_SECONDS", 5))
+    return payload
+
+
+def invalidate_on_commit(item_ids):
+    item_ids = {InventoryItem._meta.pk.to_python(item_id) for item_id in item_ids}
+    transaction_db.on_commit(lambda: scan_cache.invalidate(item_ids))
+
+
+@receiver(stock_changed)
+def drop_changed_stock(sender, item_ids, **kwargs):
+    invalidate_on_commit(item_ids)
+
+
+@receiver(post_save, sender=InventoryItem)
+@receiver(post_delete, sender=InventoryItem)
+def drop_changed_item(sender, instance, **kwargs):
+    invalidate_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def drop_changed_location(sender, instance, **kwargs):
+    # Again after commit, in case another worker reloaded the map in between
+    cache.delete(LOCATION_IDS_KEY)
+    transaction_db.on_commit(lambda: cache.delete(LOCATION_IDS_KEY))
+
+
+@receiver(post_save, sender=ItemBarcode)
+@receiver(post_delete, sender=ItemBarcode)
+def drop_changed_barcode(sender, instance, **kwargs):
+    # The code may have been edited away from a cached value
+    transaction_db.on_commit(scan_cache.clear)
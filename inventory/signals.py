@@ -0,0 +1,7 @@
+from django.dispatch import Signal
+
+# Sent by StockMovement.objects.record() inside the transaction that
+# changed stock, with the changed ``item_ids`` and the new ``movements``.
+# Reservations, lot deletions and expiry date edits send it with no
+# movements when they change sellable stock.
+stock_changed = Signal()
@@ -0,0 +1,36 @@
+"""Inventory maintenance that runs on the background worker, see the jobs app."""
+import datetime
+
+from jobs.registry import task
+
+from . import archive, dispensing, ledger, reservations, writeoffs
+
+
+@task
+def rebuild_stock_balances():
+    return ledger.rebuild_stock_balances()
+
+
+@task
+def archive_ledger(before=None, retention_days=365):
+    """Archive closed ledger rows before ``before`` or older than ``retention_days``."""
+    if before is None:
+        before = datetime.date.today() - datetime.timedelta(days=retention_days)
+    else:
+        before = datetime.date.fromisoformat(before)
+    return archive.archive_ledger(before)
+
+
+@task
+def purge_idempotency_keys():
+    return dispensing.purge_expired_keys()
+
+
+@task
+def release_expired_reservations():
+    return reservations.release_expired_reservations()
+
+
+@task
+def write_off_expired_stock():
+    return len(writeoffs.write_off_expired())
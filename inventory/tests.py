@@ -1,9 +1,29 @@
 import datetime
+from io import StringIO
 import uuid
+from django.db import OperationalError, connection
+from unittest import mock
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.core.exceptions import ValidationError
-from .models import CategoryType, InventoryItem, InventoryStock, InventoryTransaction, PackagingType, StockRecord, SubcategoryType, UnitType
+from .models import CategoryType, InventoryItem, InventoryStock, InventoryTransaction, Location, MovementType, PackagingType, StockLevel, StockMovement, StockRecord, StockReservation, StockWriteOff, SubcategoryType, UnitType, BarcodeLevel, IdempotencyKey, ItemBarcode, default_location, legacy_item_id
 from django.db.models import Sum
+from django.core.management import call_command
+from django.core.cache import cache
+from django.utils import timezone
+from decimal import Decimal
+from django.contrib.auth.models import Permission
+from prometheus_client import REGISTRY
+from .archive import archived_lots, archived_transactions, ledger_summary
+from .ledger import balance_mismatches, rebuild_stock_balances
+from .transfers import transfer_stock
+from .scanning import location_id_for, scan, scan_cache
+from . import dispensing, reservations
+from .writeoffs import write_off_expired
+from .allocation import PinnedLots, plan
+from .reconcile import discrepancies, reconcile
+from . import changes, loadtest
+from .valuation import rebuild_valuation, report, valuation_mismatches
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -42,6 +62,21 @@ class ItemTestCase(TestCase):
         )
 
 
+    def test_item_id_is_uuid(self):
+        self.assertIsInstance(InventoryItem.objects.get(pk=self.item.pk).id, uuid.UUID)
+
+    def test_lookup_by_old_ids(self):
+        item = InventoryItem.objects.get(id=str(self.item.id))
+        self.assertEqual(item.pk, uuid.UUID(self.item.id))
+        self.assertEqual(InventoryStock.objects.filter(item_id=str(self.item.id)).count(), 1)
+
+        legacy = create_test_item()
+        InventoryItem.objects.filter(pk=legacy.pk).update(id=legacy_item_id("ITEM-0001"))
+        self.assertEqual(
+            InventoryItem.objects.get(id="ITEM-0001").pk,
+            legacy_item_id("ITEM-0001"),
+        )
+
     def test_item_exists(self):
         """Test if an item exists in the database"""
         item = InventoryItem.objects.get(item_name="Magnesium Hydroxide")
@@ -251,17 +286,35 @@ class TransactionTestCase(TestCase):
         modified_stock = InventoryStock.objects.filter(item=self.item).aggregate(Sum('quantity'))["quantity__sum"]
         self.assertEqual(modified_stock, 10)
 
-    def test_item_deletion_cascades(self):
+    def test_item_deletion_archives(self):
         transaction = InventoryTransaction.objects.create(
             item=self.item,
             created_by=self.user,
             quantity=2,
         )
         self.item.delete()
-        self.assertEqual(
-            0,
-            InventoryTransaction.objects.all().count(),
-        )
+        self.assertFalse(InventoryItem.objects.filter(id=self.item.id).exists())
+        self.assertTrue(InventoryItem.all_objects.get(id=self.item.id).is_archived)
+        # History is kept and still points at the item
+        self.assertEqual(InventoryTransaction.objects.get().item.item_name, self.item.item_name)
+
+    def test_bulk_archive_touches_one_row_per_item(self):
+        InventoryTransaction.objects.create(item=self.item, created_by=self.user, quantity=2)
+        with CaptureQueriesContext(connection) as queries:
+            archived = InventoryItem.objects.filter(id=self.item.id).archive()
+        # One UPDATE of the item, besides taking its change_seq
+        item_queries = [q["sql"] for q in queries if "inventory_inventoryitem" in q["sql"]]
+        self.assertEqual(len(item_queries), 1)
+        self.assertTrue(item_queries[0].startswith("UPDATE"))
+        self.assertEqual(archived, 1)
+        self.assertEqual(InventoryItem.all_objects.filter(id=self.item.id).restore(), 1)
+        self.assertTrue(InventoryItem.objects.filter(id=self.item.id).exists())
+
+    def test_departed_staff_keeps_history(self):
+        InventoryTransaction.objects.create(item=self.item, created_by=self.user, quantity=2)
+        self.user.delete()
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(InventoryTransaction.objects.get().created_by.email, self.user.email)
 
 
     def test_stock_cannot_be_negative_due_to_transactions(self):
@@ -402,3 +455,883 @@ class StockRecordTestCase(TestCase):
             InventoryStock.objects.filter(item=self.item).aggregate(Sum('quantity'))["quantity__sum"],
             10
         )
+
+
+class ArchiveLedgerTestCase(TestCase):
+    def setUp(self):
+        self.item = create_test_item()
+        self.stock = create_test_stock(self.item)
+        self.user = User.objects.create_user(
+            email="test_email@example.com",
+            password="1234"
+        )
+        self.open_stock = create_test_stock(self.item)
+        self.open_stock.expiration_date += datetime.timedelta(30)
+        self.open_stock.save()
+
+        self.closed = InventoryTransaction.objects.create(
+            item=self.item,
+            created_by=self.user,
+            quantity=5,
+        )
+        self.open = InventoryTransaction.objects.create(
+            item=self.item,
+            created_by=self.user,
+            quantity=2,
+        )
+        last_month = timezone.now() - datetime.timedelta(days=40)
+        InventoryTransaction.objects.update(created_at=last_month)
+        InventoryStock.objects.update(date_of_delivery=last_month.date())
+
+    def test_archive_moves_only_closed_rows(self):
+        call_command("archive_ledger", before=datetime.date.today().isoformat(), stdout=StringIO())
+
+        self.assertEqual(list(InventoryTransaction.objects.values_list("pk", flat=True)), [self.open.pk])
+        self.assertEqual(list(InventoryStock.objects.values_list("pk", flat=True)), [self.open_stock.pk])
+        self.assertEqual(InventoryStock.objects.get(pk=self.open_stock.pk).quantity, 3)
+
+        archived = archived_transactions(item=self.item).get()
+        self.assertEqual(archived.pk, self.closed.pk)
+        self.assertEqual(
+            [(r.stock_id, r.quantity) for r in archived.archivedstockrecord_set.all()],
+            [(self.stock.pk, 5)],
+        )
+        self.assertEqual(archived_lots(item=self.item).get().pk, self.stock.pk)
+
+        summary = ledger_summary(item=self.item).get()
+        self.assertEqual((summary.transaction_count, summary.quantity), (1, 5))
+
+    def test_archive_keeps_the_branch(self):
+        branch = Location.objects.create(code="B2", name="Branch 2")
+        call_command("archive_ledger", before=datetime.date.today().isoformat(), stdout=StringIO())
+
+        main = default_location()
+        self.assertEqual(archived_transactions(location=main).get().pk, self.closed.pk)
+        self.assertEqual(archived_lots(location=main).get().pk, self.stock.pk)
+        self.assertEqual(ledger_summary(item=self.item, location=main).get().quantity, 5)
+        self.assertFalse(ledger_summary(location=branch).exists())
+
+    def test_archive_keeps_the_valuation_basis(self):
+        InventoryStock.objects.filter(pk=self.stock.pk).update(unit_cost=Decimal("2.75"))
+        call_command("archive_ledger", before=datetime.date.today().isoformat(), stdout=StringIO())
+
+        lot = archived_lots().get()
+        self.assertEqual((lot.received_quantity, lot.unit_cost), (5, Decimal("2.75")))
+
+    def test_archive_keeps_the_ledger_of_archived_lots(self):
+        call_command("archive_ledger", before=datetime.date.today().isoformat(), stdout=StringIO())
+
+        movements = StockMovement.objects.filter(stock_id=self.stock.pk)
+        self.assertEqual(movements.count(), 2)
+        self.assertEqual(movements.aggregate(total=Sum("quantity"))["total"], archived_lots().get().quantity)
+        self.assertFalse(balance_mismatches().exists())
+
+    def test_archive_can_be_rerun(self):
+        call_command("archive_ledger", before=datetime.date.today().isoformat(), stdout=StringIO())
+        call_command("archive_ledger", before=datetime.date.today().isoformat(), stdout=StringIO())
+        self.assertEqual(archived_transactions().count(), 1)
+        self.assertEqual(ledger_summary().get().quantity, 5)
+
+
+class StockMovementTestCase(TestCase):
+    def setUp(self):
+        self.item = create_test_item()
+        self.stock = create_test_stock(self.item)
+        self.user = User.objects.create_user(
+            email="test_email@example.com",
+            password="1234"
+        )
+
+    def test_every_stock_change_is_recorded(self):
+        self.stock.quantity = 20
+        self.stock.save()
+        transaction = InventoryTransaction.objects.create(
+            item=self.item,
+            created_by=self.user,
+            quantity=8,
+        )
+        transaction.delete()
+
+        self.assertEqual(
+            list(StockMovement.objects.order_by("pk").values_list("kind", "quantity")),
+            [
+                (MovementType.RECEIVED, 5),
+                (MovementType.ADJUSTED, 15),
+                (MovementType.DISPENSED, -8),
+                (MovementType.REVERSED, 8),
+            ],
+        )
+        self.assertFalse(balance_mismatches().exists())
+
+    def test_movements_are_append_only(self):
+        movement = StockMovement.objects.get()
+        with self.assertRaises(ValidationError):
+            movement.save()
+        with self.assertRaises(ValidationError):
+            movement.delete()
+
+    def test_rebuild_restores_balances(self):
+        InventoryTransaction.objects.create(
+            item=self.item,
+            created_by=self.user,
+            quantity=3,
+        )
+        InventoryStock.objects.update(quantity=100)
+        self.assertEqual(balance_mismatches().count(), 1)
+
+        rebuild_stock_balances()
+        self.assertEqual(InventoryStock.objects.get(id=self.stock.id).quantity, 2)
+
+
+class InventoryMetricsTestCase(TestCase):
+    def setUp(self):
+        self.item = create_test_item()
+        self.stock = create_test_stock(self.item)
+        self.user = User.objects.create_user(
+            email="test_email@example.com",
+            password="1234"
+        )
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_operations_are_counted(self):
+        dispensed = self.sample("inventory_operations_total", operation="dispense", outcome="ok")
+        voided = self.sample("inventory_operations_total", operation="void", outcome="ok")
+        allocations = self.sample("inventory_allocation_lots_count")
+
+        InventoryTransaction.objects.create(
+            item=self.item,
+            created_by=self.user,
+            quantity=2,
+        ).delete()
+
+        self.assertEqual(self.sample("inventory_operations_total", operation="dispense", outcome="ok"), dispensed + 1)
+        self.assertEqual(self.sample("inventory_operations_total", operation="void", outcome="ok"), voided + 1)
+        self.assertEqual(self.sample("inventory_allocation_lots_count"), allocations + 1)
+
+    def test_stock_outs_are_counted(self):
+        stock_outs = self.sample("inventory_stock_out_rejections_total")
+        failed = self.sample("inventory_operations_total", operation="dispense", outcome="error")
+        with self.assertRaises(ValidationError):
+            InventoryTransaction.objects.create(
+                item=self.item,
+                created_by=self.user,
+                quantity=500,
+            )
+        self.assertEqual(self.sample("inventory_stock_out_rejections_total"), stock_outs + 1)
+        self.assertEqual(self.sample("inventory_operations_total", operation="dispense", outcome="error"), failed + 1)
+
+
+class LocationTestCase(TestCase):
+    def setUp(self):
+        self.item = create_test_item()
+        self.main = Location.objects.get(pk=default_location())
+        self.branch = Location.objects.create(code="B2", name="Branch 2")
+        self.stock = create_test_stock(self.item)
+        self.branch_stock = InventoryStock.objects.create(
+            item=self.item,
+            location=self.branch,
+            quantity=7,
+            expiration_date=datetime.date.today(),
+        )
+        self.user = User.objects.create_user(
+            email="test_email@example.com",
+            password="1234"
+        )
+
+    def test_allocation_uses_dispensing_branch_only(self):
+        InventoryTransaction.objects.create(
+            item=self.item,
+            location=self.branch,
+            created_by=self.user,
+            quantity=6,
+        )
+        self.assertEqual(InventoryStock.objects.get(id=self.stock.id).quantity, 5)
+        self.assertEqual(InventoryStock.objects.get(id=self.branch_stock.id).quantity, 1)
+
+        with self.assertRaises(ValidationError):
+            InventoryTransaction.objects.create(
+                item=self.item,
+                location=self.branch,
+                created_by=self.user,
+                quantity=2,
+            )
+
+    def test_counters_per_location(self):
+        transaction = InventoryTransaction.objects.create(
+            item=self.item,
+            created_by=self.user,
+            quantity=2,
+        )
+        self.assertEqual(self.item.stock_at(self.main), 3)
+        self.assertEqual(self.item.stock_at(self.branch), 7)
+        self.assertEqual(self.item.stocks, 10)
+
+        transaction.delete()
+        self.assertEqual(self.item.stock_at(self.main), 5)
+
+        self.stock.delete()
+        self.assertEqual(self.item.stock_at(self.main), 0)
+
+    def test_transfer(self):
+        arrived = transfer_stock(self.main, self.branch, [(self.item, 4)], created_by=self.user)
+
+        self.assertEqual([lot.quantity for lot in arrived], [4])
+        self.assertEqual(arrived[0].expiration_date, self.stock.expiration_date)
+        self.assertEqual(InventoryStock.objects.get(id=self.stock.id).quantity, 1)
+        self.assertEqual(self.item.stock_at(self.main), 1)
+        self.assertEqual(self.item.stock_at(self.branch), 11)
+        self.assertEqual(
+            set(StockMovement.objects.filter(kind__startswith="transferred").values_list("kind", "quantity")),
+            {(MovementType.TRANSFERRED_OUT, -4), (MovementType.TRANSFERRED_IN, 4)},
+        )
+        self.assertFalse(balance_mismatches().exists())
+
+    def test_transfer_is_all_or_nothing(self):
+        with self.assertRaises(ValidationError):
+            transfer_stock(self.main, self.branch, [(self.item, 50)])
+        self.assertEqual(InventoryStock.objects.get(id=self.stock.id).quantity, 5)
+        self.assertEqual(self.item.stock_at(self.branch), 7)
+
+    def test_rebuild_restores_counters(self):
+        StockLevel.objects.update(quantity=0)
+        rebuild_stock_balances()
+        self.assertEqual(self.item.stock_at(self.main), 5)
+        self.assertEqual(self.item.stock_at(self.branch), 7)
+
+
+class BarcodeScanTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        scan_cache.clear()
+        self.item = create_test_item()
+        self.stock = create_test_stock(self.item)
+        later = create_test_stock(self.item)
+        later.expiration_date += datetime.timedelta(30)
+        later.save()
+        self.user = User.objects.create_user(
+            email="test_email@example.com",
+            password="1234"
+        )
+        ItemBarcode.objects.create(code="4800016644290", item=self.item)
+        ItemBarcode.objects.create(code="14800016644297", item=self.item, level=BarcodeLevel.PACK, units_per_pack=4)
+
+    def test_barcodes_are_unique(self):
+        with self.assertRaises(Exception):
+            ItemBarcode.objects.create(code="4800016644290", item=create_test_item())
+
+    def test_unit_barcode_cannot_have_pack_size(self):
+        with self.assertRaises(ValidationError):
+            ItemBarcode.objects.create(code="1", item=self.item, units_per_pack=6)
+
+    def test_scan_is_a_single_query(self):
+        scan("unknown")  # Resolves the main location
+        with self.assertNumQueries(1):
+            payload = scan("14800016644297")
+        self.assertEqual(payload["item"]["id"], str(uuid.UUID(self.item.id)))
+        self.assertEqual((payload["sellable"], payload["sellable_packs"]), (10, 2))
+        self.assertEqual(payload["next_lot"]["id"], self.stock.id)
+
+        with self.assertNumQueries(0):
+            scan("14800016644297")
+
+    def test_stock_change_invalidates_cache(self):
+        scan("4800016644290", default_location())
+        with self.captureOnCommitCallbacks(execute=True):
+            InventoryTransaction.objects.create(
+                item=self.item,
+                created_by=self.user,
+                quantity=5,
+            )
+        payload = scan("4800016644290", default_location())
+        self.assertEqual(payload["sellable"], 5)
+        self.assertNotEqual(payload["next_lot"]["id"], self.stock.id)
+
+    def test_lot_deletion_and_expiry_edits_invalidate_cache(self):
+        self.assertEqual(scan("4800016644290", default_location())["sellable"], 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stock.expiration_date = datetime.date.today() - datetime.timedelta(days=1)
+            self.stock.save()
+        self.assertEqual(scan("4800016644290", default_location())["sellable"], 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            InventoryStock.objects.exclude(pk=self.stock.pk).get().delete()
+        self.assertEqual(scan("4800016644290", default_location())["sellable"], 0)
+
+    def test_renamed_location_is_dropped(self):
+        branch = Location.objects.create(code="B2", name="Branch 2")
+        self.assertEqual(location_id_for("B2"), branch.pk)
+        # Another worker's cached map goes too, it lives in the shared cache
+        branch.code = "B3"
+        branch.save()
+        self.assertIsNone(location_id_for("B2"))
+        self.assertEqual(location_id_for("B3"), branch.pk)
+
+    def test_scan_endpoint(self):
+        self.client.force_login(self.user)
+        response = self.client.get("/inventory/scan/4800016644290/?location=MAIN")
+        self.assertEqual(response.json()["sellable"], 10)
+        self.assertEqual(self.client.get("/inventory/scan/000/").status_code, 404)
+        self.assertEqual(self.client.get("/inventory/scan/4800016644290/?location=NOPE").status_code, 400)
+
+
+class IdempotentDispenseTestCase(TestCase):
+    def setUp(self):
+        self.item = create_test_item()
+        self.stock = create_test_stock(self.item)
+        self.user = User.objects.create_user(
+            email="test_email@example.com",
+            password="1234"
+        )
+
+    def test_retried_dispense_allocates_once(self):
+        first, created = dispensing.dispense(self.item, 2, self.user, idempotency_key="terminal-1-0001")
+        retry, retried = dispensing.dispense(self.item, 2, self.user, idempotency_key="terminal-1-0001")
+
+        self.assertEqual((created, retried), (True, False))
+        self.assertEqual(first.pk, retry.pk)
+        self.assertEqual(InventoryTransaction.objects.count(), 1)
+        self.assertEqual(InventoryStock.objects.get(id=self.stock.id).quantity, 3)
+
+    def test_key_cannot_be_reused_for_another_request(self):
+        dispensing.dispense(self.item, 2, self.user, idempotency_key="terminal-1-0001")
+        with self.assertRaises(ValidationError):
+            dispensing.dispense(self.item, 3, self.user, idempotency_key="terminal-1-0001")
+
+    def test_failed_dispense_does_not_keep_key(self):
+        with self.assertRaises(ValidationError):
+            dispensing.dispense(self.item, 50, self.user, idempotency_key="terminal-1-0001")
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_retried_void(self):
+        transaction, _ = dispensing.dispense(self.item, 2, self.user)
+        self.assertTrue(dispensing.void(transaction.pk, idempotency_key="void-1"))
+        self.assertFalse(dispensing.void(transaction.pk, idempotency_key="void-1"))
+        self.assertEqual(InventoryStock.objects.get(id=self.stock.id).quantity, 5)
+
+    def test_expired_keys(self):
+        dispensing.dispense(self.item, 1, self.user, idempotency_key="old")
+        IdempotencyKey.objects.update(created_at=timezone.now() - datetime.timedelta(days=2))
+        _, created = dispensing.dispense(self.item, 1, self.user, idempotency_key="old")
+        self.assertTrue(created)
+
+        IdempotencyKey.objects.update(created_at=timezone.now() - datetime.timedelta(days=2))
+        self.assertEqual(dispensing.purge_expired_keys(), 1)
+
+    def test_dispense_endpoint(self):
+        self.client.force_login(self.user)
+        request = dict(
+            data={"item": str(self.item.id), "quantity": 2},
+            content_type="application/json",
+            headers={"Idempotency-Key": "terminal-1-0002"},
+        )
+        first = self.client.post("/inventory/dispense/", **request)
+        retry = self.client.post("/inventory/dispense/", **request)
+
+        self.assertEqual((first.status_code, retry.status_code), (201, 200))
+        self.assertEqual(first.json(), retry.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(first.json()["allocation"], [{"stock": self.stock.id, "quantity": 2}])
+
+        response = self.client.post(f"/inventory/transactions/{first.json()['id']}/void/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(InventoryStock.objects.get(id=self.stock.id).quantity, 5)
+
+    def test_locked_database_answers_503(self):
+        self.client.force_login(self.user)
+        with mock.patch.object(dispensing, "dispense", side_effect=OperationalError("database is locked")):
+            response = self.client.post(
+                "/inventory/dispense/",
+                data={"item": str(self.item.id), "quantity": 1},
+                content_type="application/json",
+                headers={"Idempotency-Key": "terminal-1-0003"},
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+    def test_quantity_must_be_positive(self):
+        for quantity in (0, -5):
+            with self.assertRaises(ValidationError):
+                dispensing.dispense(self.item, quantity, self.user)
+
+        self.client.force_login(self.user)
+        for quantity in (0, -5):
+            response = self.client.post(
+                "/inventory/dispense/",
+                data={"item": str(self.item.id), "quantity": quantity},
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(InventoryTransaction.objects.exists())
+        self.assertEqual(InventoryStock.objects.get(id=self.stock.id).quantity, 5)
+
+
+class StockReservationTestCase(TestCase):
+    def setUp(self):
+        self.item = create_test_item()
+        self.stock = create_test_stock(self.item)
+        self.user = User.objects.create_user(
+            email="test_email@example.com",
+            password="1234"
+        )
+
+    def test_reserved_stock_is_not_sellable(self):
+        reservations.reserve(self.item, 4, self.user)
+        self.assertEqual(InventoryStock.objects.get(id=self.stock.id).reserved_quantity, 4)
+
+        with self.assertRaises(ValidationError):
+            InventoryTransaction.objects.create(item=self.item, quantity=2, created_by=self.user)
+        with self.assertRaises(ValidationError):
+            reservations.reserve(self.item, 2, self.user)
+        InventoryTransaction.objects.create(item=self.item, quantity=1, created_by=self.user)
+
+    def test_confirm_dispenses_the_held_lots(self):
+        reservation = reservations.reserve(self.item, 3, self.user)
+        # A lot that expires sooner arrives while the order is prepared
+        sooner = InventoryStock.objects.create(
+            item=self.item, quantity=5, expiration_date=datetime.date.today()
+        )
+
+        transaction = reservations.confirm(reservation)
+
+        self.assertEqual(
+            list(StockRecord.objects.filter(transaction=transaction).values_list("stock_id", "quantity")),
+            [(self.stock.id, 3)],
+        )
+        stock = InventoryStock.objects.get(id=self.stock.id)
+        self.assertEqual((stock.quantity, stock.reserved_quantity), (2, 0))
+        self.assertEqual(InventoryStock.objects.get(id=sooner.id).quantity, 5)
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertEqual(StockLevel.objects.get(item=self.item).quantity, 7)
+
+    def test_expired_reservations_are_released(self):
+        reservation = reservations.reserve(self.item, 3, self.user)
+        other = reservations.reserve(self.item, 1, self.user)
+        StockReservation.objects.update(expires_at=timezone.now())
+
+        with self.assertRaises(ValidationError):
+            reservations.confirm(reservation)
+        self.assertEqual(reservations.release_expired_reservations(), 2)
+        self.assertEqual(InventoryStock.objects.get(id=self.stock.id).reserved_quantity, 0)
+        with self.assertRaises(ValidationError):
+            reservations.confirm(other)
+
+    def test_cancel(self):
+        reservation = reservations.reserve(self.item, 5, self.user)
+        reservations.cancel(reservation)
+        self.assertEqual(InventoryStock.objects.get(id=self.stock.id).reserved_quantity, 0)
+
+    def test_lot_cannot_drop_below_reserved(self):
+        reservations.reserve(self.item, 4, self.user)
+        stock = InventoryStock.objects.get(id=self.stock.id)
+        stock.quantity = 3
+        with self.assertRaises(ValidationError):
+            stock.save()
+
+
+class WriteOffTestCase(TestCase):
+    def setUp(self):
+        self.item = create_test_item()
+        self.stock = create_test_stock(self.item)
+        self.fresh = InventoryStock.objects.create(
+            item=self.item, quantity=4, expiration_date=datetime.date.today() + datetime.timedelta(days=30)
+        )
+        self.user = User.objects.create_user(
+            email="test_email@example.com",
+            password="1234"
+        )
+
+    def expire(self, stock):
+        InventoryStock.objects.filter(pk=stock.pk).update(
+            expiration_date=datetime.date.today() - datetime.timedelta(days=1)
+        )
+
+    def test_write_off_expired_lots(self):
+        self.expire(self.stock)
+        write_offs = write_off_expired(created_by=self.user)
+
+        self.assertEqual([(w.stock_id, w.quantity) for w in write_offs], [(self.stock.id, 5)])
+        self.assertEqual(InventoryStock.objects.get(id=self.stock.id).quantity, 0)
+        self.assertEqual(InventoryStock.objects.get(id=self.fresh.id).quantity, 4)
+        self.assertEqual(InventoryItem.objects.get(id=self.item.id).stocks, 4)
+        self.assertTrue(StockMovement.objects.filter(kind=MovementType.WRITTEN_OFF, quantity=-5).exists())
+        self.assertFalse(balance_mismatches().exists())
+        self.assertEqual(write_off_expired(), [])
+
+    def test_reserved_units_stay_in_the_lot(self):
+        reservations.reserve(self.item, 2, self.user)
+        self.expire(self.stock)
+        write_off_expired()
+
+        self.assertEqual(StockWriteOff.objects.get().quantity, 3)
+        self.assertEqual(InventoryStock.objects.get(id=self.stock.id).quantity, 2)
+
+    def test_command(self):
+        self.expire(self.stock)
+        out = StringIO()
+        call_command("write_off_expired", dry_run=True, stdout=out)
+        self.assertIn("1 expired lots with 5 units.", out.getvalue())
+        self.assertFalse(StockWriteOff.objects.exists())
+
+        call_command("write_off_expired", stdout=out)
+        self.assertIn("Wrote off 5 units from 1 expired lots.", out.getvalue())
+
+    def test_dry_run_matches_write_off_of_reserved_lot(self):
+        reservations.reserve(self.item, 2, self.user)
+        self.expire(self.stock)
+        out = StringIO()
+        call_command("write_off_expired", dry_run=True, stdout=out)
+        self.assertIn("1 expired lots with 3 units.", out.getvalue())
+
+        call_command("write_off_expired", stdout=out)
+        self.assertIn("Wrote off 3 units from 1 expired lots.", out.getvalue())
+
+
+class AllocationPlanTestCase(TestCase):
+    def setUp(self):
+        self.item = create_test_item()
+        today = datetime.date.today()
+        # Delivered first but expiring last
+        self.old = InventoryStock.objects.create(
+            item=self.item, quantity=5, date_of_delivery=today - datetime.timedelta(days=10),
+            expiration_date=today + datetime.timedelta(days=60),
+        )
+        self.soon = InventoryStock.objects.create(
+            item=self.item, quantity=5, expiration_date=today + datetime.timedelta(days=5),
+        )
+        self.location = default_location()
+        self.user = User.objects.create_user(
+            email="test_email@example.com",
+            password="1234"
+        )
+
+    def lots(self, allocations, item):
+        return [(lot.pk, take) for lot, take in allocations[InventoryItem._meta.pk.to_python(item.pk)]]
+
+    def test_plan_many_items_in_one_query(self):
+        other = create_test_item()
+        create_test_stock(other)
+        with self.assertNumQueries(1):
+            allocations, shortfalls = plan([(self.item, 7), (other, 8)], self.location)
+
+        self.assertEqual(self.lots(allocations, self.item), [(self.soon.pk, 5), (self.old.pk, 2)])
+        self.assertEqual(shortfalls, {InventoryItem._meta.pk.to_python(other.pk): 3})
+        self.assertEqual(InventoryStock.objects.get(pk=self.soon.pk).quantity, 5)
+
+    def test_strategies(self):
+        allocations, _ = plan([(self.item, 7)], self.location, "fifo")
+        self.assertEqual(self.lots(allocations, self.item), [(self.old.pk, 5), (self.soon.pk, 2)])
+
+        allocations, shortfalls = plan([(self.item, 7)], self.location, PinnedLots([self.old.pk]))
+        self.assertEqual(self.lots(allocations, self.item), [(self.old.pk, 5)])
+        self.assertEqual(list(shortfalls.values()), [2])
+
+        with self.assertRaises(ValidationError):
+            plan([(self.item, 1)], self.location, "lifo")
+
+    def test_quantities_must_be_positive(self):
+        with self.assertRaises(ValidationError):
+            plan([(self.item, -3)], self.location)
+
+        self.client.force_login(self.user)
+        response = self.client.post(
+            "/inventory/dispense/plan/",
+            data={"lines": [{"item": str(self.item.pk), "quantity": -3}]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_dispense_follows_preview(self):
+        allocations, _ = plan([(self.item, 6)], self.location, "fifo")
+        transaction, _ = dispensing.dispense(self.item, 6, self.user, strategy="fifo")
+        self.assertEqual(
+            list(StockRecord.objects.filter(transaction=transaction).order_by("pk").values_list("stock_id", "quantity")),
+            self.lots(allocations, self.item),
+        )
+
+    def test_plan_endpoint(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            "/inventory/dispense/plan/",
+            data={"lines": [{"item": str(self.item.pk), "quantity": 3}], "strategy": "pinned", "lots": [self.old.pk]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        line = response.json()["lines"][0]
+        self.assertEqual([(lot["stock"], lot["quantity"]) for lot in line["lots"]], [(self.old.pk, 3)])
+        self.assertEqual(line["shortfall"], 0)
+        self.assertFalse(InventoryTransaction.objects.exists())
+
+
+class ReconcileStockTestCase(TestCase):
+    def setUp(self):
+        self.item = create_test_item()
+        self.stock = create_test_stock(self.item)
+        self.user = User.objects.create_user(
+            email="test_email@example.com",
+            password="1234"
+        )
+
+    def test_received_quantity(self):
+        self.assertEqual(self.stock.received_quantity, 5)
+        InventoryTransaction.objects.create(item=self.item, quantity=2, created_by=self.user)
+        stock = InventoryStock.objects.get(id=self.stock.id)
+        stock.quantity = 4  # Counted one more than on record
+        stock.save()
+        self.assertEqual(InventoryStock.objects.get(id=self.stock.id).received_quantity, 6)
+
+    def test_ledger_operations_reconcile(self):
+        branch = Location.objects.create(code="B2", name="Branch 2")
+        InventoryTransaction.objects.create(item=self.item, quantity=2, created_by=self.user)
+        transfer_stock(default_location(), branch, [(self.item, 1)])
+        InventoryStock.objects.filter(pk=self.stock.pk).update(
+            expiration_date=datetime.date.today() - datetime.timedelta(days=1)
+        )
+        write_off_expired()
+
+        self.assertEqual(list(reconcile(processes=1)), [])
+
+    def test_repair(self):
+        InventoryStock.objects.filter(pk=self.stock.pk).update(quantity=9)
+        out = StringIO()
+        call_command("reconcile_stock", processes=1, stdout=out)
+        self.assertIn(f"Lot {self.stock.pk} of item {self.item.pk}: quantity 9, expected 5", out.getvalue())
+
+        call_command("reconcile_stock", processes=1, repair=True, stdout=out)
+        self.assertIn("Repaired 1 of 1 lots.", out.getvalue())
+        self.assertEqual(InventoryStock.objects.get(id=self.stock.id).quantity, 5)
+        self.assertFalse(discrepancies().exists())
+        self.assertFalse(balance_mismatches().exists())
+
+
+class LoadTestTestCase(TestCase):
+    def setUp(self):
+        scan_cache.clear()
+
+    def test_seed(self):
+        self.assertEqual(loadtest.seed(5, lots_per_item=2), 5)
+        self.assertEqual(loadtest.seed(5, lots_per_item=2), 0)
+        self.assertEqual(InventoryStock.objects.filter(item__brand_name=loadtest.LOADTEST_BRAND).count(), 10)
+        self.assertEqual(ItemBarcode.objects.filter(code__startswith="LT").count(), 5)
+
+    def test_branches(self):
+        loadtest.seed(3, lots_per_item=1, locations=2)
+        self.assertEqual(
+            sorted(InventoryStock.objects.values_list("location__code", flat=True)),
+            ["LT1"] * 3 + ["MAIN"] * 3,
+        )
+        terminal = loadtest.ModelTerminal(loadtest.loadtest_user().pk, None, "LT1")
+        item = InventoryItem.objects.filter(brand_name=loadtest.LOADTEST_BRAND).first()
+        transaction = InventoryTransaction.objects.get(pk=terminal.dispense(item.pk, 1, "key"))
+        self.assertEqual(transaction.location.code, "LT1")
+
+    def test_run_stays_consistent(self):
+        loadtest.seed(5)
+        elapsed, results = loadtest.run(1, operations=100, seed=1)
+        self.assertEqual(sum(len(values) for values in results["latencies"].values()), 100)
+        self.assertGreater(results["outcomes"][("dispense", "ok")], 0)
+        self.assertGreater(results["outcomes"][("void", "ok")], 0)
+        self.assertEqual(set(loadtest.consistency().values()), {0})
+
+    def test_parse_mix(self):
+        self.assertEqual(
+            loadtest.parse_mix("dispense=3,lookup=1"),
+            {"dispense": 3, "void": 0, "lookup": 1, "delivery": 0},
+        )
+        with self.assertRaises(ValueError):
+            loadtest.parse_mix("refund=1")
+
+    def test_command(self):
+        out = StringIO()
+        call_command("loadtest", workers=1, operations=20, items=3, stdout=out)
+        self.assertIn("20 operations by 1 terminals", out.getvalue())
+        self.assertIn("lots that do not reconcile: 0", out.getvalue())
+
+
+class ChangeFeedTestCase(TestCase):
+    def setUp(self):
+        self.item = create_test_item()
+        self.stock = create_test_stock(self.item)
+        self.user = User.objects.create_user(
+            email="test_email@example.com",
+            password="1234"
+        )
+        self.cursor = changes.changes()["cursor"]
+
+    def changed(self):
+        page = changes.changes(self.cursor)
+        self.cursor = page["cursor"]
+        rows = {row[0]: dict(zip(page["fields"], row)) for row in page["items"]}
+        return rows, page["deleted"]
+
+    def test_full_sync(self):
+        page = changes.changes()
+        self.assertEqual(page["items"][0][0], str(self.item.pk))
+        self.assertEqual(dict(zip(page["fields"], page["items"][0]))["sellable"], 5)
+        self.assertEqual(changes.changes(page["cursor"])["items"], [])
+
+    def test_stock_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            transaction, _ = dispensing.dispense(self.item, 2, self.user)
+        rows, _ = self.changed()
+        self.assertEqual(rows[str(self.item.pk)]["sellable"], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reservations.reserve(self.item, 1, self.user)
+        self.assertEqual(self.changed()[0][str(self.item.pk)]["sellable"], 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            dispensing.void(transaction)
+        self.assertEqual(self.changed()[0][str(self.item.pk)]["sellable"], 4)
+        self.assertEqual(self.changed(), ({}, []))
+
+    def test_stock_changes_are_numbered_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            dispensing.dispense(self.item, 2, self.user)
+            self.assertEqual(self.changed(), ({}, []))
+        for callback in callbacks:
+            callback()
+        self.assertIn(str(self.item.pk), self.changed()[0])
+
+    def test_lot_deletion_and_expiry_edits(self):
+        other = create_test_stock(self.item)
+        self.changed()
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertEqual(self.changed()[0][str(self.item.pk)]["sellable"], 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stock.expiration_date = datetime.date.today() - datetime.timedelta(days=1)
+            self.stock.save()
+        self.assertEqual(self.changed()[0][str(self.item.pk)]["sellable"], 0)
+
+    def test_moving_a_lot_moves_its_counters(self):
+        branch = Location.objects.create(code="B2", name="Branch 2")
+        self.stock.location = branch
+        self.stock.save()
+        self.assertEqual(self.item.stock_at(default_location()), 0)
+        self.assertEqual(self.item.stock_at(branch), 5)
+        self.assertFalse(balance_mismatches().exists())
+        self.assertEqual(list(reconcile(processes=1)), [])
+
+    def test_barcode_changes(self):
+        ItemBarcode.objects.create(code="4800000000017", item=self.item)
+        rows, _ = self.changed()
+        self.assertEqual(rows[str(self.item.pk)]["barcodes"], [["4800000000017", "unit", 1]])
+
+    def test_archived_items_are_tombstones(self):
+        self.item.delete()
+        self.assertEqual(self.changed(), ({}, [str(self.item.pk)]))
+        # A terminal syncing from scratch never had the item
+        self.assertEqual(changes.changes()["deleted"], [])
+
+        InventoryItem.all_objects.filter(pk=self.item.pk).restore()
+        self.assertIn(str(self.item.pk), self.changed()[0])
+
+    def test_pages_split_items_changed_together(self):
+        create_test_item()
+        create_test_item()
+        InventoryItem.objects.touch()
+        first = changes.changes(self.cursor, limit=2)
+        second = changes.changes(first["cursor"], limit=2)
+
+        self.assertTrue(first["more"])
+        self.assertFalse(second["more"])
+        ids = [row[0] for row in first["items"] + second["items"]]
+        self.assertEqual(sorted(ids), sorted(str(pk) for pk in InventoryItem.objects.values_list("pk", flat=True)))
+
+    def test_endpoint(self):
+        self.client.force_login(self.user)
+        response = self.client.get("/inventory/changes/", {"since": "0"}, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+        response = self.client.get("/inventory/changes/", {"since": "soon"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/inventory/changes/", {"location": "NOWHERE"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ValuationTestCase(TestCase):
+    def setUp(self):
+        self.item = create_test_item()
+        self.stock = create_test_stock(self.item)
+        self.stock.unit_cost = Decimal("2.50")
+        self.stock.save()
+        self.user = User.objects.create_user(
+            email="test_email@example.com",
+            password="1234"
+        )
+
+    def totals(self):
+        valuation = report()
+        return valuation["total_quantity"], valuation["total_value"]
+
+    def test_movements_update_the_summary(self):
+        self.assertEqual(self.totals(), (5, Decimal("12.50")))
+        InventoryStock.objects.create(
+            item=self.item,
+            quantity=10,
+            unit_cost=Decimal("1.25"),
+            expiration_date=datetime.date.today() + datetime.timedelta(days=200),
+            date_of_delivery=datetime.date.today(),
+        )
+        self.assertEqual(self.totals(), (15, Decimal("25.00")))
+
+        transaction, _ = dispensing.dispense(self.item, 7, self.user)
+        self.assertEqual(self.totals(), (8, Decimal("10.00")))
+        dispensing.void(transaction)
+        self.assertEqual(self.totals(), (15, Decimal("25.00")))
+        self.assertEqual(valuation_mismatches(), [])
+
+    def test_write_off(self):
+        self.stock.expiration_date = datetime.date.today() - datetime.timedelta(days=1)
+        self.stock.save()
+        self.assertEqual([(row["bucket"], row["quantity"]) for row in report()["rows"]], [("expired", 5)])
+
+        write_off_expired()
+        self.assertEqual(self.totals(), (0, 0))
+        self.assertEqual(valuation_mismatches(), [])
+
+    def test_buckets_and_categories(self):
+        self.stock.unit_cost = Decimal("4")
+        self.stock.save()
+        self.item.category = CategoryType.PAIN_RELIEVERS
+        self.item.subcategory = SubcategoryType.ANALGESICS
+        self.item.save()
+        InventoryStock.objects.create(
+            item=create_test_item(),
+            quantity=3,
+            unit_cost=Decimal("1"),
+            expiration_date=datetime.date.today() + datetime.timedelta(days=400),
+            date_of_delivery=datetime.date.today(),
+        )
+
+        rows = [
+            (row["category"], row["subcategory"], row["bucket"], row["quantity"], row["value"])
+            for row in report()["rows"]
+        ]
+        self.assertEqual(rows, [
+            (CategoryType.ANTACIDS, SubcategoryType.ANTACID, "over a year", 3, Decimal("3")),
+            (CategoryType.PAIN_RELIEVERS, SubcategoryType.ANALGESICS, "0-30 days", 5, Decimal("20")),
+        ])
+        self.assertEqual(valuation_mismatches(), [])
+
+    def test_rebuild(self):
+        InventoryStock.objects.filter(pk=self.stock.pk).update(quantity=9)
+        self.assertEqual(len(valuation_mismatches()), 1)
+
+        out = StringIO()
+        call_command("rebuild_valuation", stdout=out)
+        self.assertIn("Rebuilt 1 valuation summary rows", out.getvalue())
+        self.assertEqual(self.totals(), (9, Decimal("22.50")))
+        self.assertEqual(rebuild_valuation(), 1)
+
+    def test_endpoint(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get("/inventory/valuation/").status_code, 403)
+
+        self.user.user_permissions.add(Permission.objects.get(codename="view_valuationsummary"))
+        response = self.client.get("/inventory/valuation/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["total_value"], "12.50")
@@ -0,0 +1,69 @@
+"""
+Moving stock between branches.
+"""
+from django.db import transaction as transaction_db
+from django.forms import ValidationError
+
+from .allocation import plan
+from .models import InventoryStock, MovementType, StockMovement
+
+
+@transaction_db.atomic
+def transfer_stock(source, destination, lines, created_by=None):
+    """
+    Move stock from ``source`` to ``destination``.
+
+    ``lines`` is a list of ``(item, quantity)``. Every line is taken from
+    the source's lots first-expiry-first-out, and arrives as new lots at
+    the destination that keep their delivery and expiration dates. All
+    lots are read and written in bulk, and nothing moves unless every
+    line can be filled. Returns the lots created at the destination.
+    """
+    if source == destination:
+        raise ValidationError("Cannot transfer stock to the same location.")
+    allocations, shortfalls = plan(lines, source, lock=True)
+    if shortfalls:
+        raise ValidationError("Not enough stocks to make this transfer!")
+    taken = [(lot, take) for lots in allocations.values() for lot, take in lots]
+    for lot, take in taken:
+        lot.quantity -= take
+
+    InventoryStock.objects.bulk_update([lot for lot, _ in taken], ["quantity"])
+    arrived = InventoryStock.objects.bulk_create(
+        InventoryStock(
+            item_id=lot.item_id,
+            location=destination,
+            date_of_delivery=lot.date_of_delivery,
+            expiration_date=lot.expiration_date,
+            unit_cost=lot.unit_cost,
+            quantity=take,
+            received_quantity=take,
+            created_by=created_by,
+        )
+        for lot, take in taken
+    )
+
+    StockMovement.objects.record(
+        [
+            StockMovement(
+                stock=lot,
+                item_id=lot.item_id,
+                location_id=lot.location_id,
+                kind=MovementType.TRANSFERRED_OUT,
+                quantity=-take,
+                created_by=created_by,
+            )
+            for lot, take in taken
+        ] + [
+            StockMovement(
+                stock=lot,
+                item_id=lot.item_id,
+                location=destination,
+                kind=MovementType.TRANSFERRED_IN,
+                quantity=lot.quantity,
+                created_by=created_by,
+            )
+            for lot in arrived
+        ]
+    )
+    return arrived
@@ -0,0 +1,14 @@
+from django.urls import path
+
+from . import views
+
+app_name = "inventory"
+
+urlpatterns = [
+    path("scan/<str:code>/", views.scan_barcode, name="scan"),
+    path("dispense/", views.dispense, name="dispense"),
+    path("dispense/plan/", views.plan_allocation, name="plan"),
+    path("transactions/<int:pk>/void/", views.void, name="void"),
+    path("changes/", views.change_feed, name="changes"),
+    path("valuation/", views.valuation_report, name="valuation"),
+]
@@ -0,0 +1,103 @@
+"""
+Inventory value by category, subcategory and expiry bucket.
+
+``ValuationSummary`` keeps the quantity and value (quantity times unit
+cost) of the lots per category, subcategory and expiration date, updated
+in the same transaction as every stock movement. The report only groups
+those rows into buckets relative to today, so it reads a few hundred
+rows however many lots there are. ``manage.py rebuild_valuation``
+recomputes the summary from the lots.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db import transaction as transaction_db
+from django.db.models import Case, CharField, Sum, Value, When
+
+from .models import InventoryStock, ValuationSummary, lot_values
+
+CENTS = Decimal("0.01")
+
+# Upper bounds in days until expiry, the last bucket has none
+BUCKETS = [
+    ("expired", 0),
+    ("0-30 days", 31),
+    ("31-90 days", 91),
+    ("91-180 days", 181),
+    ("181-365 days", 366),
+    ("over a year", None),
+]
+
+
+def expiry_bucket(today):
+    whens = [
+        When(expiration_date__lt=today + datetime.timedelta(days=days), then=Value(name))
+        for name, days in BUCKETS if days is not None
+    ]
+    return Case(*whens, default=Value(BUCKETS[-1][0]), output_field=CharField())
+
+
+def lot_totals():
+    """``{(category, subcategory, expiration_date): (quantity, value)}`` computed from the lots."""
+    return {
+        (category, subcategory, expiration_date): (quantity, value or Decimal(0))
+        for category, subcategory, expiration_date, quantity, value in lot_values(
+            InventoryStock.objects.all(), "item__category", "item__subcategory"
+        )
+    }
+
+
+def valuation_mismatches():
+    """``(key, summary (quantity, value), lot (quantity, value))`` where the summary disagrees with the lots."""
+    summary = {
+        (row.category, row.subcategory, row.expiration_date): (row.quantity, row.value)
+        for row in ValuationSummary.objects.exclude(quantity=0, value=0)
+    }
+    lots = lot_totals()
+    return [
+        (key, summary.get(key, (0, Decimal(0))), lots.get(key, (0, Decimal(0))))
+        for key in sorted(summary.keys() | lots.keys())
+        if summary.get(key, (0, Decimal(0))) != lots.get(key, (0, Decimal(0)))
+    ]
+
+
+@transaction_db.atomic
+def rebuild_valuation() -> int:
+    """Recompute the summary from the lots. Returns the number of summary rows."""
+    # Lock the lots so no movement changes them between the delete and the insert
+    list(InventoryStock.objects.select_for_update().values_list("pk", flat=True))
+    ValuationSummary.objects.all().delete()
+    rows = ValuationSummary.objects.bulk_create(
+        ValuationSummary(
+            category=category,
+            subcategory=subcategory,
+            expiration_date=expiration_date,
+            quantity=quantity,
+            value=value,
+        )
+        for (category, subcategory, expiration_date), (quantity, value) in lot_totals().items()
+    )
+    return len(rows)
+
+
+def report(today=None):
+    """Quantity and value (rounded to cents) per category, subcategory and expiry bucket, with the totals."""
+    today = today or datetime.date.today()
+    order = {name: position for position, (name, _) in enumerate(BUCKETS)}
+    rows = sorted(
+        ValuationSummary.objects.exclude(quantity=0, value=0)
+        .annotate(bucket=expiry_bucket(today))
+        .order_by()
+        .values("category", "subcategory", "bucket")
+        .annotate(quantity=Sum("quantity"), value=Sum("value")),
+        key=lambda row: (row["category"], row["subcategory"], order[row["bucket"]]),
+    )
+    total_value = sum((row["value"] for row in rows), Decimal(0))
+    for row in rows:
+        row["value"] = row["value"].quantize(CENTS)
+    return {
+        "as_of": today,
+        "total_quantity": sum(row["quantity"] for row in rows),
+        "total_value": total_value.quantize(CENTS),
+        "rows": rows,
+    }
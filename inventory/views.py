@@ -1,3 +1,194 @@
-from django.shortcuts import render
+import json
+from functools import wraps
 
-# Create your views here.
+from django.contrib.auth.decorators import login_required, permission_required
+from django.db import OperationalError
+from django.forms import ValidationError
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET, require_POST
+
+from project.replicas import replica_reads
+
+from . import changes, dispensing, valuation
+from .allocation import PinnedLots, get_strategy, plan
+from .models import InventoryItem, InventoryTransaction, Location
+from .scanning import location_id_for, scan
+
+
+def transaction_payload(transaction):
+    return {
+        "id": transaction.pk,
+        "item": str(transaction.item_id),
+        "location": transaction.location_id,
+        "quantity": transaction.quantity,
+        "created_at": transaction.created_at.isoformat(),
+        "allocation": [
+            {"stock": record.stock_id, "quantity": record.quantity}
+            for record in transaction.stockrecord_set.order_by("pk")
+        ],
+    }
+
+
+def replay_headers(created):
+    return {} if created else {"Idempotent-Replayed": "true"}
+
+
+def location_from(body):
+    if not body.get("location"):
+        return None
+    return get_object_or_404(Location, code=body["location"])
+
+
+def strategy_from(body):
+    """The allocation ``strategy`` named in a request body, with its ``lots`` when pinned."""
+    if not body.get("strategy"):
+        return None
+    if body["strategy"] == PinnedLots.name:
+        return PinnedLots(body.get("lots", []))
+    return get_strategy(body["strategy"])
+
+
+@login_required
+@require_GET
+def scan_barcode(req, code):
+    location_id = None
+    if "location" in req.GET:
+        location_id = location_id_for(req.GET["location"])
+        if location_id is None:
+            return JsonResponse({"error": "Unknown location."}, status=400)
+    payload = scan(code, location_id)
+    if payload is None:
+        return JsonResponse({"error": "Unknown barcode."}, status=404)
+    return JsonResponse(payload)
+
+
+def busy_on_lock_errors(view):
+    """Answer 503 when the database is locked, so terminals can retry with the same key."""
+    @wraps(view)
+    def wrapper(req, *args, **kwargs):
+        try:
+            return view(req, *args, **kwargs)
+        except OperationalError as e:
+            if not dispensing.is_lock_error(e):
+                raise
+            return JsonResponse({"error": "The database is busy, retry."}, status=503, headers={"Retry-After": "1"})
+    return wrapper
+
+
+@login_required
+@require_POST
+@busy_on_lock_errors
+def dispense(req):
+    """
+    Dispense from a JSON body of ``item``, ``quantity`` and optionally a
+    ``location`` code and allocation ``strategy``. Send an
+    ``Idempotency-Key`` header to make the request safe to retry.
+    """
+    try:
+        body = json.loads(req.body)
+        quantity = int(body["quantity"])
+        if quantity <= 0:
+            return JsonResponse({"error": "The quantity must be positive."}, status=400)
+        item = get_object_or_404(InventoryItem, pk=body["item"])
+        transaction, created = dispensing.dispense(
+            item,
+            quantity,
+            req.user,
+            location=location_from(body),
+            idempotency_key=req.headers.get("Idempotency-Key"),
+            strategy=strategy_from(body),
+        )
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": "Expected a JSON body with item and quantity."}, status=400)
+    except ValidationError as e:
+        return JsonResponse({"error": " ".join(e.messages)}, status=409)
+    return JsonResponse(
+        transaction_payload(transaction),
+        status=201 if created else 200,
+        headers=replay_headers(created),
+    )
+
+
+@login_required
+@require_POST
+@busy_on_lock_errors
+def void(req, pk):
+    key = req.headers.get("Idempotency-Key")
+    try:
+        voided = dispensing.void(pk, idempotency_key=key)
+    except InventoryTransaction.DoesNotExist:
+        return JsonResponse({"error": "Unknown transaction."}, status=404)
+    except ValidationError as e:
+        return JsonResponse({"error": " ".join(e.messages)}, status=409)
+    return JsonResponse({"id": pk, "voided": True}, headers=replay_headers(voided))
+
+
+@login_required
+@require_POST
+def plan_allocation(req):
+    """
+    Preview the lots a dispense of the JSON ``lines`` (each an ``item`` and
+    ``quantity``) would take, with the same ``location`` and ``strategy``
+    fields as a dispense. Nothing is written or locked.
+    """
+    try:
+        body = json.loads(req.body)
+        lines = [(line["item"], int(line["quantity"])) for line in body["lines"]]
+        allocations, shortfalls = plan(lines, location_from(body), strategy_from(body))
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": "Expected a JSON body with lines of item and quantity."}, status=400)
+    except ValidationError as e:
+        return JsonResponse({"error": " ".join(e.messages)}, status=400)
+    return JsonResponse({
+        "lines": [
+            {
+                "item": str(item_id),
+                "lots": [
+                    {
+                        "stock": lot.pk,
+                        "expiration_date": lot.expiration_date.isoformat(),
+                        "date_of_delivery": lot.date_of_delivery.isoformat(),
+                        "quantity": take,
+                    }
+                    for lot, take in lots
+                ],
+                "shortfall": shortfalls.get(item_id, 0),
+            }
+            for item_id, lots in allocations.items()
+        ],
+    })
+
+
+@gzip_page
+@login_required
+@require_GET
+def change_feed(req):
+    """
+    Items changed after the ``since`` cursor, with their sellable stock at
+    the ``location`` code, see ``inventory.changes``.
+    """
+    location_id = None
+    if "location" in req.GET:
+        location_id = location_id_for(req.GET["location"])
+        if location_id is None:
+            return JsonResponse({"error": "Unknown location."}, status=400)
+    try:
+        page = changes.changes(
+            req.GET.get("since", "0"),
+            location_id,
+            int(req.GET.get("limit", changes.DEFAULT_LIMIT)),
+        )
+    except ValueError:
+        return JsonResponse({"error": "Expected a cursor from an earlier page and a numeric limit."}, status=400)
+    return JsonResponse(page, json_dumps_params={"separators": (",", ":")})
+
+
+@replica_reads
+@login_required
+@permission_required("inventory.view_valuationsummary", raise_exception=True)
+@require_GET
+def valuation_report(req):
+    """Inventory value by category, subcategory and expiry bucket, read from the valuation summary."""
+    return JsonResponse(valuation.report())
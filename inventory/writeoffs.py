@@ -0,0 +1,75 @@
+"""
+Writing off expired stock.
+
+Expired lots keep their quantity until they are written off, which
+zeroes them in a single UPDATE, logs the quantities in StockWriteOff
+and records WRITTEN_OFF movements so the stock counters follow. Units
+held by a reservation are left in the lot until it is released.
+"""
+import datetime
+
+from django.db import transaction as transaction_db
+from django.db.models import F
+from django.utils import timezone
+
+from .models import InventoryStock, MovementType, StockMovement, StockWriteOff
+
+BATCH_SIZE = 500
+
+
+def write_off_quantity():
+    """What writing off a lot takes from it: everything not held by a reservation."""
+    return F("quantity") - F("reserved_quantity")
+
+
+def expired_lots(lots=None, today=None):
+    """Lots past their expiration date with quantity left to write off."""
+    lots = InventoryStock.objects.all() if lots is None else lots
+    return lots.filter(
+        expiration_date__lt=today or datetime.date.today(),
+        quantity__gt=F("reserved_quantity"),
+    )
+
+
+@transaction_db.atomic
+def write_off_expired(lots=None, created_by=None):
+    """Write off the expired ``lots`` (all lots by default). Returns the write-offs."""
+    lots = expired_lots(lots, datetime.date.today())
+    expired = list(
+        lots.select_for_update().annotate(write_off=write_off_quantity()).values_list(
+            "pk", "item_id", "location_id", "expiration_date", "write_off"
+        )
+    )
+    if not expired:
+        return []
+    now = timezone.now()
+    write_offs = StockWriteOff.objects.bulk_create(
+        (
+            StockWriteOff(
+                stock_id=pk,
+                item_id=item_id,
+                location_id=location_id,
+                expiration_date=expiration_date,
+                quantity=quantity,
+                created_by=created_by,
+                created_at=now,
+            )
+            for pk, item_id, location_id, expiration_date, quantity in expired
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    # The rows are locked, so the same filter matches exactly the lots read above
+    lots.update(quantity=F("reserved_quantity"))
+    StockMovement.objects.record(
+        StockMovement(
+            stock_id=write_off.stock_id,
+            item_id=write_off.item_id,
+            location_id=write_off.location_id,
+            kind=MovementType.WRITTEN_OFF,
+            quantity=-write_off.quantity,
+            created_by=created_by,
+            created_at=now,
+        )
+        for write_off in write_offs
+    )
+    return write_offs
@@ -0,0 +1,28 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job, JobStatus, PeriodicJob
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "task", "status", "attempts", "max_attempts", "run_at", "started_at", "finished_at")
+    list_filter = ("status", "task")
+    search_fields = ("task",)
+    readonly_fields = ("result", "last_error", "created_at", "started_at", "finished_at")
+    actions = ["retry"]
+
+    @admin.action(description="Retry selected jobs now")
+    def retry(self, request, queryset):
+        count = queryset.exclude(status=JobStatus.RUNNING).update(
+            status=JobStatus.QUEUED,
+            attempts=0,
+            run_at=timezone.now(),
+        )
+        self.message_user(request, f"Requeued {count} jobs.")
+
+
+@admin.register(PeriodicJob)
+class PeriodicJobAdmin(admin.ModelAdmin):
+    list_display = ("name", "task", "schedule", "enabled", "next_run_at", "last_run_at")
+    list_filter = ("enabled",)
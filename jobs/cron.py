@@ -0,0 +1,92 @@
+"""
+Minimal cron expressions for periodic jobs.
+
+Supports the five standard fields (minute hour day-of-month month
+day-of-week) with ``*``, lists, ranges and steps, plus the usual
+``@hourly``-style aliases. Sunday is day 0 (or 7). Expressions are
+matched against the local time of the TIME_ZONE setting, so "0 2 * * *"
+is 2 AM at the pharmacy whatever the server's clock says.
+"""
+import datetime
+
+from django.utils import timezone
+
+ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+    "@yearly": "0 0 1 1 *",
+}
+
+FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+# How far ahead next_run looks before giving up, e.g. on "0 0 30 2 *"
+MAX_DAYS = 5 * 366
+
+
+class CronError(ValueError):
+    pass
+
+
+def _parse_field(field, low, high):
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step = part.split("/", 1)
+            step = int(step)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(value) for value in part.split("-", 1))
+        else:
+            start = end = int(part)
+            if step != 1:
+                end = high
+        if start < low or end > high or start > end or step < 1:
+            raise CronError(f"{field!r} is outside {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def parse(expression):
+    """Return the minute, hour, day, month and weekday sets of ``expression``."""
+    fields = ALIASES.get(expression.strip(), expression).split()
+    if len(fields) != 5:
+        raise CronError(f"Expected 5 fields in {expression!r}")
+    try:
+        minutes, hours, days, months, weekdays = (
+            _parse_field(field, low, high) for field, (low, high) in zip(fields, FIELD_RANGES)
+        )
+    except ValueError as e:
+        raise CronError(f"Invalid cron expression {expression!r}: {e}") from e
+    if 7 in weekdays:
+        weekdays = (weekdays - {7}) | {0}
+    # Like cron, a restricted day-of-month OR a restricted weekday matches
+    any_day = fields[2] == "*" or fields[4] == "*"
+    return minutes, hours, days, months, weekdays, any_day
+
+
+def next_run(expression, after):
+    """The first time strictly after ``after`` that matches ``expression``."""
+    minutes, hours, days, months, weekdays, any_day = parse(expression)
+    if timezone.is_aware(after):
+        after = timezone.localtime(after)
+    start = after.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+
+    day = start.replace(hour=0, minute=0)
+    for _ in range(MAX_DAYS):
+        # isoweekday() is 1-7 from Monday, cron counts 0-6 from Sunday
+        day_match = day.day in days
+        weekday_match = day.isoweekday() % 7 in weekdays
+        matches = (day_match and weekday_match) if any_day else (day_match or weekday_match)
+        if day.month in months and matches:
+            for hour in sorted(hours):
+                for minute in sorted(minutes):
+                    candidate = day.replace(hour=hour, minute=minute)
+                    if candidate >= start:
+                        return candidate
+        day += datetime.timedelta(days=1)
+    raise CronError(f"{expression!r} never matches")
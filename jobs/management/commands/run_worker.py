@@ -0,0 +1,45 @@
+import datetime
+import os
+import signal
+
+from django.core.management.base import BaseCommand
+
+from jobs.worker import Worker, requeue_stale_jobs, run_pending
+
+
+class Command(BaseCommand):
+    help = "Run queued and periodic background jobs in a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=os.cpu_count())
+        parser.add_argument("--poll-interval", type=float, default=1.0)
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=3600,
+            help="Requeue jobs that have been running for longer than this many seconds.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run the jobs that are due in this process and exit.",
+        )
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_jobs(datetime.timedelta(seconds=options["stale_after"]))
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale jobs.")
+
+        if options["once"]:
+            count = run_pending()
+            self.stdout.write(self.style.SUCCESS(f"Ran {count} jobs."))
+            return
+
+        worker = Worker(options["processes"], options["poll_interval"])
+        signal.signal(signal.SIGTERM, worker.stop)
+        self.stdout.write(f"Worker started with {options['processes']} processes.")
+        try:
+            worker.run()
+        except KeyboardInterrupt:
+            worker.stop()
+        self.stdout.write("Worker stopped.")
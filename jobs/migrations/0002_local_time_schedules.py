@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='periodicjob',
+            name='schedule',
+            field=models.CharField(help_text="Cron expression in the TIME_ZONE setting's local time, e.g. '0 2 * * *'.", max_length=64),
+        ),
+    ]
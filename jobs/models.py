@@ -0,0 +1,72 @@
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.utils import timezone
+
+from . import cron
+
+
+class JobStatus(models.TextChoices):
+    QUEUED = "queued", "Queued"
+    RUNNING = "running", "Running"
+    SUCCEEDED = "succeeded", "Succeeded"
+    FAILED = "failed", "Failed"
+
+
+class PeriodicJob(models.Model):
+    """Enqueues a Job for ``task`` every time ``schedule`` comes around."""
+    name = models.CharField(max_length=128, unique=True)
+    task = models.CharField(max_length=128)
+    kwargs = models.JSONField(default=dict, blank=True)
+    schedule = models.CharField(
+        max_length=64,
+        help_text="Cron expression in the TIME_ZONE setting's local time, e.g. '0 2 * * *'.",
+    )
+    enabled = models.BooleanField(default=True)
+    next_run_at = models.DateTimeField(null=True, blank=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+
+    def clean(self):
+        # The registry imports this module for Job
+        from .registry import get_task
+
+        try:
+            cron.parse(self.schedule)
+        except cron.CronError as e:
+            raise ValidationError({"schedule": str(e)})
+        try:
+            get_task(self.task)
+        except LookupError as e:
+            raise ValidationError({"task": str(e)})
+
+    def save(self, *args, **kwargs):
+        self.clean()
+        if self.next_run_at is None:
+            self.next_run_at = cron.next_run(self.schedule, timezone.now())
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.name
+
+
+class Job(models.Model):
+    task = models.CharField(max_length=128)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=16, choices=JobStatus.choices, default=JobStatus.QUEUED)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    periodic_job = models.ForeignKey(PeriodicJob, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk}"
@@ -0,0 +1,50 @@
+"""
+Task registration and enqueueing.
+
+Apps register functions in their ``tasks.py`` module::
+
+    @task
+    def rebuild_stock_balances():
+        ...
+
+and queue them with ``enqueue("inventory.tasks.rebuild_stock_balances")``
+or ``enqueue(rebuild_stock_balances)``. Arguments and return values
+must be JSON serializable.
+"""
+from .models import Job
+
+_tasks = {}
+
+
+def task(func=None, *, name=None):
+    def register(func):
+        _tasks[name or f"{func.__module__}.{func.__qualname__}"] = func
+        return func
+
+    return register(func) if func else register
+
+
+def get_task(name):
+    try:
+        return _tasks[name]
+    except KeyError:
+        raise LookupError(f"No task registered as {name!r}")
+
+
+def registered_tasks():
+    return sorted(_tasks)
+
+
+def enqueue(task, *args, run_at=None, max_attempts=3, **kwargs):
+    if isinstance(task, str):
+        get_task(task)
+        name = task
+    else:
+        name = next((name for name, func in _tasks.items() if func is task), None)
+        if name is None:
+            raise LookupError(f"{task!r} is not a registered task")
+    job = Job(task=name, args=list(args), kwargs=kwargs, max_attempts=max_attempts)
+    if run_at is not None:
+        job.run_at = run_at
+    job.save()
+    return job
@@ -0,0 +1,108 @@
+import datetime
+import importlib
+from io import StringIO
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import cron
+from .models import Job, JobStatus, PeriodicJob
+from .registry import enqueue, task
+from .worker import claim_jobs, run_pending, schedule_periodic_jobs
+
+
+@task(name="jobs.tests.add")
+def add(a, b):
+    return a + b
+
+
+@task(name="jobs.tests.fail")
+def fail():
+    raise RuntimeError("boom")
+
+
+class CronTestCase(TestCase):
+    def test_next_run(self):
+        after = datetime.datetime(2025, 3, 25, 13, 32)
+        self.assertEqual(cron.next_run("*/15 * * * *", after), datetime.datetime(2025, 3, 25, 13, 45))
+        self.assertEqual(cron.next_run("0 2 * * *", after), datetime.datetime(2025, 3, 26, 2, 0))
+        self.assertEqual(cron.next_run("@monthly", after), datetime.datetime(2025, 4, 1, 0, 0))
+        # 2025-03-30 is a Sunday
+        self.assertEqual(cron.next_run("30 8 * * 0", after), datetime.datetime(2025, 3, 30, 8, 30))
+        self.assertEqual(cron.next_run("0 0 1 * 1-5", after), datetime.datetime(2025, 3, 26, 0, 0))
+
+    @override_settings(TIME_ZONE="Asia/Manila")
+    def test_schedules_follow_local_time(self):
+        # 2 AM in Manila is 18:00 UTC the day before
+        after = datetime.datetime(2025, 3, 25, 12, 0, tzinfo=datetime.timezone.utc)
+        self.assertEqual(
+            cron.next_run("0 2 * * *", after),
+            datetime.datetime(2025, 3, 25, 18, 0, tzinfo=datetime.timezone.utc),
+        )
+
+    def test_invalid_expressions(self):
+        for expression in ("* * *", "61 * * * *", "a * * * *", "0 0 30 2 *"):
+            with self.assertRaises(cron.CronError):
+                cron.next_run(expression, timezone.now())
+
+
+class JobTestCase(TestCase):
+    def setUp(self):
+        # Start without the default schedules the inventory migrations add
+        PeriodicJob.objects.all().delete()
+
+    def test_job_runs(self):
+        job = enqueue("jobs.tests.add", 1, b=2)
+        call_command("run_worker", once=True, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.attempts), (JobStatus.SUCCEEDED, 3, 1))
+
+    def test_failed_job_is_retried_then_failed(self):
+        job = enqueue(fail, max_attempts=2)
+        with self.assertLogs("jobs.worker", "WARNING"):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.QUEUED)
+        self.assertIn("boom", job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs("jobs.worker", "WARNING"):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (JobStatus.FAILED, 2))
+
+    def test_jobs_are_claimed_once(self):
+        enqueue(add, 1, 2)
+        self.assertEqual(len(claim_jobs(10)), 1)
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_unknown_task(self):
+        with self.assertRaises(LookupError):
+            enqueue("jobs.tests.missing")
+
+    def test_periodic_job_task_must_be_registered(self):
+        with self.assertRaises(ValidationError):
+            PeriodicJob.objects.create(name="typo", task="jobs.tests.ad", schedule="@hourly")
+
+    def test_default_schedules(self):
+        migration = importlib.import_module("inventory.migrations.0021_default_periodic_jobs")
+        migration.add_default_schedules(apps, None)
+        migration.add_default_schedules(apps, None)
+        self.assertEqual(PeriodicJob.objects.count(), len(migration.DEFAULT_SCHEDULES))
+        periodic = PeriodicJob.objects.get(task="inventory.tasks.write_off_expired_stock")
+        self.assertEqual(timezone.localtime(periodic.next_run_at).hour, 1)
+        periodic.full_clean()
+
+    def test_periodic_job_is_enqueued_once(self):
+        periodic = PeriodicJob.objects.create(name="add", task="jobs.tests.add", kwargs={"a": 1, "b": 1}, schedule="@hourly")
+        self.assertEqual(schedule_periodic_jobs(), [])
+
+        later = periodic.next_run_at + datetime.timedelta(seconds=1)
+        self.assertEqual(len(schedule_periodic_jobs(later)), 1)
+        self.assertEqual(schedule_periodic_jobs(later), [])
+        periodic.refresh_from_db()
+        self.assertEqual(periodic.next_run_at, cron.next_run("@hourly", later))
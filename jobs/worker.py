@@ -0,0 +1,146 @@
+"""
+The job loop behind ``manage.py run_worker``.
+
+Due jobs are claimed with a conditional UPDATE so several workers can
+share one queue, then run in a process pool. Failed jobs are retried
+with exponential backoff until ``max_attempts`` is used up.
+"""
+import datetime
+import json
+import logging
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from project.processes import process_pool
+
+from . import cron
+from .models import Job, JobStatus, PeriodicJob
+from .registry import get_task
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY = datetime.timedelta(seconds=30)
+
+
+def run_job(job_id):
+    """Run one claimed job, returning whether it succeeded and its result or traceback."""
+    job = Job.objects.get(pk=job_id)
+    try:
+        result = get_task(job.task)(*job.args, **job.kwargs)
+        return True, json.loads(json.dumps(result, default=str))
+    except Exception:
+        return False, traceback.format_exc()
+
+
+def run_pooled_job(job_id):
+    """``run_job`` inside a pool worker, which keeps its connection between jobs."""
+    close_old_connections()
+    try:
+        return run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_periodic_jobs(now=None):
+    """Enqueue a Job for every periodic job that is due."""
+    now = now or timezone.now()
+    enqueued = []
+    for periodic in PeriodicJob.objects.filter(enabled=True, next_run_at__lte=now):
+        # Only the worker that moves next_run_at forward enqueues the run
+        claimed = PeriodicJob.objects.filter(
+            pk=periodic.pk, next_run_at=periodic.next_run_at
+        ).update(next_run_at=cron.next_run(periodic.schedule, now), last_run_at=now)
+        if claimed:
+            enqueued.append(Job.objects.create(
+                task=periodic.task,
+                kwargs=periodic.kwargs,
+                periodic_job=periodic,
+            ))
+    return enqueued
+
+
+def claim_jobs(limit, now=None):
+    now = now or timezone.now()
+    due = Job.objects.filter(status=JobStatus.QUEUED, run_at__lte=now).order_by("run_at", "pk")
+    claimed = []
+    for job_id in due.values_list("pk", flat=True)[:limit]:
+        if Job.objects.filter(pk=job_id, status=JobStatus.QUEUED).update(
+            status=JobStatus.RUNNING,
+            started_at=now,
+            attempts=F("attempts") + 1,
+        ):
+            claimed.append(job_id)
+    return claimed
+
+
+def finish_job(job_id, succeeded, outcome):
+    job = Job.objects.get(pk=job_id)
+    job.finished_at = timezone.now()
+    if succeeded:
+        job.status = JobStatus.SUCCEEDED
+        job.result = outcome
+        job.last_error = ""
+    else:
+        job.last_error = outcome
+        if job.attempts < job.max_attempts:
+            job.status = JobStatus.QUEUED
+            job.run_at = job.finished_at + RETRY_DELAY * 2 ** (job.attempts - 1)
+        else:
+            job.status = JobStatus.FAILED
+        logger.warning("Job %s (%s) failed on attempt %s:\n%s", job.pk, job.task, job.attempts, outcome)
+    job.save()
+    return job
+
+
+def requeue_stale_jobs(older_than):
+    """Requeue jobs left running by a worker that died."""
+    return Job.objects.filter(
+        status=JobStatus.RUNNING,
+        started_at__lt=timezone.now() - older_than,
+    ).update(status=JobStatus.QUEUED)
+
+
+def run_pending(limit=None):
+    """Run every due job in this process, one after the other."""
+    schedule_periodic_jobs()
+    jobs = claim_jobs(limit or Job.objects.count())
+    for job_id in jobs:
+        finish_job(job_id, *run_job(job_id))
+    return len(jobs)
+
+
+class Worker:
+    def __init__(self, processes, poll_interval=1.0):
+        self.processes = processes
+        self.poll_interval = poll_interval
+        self.running = {}
+        self.stopping = False
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def run(self):
+        with process_pool(self.processes) as pool:
+            while not self.stopping or self.running:
+                if not self.stopping:
+                    schedule_periodic_jobs()
+                    for job_id in claim_jobs(self.processes - len(self.running)):
+                        self.running[pool.submit(run_pooled_job, job_id)] = job_id
+
+                if not self.running:
+                    time.sleep(self.poll_interval)
+                    continue
+                done, _ = wait(self.running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id = self.running.pop(future)
+                    try:
+                        succeeded, outcome = future.result()
+                    except Exception:
+                        # The pool worker itself died, e.g. it was killed
+                        succeeded, outcome = False, traceback.format_exc()
+                    finish_job(job_id, succeeded, outcome)
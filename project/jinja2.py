@@ -0,0 +1,24 @@
+"""
+Jinja2 environment for the row-heavy pages, see the TEMPLATES setting.
+
+Gives Jinja templates the ``static``, ``url`` and ``tailwind_css`` helpers
+that ``layout.html`` uses, so ``jinja2/layout.html`` renders the same page.
+"""
+from django.template.loader import render_to_string
+from django.templatetags.static import static
+from django.urls import reverse
+from jinja2 import Environment
+from markupsafe import Markup
+from tailwind.templatetags.tailwind_tags import tailwind_css
+
+
+def environment(**options):
+    env = Environment(**options)
+    env.globals.update({
+        "static": static,
+        "url": lambda name, *args, **kwargs: reverse(name, args=args, kwargs=kwargs),
+        "tailwind_css": lambda v=None: Markup(
+            render_to_string("tailwind/tags/css.html", tailwind_css(v), using="django")
+        ),
+    })
+    return env
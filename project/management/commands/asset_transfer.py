@@ -0,0 +1,94 @@
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.utils.cache import get_max_age
+
+ASSET_URL = re.compile(r'<(?:link|script|img)\b[^>]*?\b(?:href|src)="([^"]+)"')
+
+
+def transferred(response):
+    if response.status_code == 304:
+        return 0
+    if response.has_header("Content-Length"):
+        return int(response["Content-Length"])
+    return len(b"".join(response.streaming_content) if response.streaming else response.content)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the static asset bytes and requests a browser needs when it "
+        "loads a page for the first time and again a while later with a warm "
+        "cache. Run it after `collectstatic` with the production settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/")
+        parser.add_argument(
+            "--after",
+            type=int,
+            default=24 * 60 * 60,
+            help="Seconds between the first and the repeat load.",
+        )
+        parser.add_argument(
+            "--budget",
+            type=int,
+            default=0,
+            help="Most asset bytes a repeat load may transfer.",
+        )
+        parser.add_argument(
+            "--max-requests",
+            type=int,
+            default=0,
+            help="Most asset requests a repeat load may make.",
+        )
+
+    def handle(self, *args, **options):
+        host = next((host for host in settings.ALLOWED_HOSTS if "*" not in host), "testserver")
+        client = Client(SERVER_NAME=host, HTTP_ACCEPT_ENCODING="br, gzip")
+        page = client.get(options["path"])
+        if page.status_code != 200:
+            raise CommandError(f"{options['path']} answered {page.status_code}.")
+        static_url = "/" + settings.STATIC_URL.lstrip("/")
+        urls = list(dict.fromkeys(
+            url for url in ASSET_URL.findall(page.content.decode()) if url.startswith(static_url)
+        ))
+
+        first_load = repeat_load = revalidations = 0
+        for url in urls:
+            response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f"{url} answered {response.status_code}, was collectstatic run?")
+            size = transferred(response)
+            first_load += size
+
+            # A cached copy still fresh is used without asking, a stale one is revalidated
+            if (get_max_age(response) or 0) > options["after"]:
+                repeated = 0
+            else:
+                revalidations += 1
+                validators = {}
+                if response.has_header("ETag"):
+                    validators["HTTP_IF_NONE_MATCH"] = response["ETag"]
+                if response.has_header("Last-Modified"):
+                    validators["HTTP_IF_MODIFIED_SINCE"] = response["Last-Modified"]
+                repeated = transferred(client.get(url, **validators))
+            repeat_load += repeated
+            self.stdout.write(
+                f"{url}: {size} bytes ({response.get('Content-Encoding', 'identity')}), "
+                f"{repeated} bytes on repeat, Cache-Control: {response.get('Cache-Control', '-')}"
+            )
+
+        self.stdout.write(
+            f"{len(urls)} assets: {first_load} bytes on the first load, {repeat_load} bytes "
+            f"in {revalidations} requests on a repeat load"
+        )
+        if repeat_load > options["budget"]:
+            raise CommandError(
+                f"A repeat load transfers {repeat_load} asset bytes, the budget is {options['budget']}."
+            )
+        if revalidations > options["max_requests"]:
+            raise CommandError(
+                f"A repeat load revalidates {revalidations} assets, at most {options['max_requests']} may be."
+            )
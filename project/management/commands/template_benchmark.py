@@ -0,0 +1,56 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.template.loader import render_to_string
+
+TEMPLATE = "inventory/stock_table.html"
+
+
+def stock_rows(count):
+    """In-memory rows shaped like the stock list, so only rendering is timed."""
+    today = datetime.date.today()
+    return [
+        {
+            "lot": lot,
+            "item_name": f"Paracetamol 500mg <batch {lot % 97}>",
+            "location": "Main pharmacy",
+            "quantity": lot % 400,
+            "reserved_quantity": lot % 7,
+            "expiration_date": today + datetime.timedelta(days=lot % 720),
+        }
+        for lot in range(1, count + 1)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time rendering a stock table built on layout.html with every "
+        "configured template engine."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5000)
+        parser.add_argument("--renders", type=int, default=20)
+
+    def handle(self, *args, **options):
+        context = {"rows": stock_rows(options["rows"])}
+        for engine in engines.all():
+            self.report(engine.name, context, options["renders"])
+
+    def report(self, using, context, renders):
+        # The first render compiles the templates, the rest reuse the cached ones
+        start = time.perf_counter()
+        size = len(render_to_string(TEMPLATE, context, using=using))
+        first = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(renders):
+            render_to_string(TEMPLATE, context, using=using)
+        elapsed = (time.perf_counter() - start) / renders
+        self.stdout.write(
+            f"{using}: {elapsed * 1000:.1f} ms per render of {len(context['rows'])} rows "
+            f"({elapsed / len(context['rows']) * 1e6:.1f} µs per row, {size / 1024:.0f} KiB), "
+            f"first render {first * 1000:.1f} ms"
+        )
@@ -0,0 +1,52 @@
+"""
+Request metrics and the Prometheus exposition used by the /metrics view.
+
+With several worker processes, point PROMETHEUS_MULTIPROC_DIR at an
+empty directory shared by all of them before they start, and call
+``prometheus_client.multiprocess.mark_process_dead(pid)`` when a worker
+exits (e.g. from gunicorn's ``child_exit`` hook). /metrics then reports
+the sum over every worker instead of whichever one served the scrape.
+"""
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by view.",
+    ["view", "method", "status"],
+)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        match = request.resolver_match
+        REQUEST_LATENCY.labels(
+            match.view_name if match else "<unresolved>",
+            request.method,
+            response.status_code,
+        ).observe(time.perf_counter() - start)
+        return response
+
+
+def render_metrics():
+    """Return the current metrics in the Prometheus text format."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,22 @@
+"""
+Process pools whose workers can use the ORM.
+
+Workers are always spawned rather than forked so they never share the
+parent's database connections, and behave the same on Windows.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def setup_django():
+    import django
+
+    django.setup()
+
+
+def process_pool(max_workers=None):
+    return ProcessPoolExecutor(
+        max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=setup_django,
+    )
@@ -0,0 +1,135 @@
+"""
+Per-request SQL profiling, switched on with the PROFILING_ENABLED setting.
+
+Every request gets a ``Server-Timing`` header with its query count, SQL
+time and the time spent outside the database. Requests slower than
+PROFILING_SLOW_REQUEST_MS are sampled into a rotating JSON lines log
+(the ``project.profiling`` logger), which ``slow_request_report``
+aggregates for the admin.
+"""
+import heapq
+import itertools
+import json
+import logging
+import random
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger("project.profiling")
+
+
+class QueryProfile:
+    """Database execute wrapper that times every statement of a request."""
+
+    def __init__(self, keep=5):
+        self.keep = keep
+        self.count = 0
+        self.duration = 0.0
+        self._slowest = []
+        self._order = itertools.count()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            entry = (elapsed, next(self._order), sql)
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, entry)
+            else:
+                heapq.heappushpop(self._slowest, entry)
+
+    @property
+    def slowest(self):
+        return [
+            {"ms": round(elapsed * 1000, 2), "sql": sql}
+            for elapsed, _, sql in sorted(self._slowest, reverse=True)
+        ]
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILING_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, "PROFILING_SLOW_REQUEST_MS", 500)
+        self.sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", 1.0)
+        self.keep = getattr(settings, "PROFILING_TOP_QUERIES", 5)
+
+    def __call__(self, request):
+        profile = QueryProfile(self.keep)
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+        sql_ms = profile.duration * 1000
+
+        response["Server-Timing"] = ", ".join([
+            f'sql;dur={sql_ms:.1f};desc="{profile.count} queries"',
+            f"view;dur={total_ms - sql_ms:.1f}",
+            f"total;dur={total_ms:.1f}",
+        ])
+
+        if total_ms >= self.slow_ms and random.random() < self.sample_rate:
+            match = request.resolver_match
+            logger.warning(json.dumps({
+                "time": timezone.now().isoformat(),
+                "method": request.method,
+                "path": request.path,
+                "view": match.view_name if match else None,
+                "status": response.status_code,
+                "total_ms": round(total_ms, 2),
+                "sql_ms": round(sql_ms, 2),
+                "queries": profile.count,
+                "slowest": profile.slowest,
+            }))
+        return response
+
+
+def read_slow_requests(path=None):
+    """Yield the logged slow requests, including the rotated backups."""
+    path = Path(path or settings.PROFILING_LOG)
+    for log in sorted(path.parent.glob(path.name + "*")):
+        with open(log, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def slow_request_report(entries, limit=50):
+    """Aggregate slow requests by URL, the most total time first."""
+    groups = defaultdict(list)
+    for entry in entries:
+        groups[(entry["method"], entry["path"])].append(entry)
+
+    rows = []
+    for (method, path), hits in groups.items():
+        total = sum(hit["total_ms"] for hit in hits)
+        rows.append({
+            "method": method,
+            "path": path,
+            "view": hits[-1].get("view"),
+            "hits": len(hits),
+            "total_ms": round(total, 2),
+            "avg_ms": round(total / len(hits), 2),
+            "max_ms": max(hit["total_ms"] for hit in hits),
+            "avg_sql_ms": round(sum(hit["sql_ms"] for hit in hits) / len(hits), 2),
+            "avg_queries": round(sum(hit["queries"] for hit in hits) / len(hits), 1),
+            "slowest": max(hits, key=lambda hit: hit["total_ms"])["slowest"],
+        })
+    rows.sort(key=lambda row: row["total_ms"], reverse=True)
+    return rows[:limit]
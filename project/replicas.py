@@ -0,0 +1,109 @@
+"""
+Routing of read-only report and admin browsing queries to a replica.
+
+Reads go to the REPLICA_DATABASE alias only inside ``read_from_replica``.
+``ReplicaMiddleware`` enters it for GET requests to admin changelists
+(which includes admin search) and to views marked with
+``@replica_reads``. Everything else, including allocation and all
+writes, stays on the primary. Once a request writes, the rest of it and
+the client's requests for the next REPLICA_STICKY_SECONDS read from the
+primary too, so users see their own changes.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.urls import Resolver404, resolve
+
+STICKY_COOKIE = "primary_until"
+
+# Authentication has to see new sessions and permission changes at once
+PRIMARY_ONLY_APPS = {"auth", "sessions", "users"}
+
+_state = ContextVar("replica_state", default=None)
+
+
+def replica_alias():
+    """The configured replica alias, or None when there is no replica."""
+    alias = getattr(settings, "REPLICA_DATABASE", None)
+    return alias if alias in settings.DATABASES else None
+
+
+@contextmanager
+def read_from_replica():
+    token = _state.set({"wrote": False})
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+def replica_reads(view):
+    """Mark a read-only report, export or search view as safe to serve from the replica."""
+    view.replica_reads = True
+    return view
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state["wrote"] or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state["wrote"] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # The replica is a copy of the primary, see `manage.py sync_replica`
+        if db == replica_alias():
+            return False
+        return None
+
+
+def uses_replica(request):
+    """Whether ``request`` may read from the replica."""
+    if request.method not in ("GET", "HEAD") or replica_alias() is None:
+        return False
+    try:
+        if float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time():
+            return False
+    except ValueError:
+        pass
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return False
+    return (match.url_name or "").endswith("_changelist") or getattr(match.func, "replica_reads", False)
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sticky_seconds = getattr(settings, "REPLICA_STICKY_SECONDS", 5)
+
+    def __call__(self, request):
+        if uses_replica(request):
+            with read_from_replica():
+                return self.get_response(request)
+
+        response = self.get_response(request)
+        if request.method not in ("GET", "HEAD", "OPTIONS") and replica_alias() is not None:
+            # Read this client's own writes from the primary until the replica caught up
+            response.set_cookie(
+                STICKY_COOKIE,
+                str(time.time() + self.sticky_seconds),
+                max_age=self.sticky_seconds,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import datetime
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,14 +46,18 @@ INSTALLED_APPS = [
     'project',
     'inventory',
     'users',
+    'jobs',
 ]
 
 MIDDLEWARE = [
+    'project.profiling.ProfilingMiddleware',
+    'project.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'project.replicas.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     "django_browser_reload.middleware.BrowserReloadMiddleware",
@@ -65,7 +71,6 @@ TEMPLATES = [
         'DIRS': [
             BASE_DIR / "templates"
         ],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -73,10 +78,32 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Templates are compiled once per worker. The development server
+            # still picks up edits, it resets the cache when a template changes.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
 
+# Row-heavy pages (stock lists, reports) can render with Jinja2 instead,
+# `render(req, ..., using="jinja2")` finds templates in templates/jinja2 and
+# <app>/jinja2. See project/jinja2.py and `manage.py template_benchmark`.
+TEMPLATES.append({
+    'BACKEND': 'django.template.backends.jinja2.Jinja2',
+    'DIRS': [
+        BASE_DIR / "templates" / "jinja2"
+    ],
+    'APP_DIRS': True,
+    'OPTIONS': {
+        'environment': 'project.jinja2.environment',
+    },
+})
+
 WSGI_APPLICATION = 'project.wsgi.application'
 
 
@@ -90,6 +117,56 @@ DATABASES = {
     }
 }
 
+# Read replica for reports and admin browsing, see project.replicas.
+# Locally, set REPLICA_DATABASE_NAME to a second SQLite file and keep it
+# in sync with `manage.py sync_replica`.
+if os.environ.get("REPLICA_DATABASE_NAME"):
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ["REPLICA_DATABASE_NAME"],
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["project.replicas.ReplicaRouter"]
+REPLICA_DATABASE = "replica"
+# How long a client reads from the primary after it wrote something
+REPLICA_STICKY_SECONDS = 5
+
+
+# Caching
+# Sessions are read from the cache and written through to the database,
+# so a cache shared by all workers (e.g. Redis) can be configured here
+# without losing sessions on a cache restart.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "sad_pharm",
+    }
+}
+
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+
+
+# Authentication
+# Users are kept in each worker's memory for AUTH_USER_CACHE_SECONDS,
+# see users.backends.
+
+AUTHENTICATION_BACKENDS = ["users.backends.CachedModelBackend"]
+AUTH_USER_CACHE_SECONDS = 30
+
+# PBKDF2 work factor for new and upgraded password hashes. Lower it only
+# on hardware where logins are too slow, see `manage.py auth_benchmark`.
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get("PASSWORD_PBKDF2_ITERATIONS", 870000))
+
+PASSWORD_HASHERS = [
+    "users.hashers.TunablePBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -143,3 +220,60 @@ INTERNAL_IPS = [
 ]
 
 AUTH_USER_MODEL = "users.CustomUser"
+LOGIN_URL = "admin:login"
+
+# How long a barcode scan answer may be served from a worker's memory
+# before stock changes made by other workers are picked up.
+SCAN_CACHE_SECONDS = 5
+
+# How long the location code to id map is kept in the shared cache. Saving
+# or deleting a location drops it at once.
+LOCATION_CACHE_SECONDS = 300
+
+# How long a dispense or void idempotency key is remembered
+IDEMPOTENCY_KEY_RETENTION = datetime.timedelta(hours=24)
+
+# How long a stock reservation holds its lots before the sweeper releases it
+RESERVATION_TTL = datetime.timedelta(minutes=15)
+
+# Homepage dashboard. The rendered figures are cached per inventory
+# watermark, DASHBOARD_CACHE_SECONDS only bounds how long they are kept.
+DASHBOARD_CACHE_SECONDS = 300
+DASHBOARD_LOW_STOCK_THRESHOLD = 10
+DASHBOARD_NEAR_EXPIRY_DAYS = 30
+
+
+# Request profiling
+# Adds a Server-Timing header to every response and samples slow requests
+# into PROFILING_LOG, see project/profiling.py.
+
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "") == "1"
+PROFILING_SLOW_REQUEST_MS = int(os.environ.get("PROFILING_SLOW_REQUEST_MS", 500))
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", 1.0))
+PROFILING_TOP_QUERIES = 5
+PROFILING_LOG = BASE_DIR / "slow_requests.log"
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "message": {"format": "%(message)s"},
+    },
+    "handlers": {
+        "slow_requests": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": PROFILING_LOG,
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 5,
+            "delay": True,
+            "formatter": "message",
+        },
+    },
+    "loggers": {
+        "project.profiling": {
+            "handlers": ["slow_requests"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
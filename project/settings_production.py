@@ -0,0 +1,48 @@
+"""
+Production settings, used with DJANGO_SETTINGS_MODULE=project.settings_production.
+
+Static files are served by WhiteNoise from STATIC_ROOT. `collectstatic`
+names every file after a hash of its content and writes gzip and brotli
+copies next to it, so the hashed files are cached for ten years and
+never revalidated by the browser, while the few unhashed ones are
+revalidated after an hour. Build the Tailwind CSS before collecting:
+
+    py manage.py tailwind build
+    py manage.py collectstatic --noinput
+    py manage.py asset_transfer
+
+DJANGO_SECRET_KEY and DJANGO_ALLOWED_HOSTS (comma separated) must be set.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, os
+
+DEBUG = False
+
+SECRET_KEY = os.environ["DJANGO_SECRET_KEY"]
+ALLOWED_HOSTS = [host for host in os.environ.get("DJANGO_ALLOWED_HOSTS", "").split(",") if host]
+
+# Development helpers
+DEV_APPS = ["django_browser_reload"]
+DEV_MIDDLEWARE = ["django_browser_reload.middleware.BrowserReloadMiddleware"]
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in DEV_APPS]
+
+MIDDLEWARE = [m for m in MIDDLEWARE if m not in DEV_MIDDLEWARE]
+# Static files are answered before sessions and authentication are loaded
+MIDDLEWARE.insert(
+    MIDDLEWARE.index("django.middleware.security.SecurityMiddleware") + 1,
+    "whitenoise.middleware.WhiteNoiseMiddleware",
+)
+
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
+    },
+}
+
+# Hashed files are cached for ten years as `immutable`, the few unhashed ones
+# (e.g. favicon.ico at a fixed URL) are revalidated after an hour.
+WHITENOISE_MAX_AGE = 60 * 60
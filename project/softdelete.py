@@ -0,0 +1,69 @@
+"""
+Soft-delete for rows that history refers to, such as items and users.
+
+Deleting an instance archives it instead: the row stays for the records
+that point at it and the default manager hides it. ``all_objects``
+still sees archived rows, and ``QuerySet.archive`` archives any number
+of them in a single UPDATE.
+"""
+from django.contrib import admin
+from django.db import models
+from django.utils import timezone
+
+
+class ArchivableQuerySet(models.QuerySet):
+    # Subclasses can pass other ``fields`` to set in the same UPDATE
+
+    def archive(self, **fields) -> int:
+        return self.filter(is_archived=False).update(is_archived=True, archived_at=timezone.now(), **fields)
+
+    def restore(self, **fields) -> int:
+        return self.filter(is_archived=True).update(is_archived=False, archived_at=None, **fields)
+
+
+class ActiveManager(models.Manager.from_queryset(ArchivableQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().filter(is_archived=False)
+
+
+class Archivable(models.Model):
+    is_archived = models.BooleanField(default=False)
+    archived_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
+    def archive(self):
+        self.is_archived = True
+        self.archived_at = timezone.now()
+        self.save(update_fields=["is_archived", "archived_at"])
+
+    def restore(self):
+        self.is_archived = False
+        self.archived_at = None
+        self.save(update_fields=["is_archived", "archived_at"])
+
+    def delete(self, *args, **kwargs):
+        """Archive instead of deleting. ``QuerySet.delete`` still deletes for good."""
+        self.archive()
+
+
+class ArchivableAdmin(admin.ModelAdmin):
+    """Archives rows instead of deleting them, and can restore them."""
+    actions = ["archive", "restore"]
+
+    def get_queryset(self, request):
+        queryset = self.model.all_objects.all()
+        ordering = self.get_ordering(request)
+        return queryset.order_by(*ordering) if ordering else queryset
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description="Archive selected %(verbose_name_plural)s")
+    def archive(self, request, queryset):
+        self.message_user(request, f"Archived {queryset.archive()} {self.opts.verbose_name_plural}.")
+
+    @admin.action(description="Restore selected %(verbose_name_plural)s")
+    def restore(self, request, queryset):
+        self.message_user(request, f"Restored {queryset.restore()} {self.opts.verbose_name_plural}.")
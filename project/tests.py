@@ -0,0 +1,249 @@
+import datetime
+import json
+import logging
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.template import engines
+from django.template.loader import render_to_string
+from django.test import RequestFactory, TestCase, override_settings
+
+from inventory import dashboard
+from inventory.models import InventoryStock, InventoryTransaction, Location
+from inventory.tests import create_test_item
+
+from project.management.commands.template_benchmark import stock_rows
+from project.profiling import read_slow_requests, slow_request_report
+from project.replicas import STICKY_COOKIE, ReplicaRouter, read_from_replica, uses_replica
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_SLOW_REQUEST_MS=0, PROFILING_SAMPLE_RATE=1.0)
+class ProfilingMiddlewareTestCase(TestCase):
+    def setUp(self):
+        # Keep test requests out of the developer's slow request log
+        handlers = mock.patch.object(logging.getLogger("project.profiling"), "handlers", [logging.NullHandler()])
+        handlers.start()
+        self.addCleanup(handlers.stop)
+
+    def test_server_timing_header(self):
+        response = self.client.get("/")
+        self.assertIn("sql;dur=", response["Server-Timing"])
+        self.assertIn("total;dur=", response["Server-Timing"])
+
+    def test_slow_requests_are_logged(self):
+        with self.assertLogs("project.profiling", "WARNING") as logs:
+            self.client.get("/")
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry["path"], "/")
+        self.assertIn("queries", entry)
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled_by_default(self):
+        self.assertNotIn("Server-Timing", self.client.get("/"))
+
+
+class SlowRequestReportTestCase(TestCase):
+    def test_report_groups_by_url(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log = Path(directory) / "slow_requests.log"
+            entries = [
+                {"method": "GET", "path": "/a", "view": "a", "total_ms": 10, "sql_ms": 4, "queries": 2, "slowest": []},
+                {"method": "GET", "path": "/a", "view": "a", "total_ms": 30, "sql_ms": 6, "queries": 4, "slowest": []},
+                {"method": "GET", "path": "/b", "view": "b", "total_ms": 5, "sql_ms": 1, "queries": 1, "slowest": []},
+            ]
+            log.write_text("\n".join(json.dumps(entry) for entry in entries[:2]))
+            (Path(directory) / "slow_requests.log.1").write_text(json.dumps(entries[2]))
+
+            rows = slow_request_report(read_slow_requests(log))
+        self.assertEqual([row["path"] for row in rows], ["/a", "/b"])
+        self.assertEqual((rows[0]["hits"], rows[0]["avg_ms"], rows[0]["avg_queries"]), (2, 20, 3))
+
+    def test_admin_page(self):
+        admin = get_user_model().objects.create_superuser(email="admin@example.com", password="1234")
+        self.client.force_login(admin)
+        response = self.client.get("/admin/profiling/")
+        self.assertContains(response, "Slow requests")
+
+
+class MetricsTestCase(TestCase):
+    def test_metrics_endpoint(self):
+        self.client.get("/")
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "inventory_operations_total")
+        self.assertContains(response, 'http_request_duration_seconds_count{method="GET",status="200",view="project.views.homepage"}')
+
+
+class DashboardTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email="staff@example.com", password="1234")
+        self.item = create_test_item()
+        InventoryStock.objects.create(item=self.item, quantity=50, expiration_date=datetime.date.today() + datetime.timedelta(days=365))
+        InventoryStock.objects.create(item=self.item, quantity=5, expiration_date=datetime.date.today() + datetime.timedelta(days=3))
+
+    def test_kpis(self):
+        create_test_item()  # Out of stock
+        InventoryTransaction.objects.create(item=self.item, quantity=7, created_by=self.user)
+
+        with self.assertNumQueries(1):
+            kpis = dashboard.kpis()
+        self.assertEqual(kpis, {
+            "sellable": 48,
+            "low_stock_items": 1,
+            "near_expiry_lots": 0,
+            "dispenses_today": 1,
+            "dispensed_today": 7,
+        })
+
+    def test_conditional_get(self):
+        self.client.force_login(self.user)
+        response = self.client.get("/")
+        self.assertContains(response, "Sellable stock")
+        self.assertIn("Last-Modified", response)
+
+        etag = response["ETag"]
+        self.assertEqual(self.client.get("/", headers={"If-None-Match": etag}).status_code, 304)
+
+        InventoryTransaction.objects.create(item=self.item, quantity=1, created_by=self.user)
+        response = self.client.get("/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def assert_rerendered_after(self, change):
+        self.client.force_login(self.user)
+        etag = self.client.get("/")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        with mock.patch("inventory.dashboard.kpis", wraps=dashboard.kpis) as kpis:
+            response = self.client.get("/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        kpis.assert_called()
+
+    def test_lot_deletion_changes_watermark(self):
+        self.assert_rerendered_after(lambda: InventoryStock.objects.filter(quantity=5).get().delete())
+
+    def test_expiry_edit_changes_watermark(self):
+        def expire_soon():
+            lot = InventoryStock.objects.get(quantity=50)
+            lot.expiration_date = datetime.date.today() + datetime.timedelta(days=10)
+            lot.save()
+
+        self.assert_rerendered_after(expire_soon)
+
+    def test_fragment_is_cached_per_watermark(self):
+        self.client.force_login(self.user)
+        self.client.get("/")
+        with mock.patch("inventory.dashboard.kpis") as kpis:
+            self.client.get("/")
+        kpis.assert_not_called()
+
+
+# The test database stands in for the replica
+@override_settings(REPLICA_DATABASE="default")
+class ReplicaRoutingTestCase(TestCase):
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Location))
+        with read_from_replica():
+            self.assertEqual(router.db_for_read(Location), "default")
+            self.assertIsNone(router.db_for_read(get_user_model()))
+
+            # Read your own writes for the rest of the request
+            self.assertEqual(router.db_for_write(Location), "default")
+            self.assertIsNone(router.db_for_read(Location))
+
+    @override_settings(REPLICA_DATABASE="replica")
+    def test_without_replica(self):
+        with read_from_replica():
+            self.assertIsNone(ReplicaRouter().db_for_read(Location))
+
+    def test_requests_using_replica(self):
+        factory = RequestFactory()
+        self.assertTrue(uses_replica(factory.get("/admin/inventory/location/", {"q": "main"})))
+        self.assertTrue(uses_replica(factory.get("/")))
+        self.assertFalse(uses_replica(factory.post("/admin/inventory/location/")))
+        self.assertFalse(uses_replica(factory.get("/inventory/scan/123/")))
+
+    def test_writes_make_client_sticky(self):
+        admin = get_user_model().objects.create_superuser(email="admin@example.com", password="1234")
+        self.client.force_login(admin)
+        response = self.client.post("/admin/inventory/location/add/", {"code": "B2", "name": "Branch 2"})
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        request = RequestFactory().get("/admin/inventory/location/")
+        request.COOKIES[STICKY_COOKIE] = response.cookies[STICKY_COOKIE].value
+        self.assertFalse(uses_replica(request))
+
+
+class TemplateEngineTestCase(TestCase):
+    def test_compiled_templates_are_cached(self):
+        engine = engines["django"].engine
+        template = engine.get_template("layout.html")
+        self.assertIs(engine.get_template("layout.html"), template)
+
+    def test_stock_table(self):
+        rows = stock_rows(3)
+        html = render_to_string("inventory/stock_table.html", {"rows": rows}, using="django")
+        self.assertEqual(html.count("<tr>"), 4)
+        self.assertIn("&lt;batch 1&gt;", html)
+        self.assertIn(f"<td>{rows[0]['expiration_date'].isoformat()}</td>", html)
+
+    def test_jinja2_stock_table_matches(self):
+        rows = stock_rows(3)
+        html = render_to_string("inventory/stock_table.html", {"rows": rows}, using="jinja2")
+        self.assertEqual(html.count("<tr>"), 4)
+        self.assertIn("&lt;batch 1&gt;", html)
+        self.assertIn(f"<td>{rows[0]['expiration_date'].isoformat()}</td>", html)
+
+    def test_benchmark(self):
+        out = StringIO()
+        call_command("template_benchmark", rows=10, renders=1, stdout=out)
+        self.assertIn("django: ", out.getvalue())
+        self.assertIn("jinja2: ", out.getvalue())
+
+
+class AssetTransferTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        (self.root / "src" / "css" / "dist").mkdir(parents=True)
+        (self.root / "src" / "css" / "style.css").write_text("body { margin: 0; }\n" * 100)
+        (self.root / "src" / "css" / "dist" / "styles.css").write_text(".p-4 { padding: 1rem; }\n" * 100)
+
+    def collect(self, storage):
+        return override_settings(
+            STATIC_ROOT=self.root / "static",
+            STATICFILES_DIRS=[self.root / "src"],
+            STATICFILES_FINDERS=["django.contrib.staticfiles.finders.FileSystemFinder"],
+            STORAGES={
+                "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+                "staticfiles": {"BACKEND": storage},
+            },
+            MIDDLEWARE=["whitenoise.middleware.WhiteNoiseMiddleware", *settings.MIDDLEWARE],
+        )
+
+    def test_hashed_assets_are_not_downloaded_again(self):
+        with self.collect("whitenoise.storage.CompressedManifestStaticFilesStorage"):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            self.assertTrue(list((self.root / "static" / "css").glob("style.*.css.br")))
+            out = StringIO()
+            call_command("asset_transfer", stdout=out)
+        self.assertIn("(br)", out.getvalue())
+        self.assertIn("immutable", out.getvalue())
+        self.assertIn("0 bytes in 0 requests on a repeat load", out.getvalue())
+
+    def test_unhashed_assets_exceed_the_budget(self):
+        with self.collect("django.contrib.staticfiles.storage.StaticFilesStorage"):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            with self.assertRaises(CommandError):
+                call_command("asset_transfer", stdout=StringIO())
@@ -18,10 +18,14 @@ from django.contrib import admin
 from django.urls import include, path
 from django.conf import settings
 
-from project.views import homepage
+from project.views import homepage, metrics, ping, profiling_report
 
 urlpatterns = [
+    path('admin/profiling/', profiling_report, name="profiling_report"),
     path('admin/', admin.site.urls),
+    path("inventory/", include("inventory.urls")),
+    path("metrics", metrics, name="metrics"),
+    path("ping/", ping, name="ping"),
     path("", homepage)
 ]
 
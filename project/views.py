@@ -1,5 +1,57 @@
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
+from inventory import dashboard
 
+from project.metrics import render_metrics
+from project.profiling import read_slow_requests, slow_request_report
+from project.replicas import replica_reads
+
+
+def dashboard_watermark(req):
+    if not hasattr(req, "_dashboard_watermark"):
+        etag, last_modified = dashboard.watermark()
+        # Signed in staff see the dashboard, everyone else the bare page
+        req._dashboard_watermark = f"{etag}-{int(req.user.is_authenticated)}", last_modified
+    return req._dashboard_watermark
+
+
+@replica_reads
+@cache_control(private=True, no_cache=True)
+@condition(
+    etag_func=lambda req: dashboard_watermark(req)[0],
+    last_modified_func=lambda req: dashboard_watermark(req)[1],
+)
 def homepage(req):
-    return render(req, 'home.html')
\ No newline at end of file
+    return render(req, 'home.html', {
+        "kpis": dashboard.kpis,  # Only called when the cached fragment is stale
+        "dashboard_etag": dashboard_watermark(req)[0],
+        "dashboard_cache_seconds": settings.DASHBOARD_CACHE_SECONDS,
+    })
+
+
+@staff_member_required
+def profiling_report(req):
+    return render(req, 'admin/profiling_report.html', {
+        **admin.site.each_context(req),
+        "title": "Slow requests",
+        "enabled": settings.PROFILING_ENABLED,
+        "rows": slow_request_report(read_slow_requests()),
+    })
+
+
+def metrics(req):
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
+
+
+@login_required
+def ping(req):
+    """Authenticated no-op, the cheapest request a signed in terminal can make."""
+    return JsonResponse({"user": str(req.user.pk)})
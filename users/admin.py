@@ -1,14 +1,17 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from project.softdelete import ArchivableAdmin
+
 from .forms import CustomUserCreationForm, CustomUserChangeForm
 from .models import CustomUser
 
 
 
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(ArchivableAdmin, UserAdmin):
     model = CustomUser
-    list_display = ("email", "first_name", "last_name", "is_staff", "is_active")
+    list_display = ("email", "first_name", "last_name", "is_staff", "is_active", "is_archived")
+    list_filter = ("is_staff", "is_active", "is_archived")
     search_fields = ("email", "first_name", "last_name")
     ordering = ("email",)
 
@@ -0,0 +1,75 @@
+"""
+Authentication backend that keeps recently seen users in process memory.
+
+``AuthenticationMiddleware`` loads the user by primary key on every
+request. Serving it from memory removes that query; together with the
+cached session engine an authenticated request needs no queries at all.
+An entry is dropped when this process saves or deletes the user, and
+changes made by other processes show up once it is
+AUTH_USER_CACHE_SECONDS old.
+"""
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import ValidationError
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+User = get_user_model()
+
+
+class UserCache:
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, pk):
+        with self._lock:
+            entry = self._entries.get(pk)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            # Every request gets its own copy to modify
+            return copy.copy(entry[1])
+
+    def set(self, user, ttl):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[user.pk] = (time.monotonic() + ttl, copy.copy(user))
+
+    def invalidate(self, pk):
+        with self._lock:
+            self._entries.pop(pk, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        try:
+            pk = User._meta.pk.to_python(user_id)
+        except ValidationError:
+            return None
+        user = user_cache.get(pk)
+        if user is None:
+            user = super().get_user(pk)
+            if user is None:
+                return None
+            user_cache.set(user, getattr(settings, "AUTH_USER_CACHE_SECONDS", 30))
+        return user if self.user_can_authenticate(user) else None
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_changed_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 with the work factor taken from the PASSWORD_PBKDF2_ITERATIONS
+    setting. Stored hashes keep their own iteration count and are
+    upgraded to the configured one on the next successful login.
+    """
+    # Same algorithm name, so existing pbkdf2_sha256 hashes keep verifying
+    algorithm = PBKDF2PasswordHasher.algorithm
+
+    @property
+    def iterations(self):
+        return getattr(settings, "PASSWORD_PBKDF2_ITERATIONS", PBKDF2PasswordHasher.iterations)
@@ -0,0 +1,56 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = (
+        "Time logging in and an authenticated no-op request with the current "
+        "session, cache and password hasher settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=10)
+        parser.add_argument("--requests", type=int, default=200)
+
+    def handle(self, *args, **options):
+        # The throwaway user and its sessions are rolled back at the end
+        with transaction.atomic():
+            self.run(options["logins"], options["requests"])
+            transaction.set_rollback(True)
+
+    def run(self, logins, requests):
+        email = f"auth-benchmark-{uuid.uuid4().hex}@example.com"
+        password = uuid.uuid4().hex
+        get_user_model().objects.create_user(email=email, username=email, password=password)
+        host = next((host for host in settings.ALLOWED_HOSTS if "*" not in host), "testserver")
+        client = Client(SERVER_NAME=host)
+
+        def login():
+            client.logout()
+            assert client.login(email=email, password=password)
+
+        def ping():
+            assert client.get(reverse("ping")).status_code == 200
+
+        self.report("login", login, logins)
+        ping()  # The first request after a login fills the caches
+        self.report("authenticated request", ping, requests)
+
+    def report(self, name, operation, count):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(count):
+                operation()
+            elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"{name}: {elapsed / count * 1000:.2f} ms and "
+            f"{len(queries) / count:.1f} queries on average over {count} runs"
+        )
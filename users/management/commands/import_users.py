@@ -0,0 +1,39 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.provisioning import import_users, read_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Create staff accounts from a CSV with an email column and optional "
+        "password, first_name, last_name and is_staff columns."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_file")
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count(),
+            help="Worker processes hashing passwords.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["csv_file"], newline="", encoding="utf-8-sig") as f:
+                rows, errors = read_users(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(e)
+
+        for line, error in errors:
+            self.stderr.write(f"Line {line}: {error}")
+        created, duplicates = import_users(rows, options["processes"], options["batch_size"])
+        for email in duplicates:
+            self.stdout.write(f"Skipped {email}: a user with this email already exists.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(created)} users, skipped {len(duplicates)} duplicates "
+            f"and {len(errors)} invalid rows."
+        ))
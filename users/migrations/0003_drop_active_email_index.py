@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:27
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_archived_users'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='customuser',
+            name='active_user_email_idx',
+        ),
+    ]
@@ -2,8 +2,27 @@ import uuid
 from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 
+from project.softdelete import Archivable, ArchivableQuerySet
+
+
+class UserQuerySet(ArchivableQuerySet):
+    def archive(self, **fields) -> int:
+        # A single UPDATE sends no post_save, drop the archived users from the cache here
+        from .backends import user_cache
+
+        pks = list(self.filter(is_archived=False).values_list("pk", flat=True))
+        archived = super().archive(**fields)
+        for pk in pks:
+            user_cache.invalidate(pk)
+        return archived
+
+
+class CustomUserManager(BaseUserManager.from_queryset(UserQuerySet)):
+    """Active users only, archived users can neither sign in nor be picked."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_archived=False)
 
-class CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
             raise ValueError("The Email field must be set")
@@ -26,7 +45,7 @@ class CustomUserManager(BaseUserManager):
         return self.create_user(email, password, **extra_fields)
 
 # Create your models here.
-class CustomUser(AbstractUser):
+class CustomUser(Archivable, AbstractUser):
     id = models.UUIDField(primary_key=True,default=uuid.uuid4)
     email = models.EmailField(unique=True)
     first_name = models.CharField(max_length=30, blank=True)
@@ -37,6 +56,10 @@ class CustomUser(AbstractUser):
     REQUIRED_FIELDS = ["first_name", "last_name"]
 
     objects = CustomUserManager()
+    all_objects = UserQuerySet.as_manager()  # Including departed staff
+
+    class Meta(AbstractUser.Meta):
+        pass
 
     def __str__(self):
         return self.email
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""
+Bulk creation of staff accounts, see ``manage.py import_users``.
+
+Password hashing dominates the cost of creating a user, so the hashes
+are computed in a process pool and the users inserted in batches.
+"""
+import csv
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+
+from project.processes import process_pool
+
+User = get_user_model()
+
+FIELDS = ("email", "password", "first_name", "last_name", "is_staff")
+TRUE_VALUES = {"1", "true", "yes", "y"}
+
+
+def read_users(file):
+    """
+    Parse a CSV with an ``email`` column and optional ``password``,
+    ``first_name``, ``last_name`` and ``is_staff`` columns. Returns the
+    rows as dicts and a list of ``(line, error)`` for rejected rows.
+    """
+    rows, errors = [], []
+    reader = csv.DictReader(file)
+    if "email" not in (reader.fieldnames or ()):
+        raise ValueError("The CSV must have an email column.")
+    for row in reader:
+        values = {field: (row.get(field) or "").strip() for field in FIELDS}
+        if not values["email"]:
+            errors.append((reader.line_num, "The Email field must be set"))
+            continue
+        values["email"] = User.objects.normalize_email(values["email"])
+        values["password"] = values["password"] or None  # No password, no login
+        values["is_staff"] = values["is_staff"].lower() in TRUE_VALUES
+        rows.append(values)
+    return rows, errors
+
+
+def hash_passwords(passwords, processes=None):
+    """Hash ``passwords`` in order, spread over ``processes`` worker processes."""
+    if processes == 1 or len(passwords) < 2:
+        return [make_password(password) for password in passwords]
+    with process_pool(processes) as pool:
+        return list(pool.map(make_password, passwords, chunksize=8))
+
+
+def import_users(rows, processes=None, batch_size=500):
+    """
+    Create a user for every row whose email is not taken yet. Returns the
+    created users and the emails skipped as duplicates.
+    """
+    duplicates = []
+    new_rows = {}
+    for row in rows:
+        if row["email"] in new_rows:
+            duplicates.append(row["email"])
+        else:
+            new_rows[row["email"]] = row
+    existing = set()
+    emails = list(new_rows)
+    for start in range(0, len(emails), batch_size):
+        existing.update(
+            User.objects.filter(email__in=emails[start:start + batch_size]).values_list("email", flat=True)
+        )
+    duplicates.extend(email for email in emails if email in existing)
+    rows = [row for email, row in new_rows.items() if email not in existing]
+
+    passwords = hash_passwords([row["password"] for row in rows], processes)
+    users = [
+        User(
+            email=row["email"],
+            username=row["email"],
+            password=password,
+            first_name=row["first_name"],
+            last_name=row["last_name"],
+            is_staff=row["is_staff"],
+            is_active=True,
+        )
+        for row, password in zip(rows, passwords)
+    ]
+    User.objects.bulk_create(users, batch_size=batch_size, ignore_conflicts=True)
+
+    # Emails taken by another process since the check above were skipped
+    created = set()
+    for start in range(0, len(users), batch_size):
+        created.update(
+            User.objects.filter(pk__in=[user.pk for user in users[start:start + batch_size]])
+            .values_list("pk", flat=True)
+        )
+    duplicates.extend(user.email for user in users if user.pk not in created)
+    return [user for user in users if user.pk in created], duplicates
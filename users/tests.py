@@ -1,3 +1,97 @@
-from django.test import TestCase
+import tempfile
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .backends import user_cache
+from .provisioning import hash_passwords, import_users, read_users
+
+User = get_user_model()
+
+
+class AuthenticationTestCase(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(email="staff@example.com", password="1234")
+
+    def test_authenticated_request_makes_no_queries(self):
+        self.client.force_login(self.user)
+        self.client.get("/ping/")
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/ping/")
+        self.assertEqual(response.json(), {"user": str(self.user.pk)})
+
+    def test_saving_user_drops_cached_copy(self):
+        self.client.force_login(self.user)
+        self.client.get("/ping/")
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get("/ping/")
+        self.assertEqual(response.status_code, 302)
+
+    def test_bulk_archive_drops_cached_copy(self):
+        self.client.force_login(self.user)
+        self.client.get("/ping/")
+
+        User.objects.filter(pk=self.user.pk).archive()
+        response = self.client.get("/ping/")
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_hashes_are_upgraded_to_configured_work_factor(self):
+        self.assertTrue(self.client.login(email="staff@example.com", password="1234"))
+        self.user.refresh_from_db()
+        self.assertEqual(identify_hasher(self.user.password).safe_summary(self.user.password)["iterations"], 1000)
+
+    def test_auth_benchmark(self):
+        out = StringIO()
+        call_command("auth_benchmark", logins=1, requests=5, stdout=out)
+        self.assertIn("authenticated request", out.getvalue())
+        self.assertEqual(User.objects.count(), 1)
+
+
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+class ImportUsersTestCase(TestCase):
+    def test_import_users_command(self):
+        User.objects.create_user(email="taken@example.com", username="taken@example.com")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = f"{directory.name}/staff.csv"
+        with open(path, "w") as f:
+            f.write(
+                "email,password,first_name,last_name,is_staff\n"
+                "Nurse@Example.COM,secret,Ana,Cruz,yes\n"
+                "clerk@example.com,,Ben,Reyes,\n"
+                "taken@example.com,secret,,,\n"
+                "Nurse@example.com,other,,,\n"
+                ",secret,,,\n"
+            )
+        out, err = StringIO(), StringIO()
+        call_command("import_users", path, processes=1, stdout=out, stderr=err)
+
+        self.assertIn("Created 2 users, skipped 2 duplicates and 1 invalid rows.", out.getvalue())
+        self.assertIn("Line 6", err.getvalue())
+        nurse = User.objects.get(email="Nurse@example.com")
+        self.assertTrue(nurse.is_staff)
+        self.assertTrue(nurse.check_password("secret"))
+        self.assertFalse(User.objects.get(email="clerk@example.com").has_usable_password())
+
+    def test_read_users_requires_email_column(self):
+        with self.assertRaises(ValueError):
+            read_users(StringIO("name\nAna\n"))
+
+    def test_hash_passwords_in_pool(self):
+        hashes = hash_passwords(["a", "b", "c"], processes=2)
+        self.assertEqual(len(hashes), 3)
+        self.assertEqual(identify_hasher(hashes[0]).algorithm, "pbkdf2_sha256")
+
+    def test_import_users_skips_duplicates(self):
+        rows, _ = read_users(StringIO("email\na@example.com\na@example.com\n"))
+        created, duplicates = import_users(rows, processes=1)
+        self.assertEqual(len(created), 1)
+        self.assertEqual(duplicates, ["a@example.com"])